@@ -0,0 +1,285 @@
+import logging
+import os
+import re
+import socket
+import sqlite3
+import time
+import uuid
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CHANGE_LOG_TABLE = "dmtool_change_log"
+CAPTURE_TABLE = "dmtool_change_captures"
+
+# A capture older than this is treated as abandoned even if its process still runs
+MAX_CAPTURE_AGE = 6 * 3600
+
+_DROP_COLUMN = re.compile(r"\bDROP\s+COLUMN\b", re.IGNORECASE)
+
+
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _process_alive(pid: int) -> bool:
+    """Whether a process with this id runs on this host"""
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return kernel32.GetLastError() == 5
+        kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ChangeSet:
+    """Net effect of a captured execution on a table, as ROWIDs"""
+
+    def __init__(self, inserted=None, updated=None, deleted=None, complete=True):
+        self.inserted = sorted(inserted or [])
+        self.updated = sorted(updated or [])
+        self.deleted = sorted(deleted or [])
+        # False when the table was dropped/recreated and the triggers went with it
+        self.complete = complete
+
+    def affected_rowids(self) -> List[int]:
+        """ROWIDs of rows that exist after the execution and were inserted or changed"""
+        return sorted(self.inserted + self.updated)
+
+    def as_dict(self) -> Dict[str, List[int]]:
+        return {"inserted": self.inserted, "updated": self.updated, "deleted": self.deleted}
+
+    def __repr__(self):
+        return (f"ChangeSet(inserted={len(self.inserted)}, updated={len(self.updated)}, "
+                f"deleted={len(self.deleted)}, complete={self.complete})")
+
+
+class TableChangeCapture:
+    """
+    Capture which rows of one table an execution inserts, updates or deletes.
+
+    While active, AFTER INSERT/UPDATE/DELETE triggers on the table append the
+    ROWID and operation to the dmtool_change_log table. The triggers are
+    persistent (not TEMP) so statements run through any connection are seen,
+    and they are dropped again on stop(). Nothing is read from the table
+    itself, only the log rows of this capture.
+
+    Each capture is registered in dmtool_change_captures with the host, PID
+    and start time of its owner, so start() can tell the triggers of a capture
+    that was never stopped from those of a capture still running elsewhere.
+
+    Updates are only logged when a column value actually changes. When the
+    SQL drops columns (ALTER TABLE ... DROP COLUMN refuses columns named in
+    triggers) every updated row is logged instead.
+    """
+
+    def __init__(self, db_path: str, table_name: str, sql: Optional[str] = None):
+        """
+        Parameters:
+        db_path (str): Path to the SQLite database
+        table_name (str): Table to capture
+        sql (str): The SQL about to be executed, used to pick the trigger form
+        """
+        self.db_path = db_path
+        self.table_name = table_name
+        self.capture_id = uuid.uuid4().hex
+        self.track_values = not (sql and _DROP_COLUMN.search(sql))
+        self.columns: List[str] = []
+        self.active = False
+        self.changes: Optional[ChangeSet] = None
+
+    def _trigger_name(self, operation: str) -> str:
+        return f"dmtool_cc_{self.capture_id}_{operation}"
+
+    def _trigger_sql(self, operation: str) -> str:
+        table = _quote(self.table_name)
+        row = "OLD" if operation == "delete" else "NEW"
+        when = ""
+        if operation == "update" and self.track_values and self.columns:
+            when = "WHEN " + " OR ".join(f"OLD.{_quote(c)} IS NOT NEW.{_quote(c)}" for c in self.columns)
+        return (
+            f"CREATE TRIGGER {_quote(self._trigger_name(operation))} "
+            f"AFTER {operation.upper()} ON {table} {when} BEGIN "
+            f"INSERT INTO {CHANGE_LOG_TABLE} (capture_id, row_id, operation) "
+            f"VALUES ('{self.capture_id}', {row}.ROWID, '{operation[0].upper()}'); END"
+        )
+
+    def _table_columns(self, cursor) -> List[str]:
+        cursor.execute(f"PRAGMA table_info({_quote(self.table_name)})")
+        return [row[1] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _is_stale(owner, now: float) -> bool:
+        """Whether a registered capture (host, pid, started_at) was abandoned"""
+        if owner is None:
+            return True
+        host, pid, started_at = owner
+        if now - started_at > MAX_CAPTURE_AGE:
+            return True
+        return host == socket.gethostname() and not _process_alive(pid)
+
+    def _drop_stale_triggers(self, cursor):
+        """
+        Drop capture triggers left on the table by a capture that was never
+        stopped (its process died, or it is older than MAX_CAPTURE_AGE), with
+        their log rows. They would keep logging and make ALTER TABLE ...
+        DROP COLUMN fail on the table. Triggers of live captures are kept.
+        """
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND lower(tbl_name) = lower(?) AND name LIKE 'dmtool_cc_%'",
+            (self.table_name,),
+        )
+        triggers = {}
+        for (name,) in cursor.fetchall():
+            triggers.setdefault(name[len("dmtool_cc_"):].rsplit("_", 1)[0], []).append(name)
+
+        now = time.time()
+        dropped = 0
+        for capture_id, names in triggers.items():
+            cursor.execute(
+                f"SELECT host, pid, started_at FROM {CAPTURE_TABLE} WHERE capture_id = ?",
+                (capture_id,),
+            )
+            if not self._is_stale(cursor.fetchone(), now):
+                continue
+            for name in names:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {_quote(name)}")
+            cursor.execute(f"DELETE FROM {CHANGE_LOG_TABLE} WHERE capture_id = ?", (capture_id,))
+            cursor.execute(f"DELETE FROM {CAPTURE_TABLE} WHERE capture_id = ?", (capture_id,))
+            dropped += len(names)
+        if dropped:
+            logger.warning(f"Dropped {dropped} stale change capture triggers on {self.table_name}")
+
+    def start(self):
+        """Create the change log (once), register this capture and create its triggers"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {CHANGE_LOG_TABLE} ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, capture_id TEXT NOT NULL, "
+                "row_id INTEGER, operation TEXT NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {CHANGE_LOG_TABLE}_capture ON {CHANGE_LOG_TABLE} (capture_id)"
+            )
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {CAPTURE_TABLE} ("
+                "capture_id TEXT PRIMARY KEY, table_name TEXT NOT NULL, "
+                "host TEXT NOT NULL, pid INTEGER NOT NULL, started_at REAL NOT NULL)"
+            )
+            self._drop_stale_triggers(cursor)
+            self.columns = self._table_columns(cursor)
+            if not self.columns:
+                raise ValueError(f"Table {self.table_name} does not exist")
+            cursor.execute(
+                f"INSERT INTO {CAPTURE_TABLE} (capture_id, table_name, host, pid, started_at) VALUES (?, ?, ?, ?, ?)",
+                (self.capture_id, self.table_name, socket.gethostname(), os.getpid(), time.time()),
+            )
+            for operation in ("insert", "update", "delete"):
+                cursor.execute(self._trigger_sql(operation))
+            conn.commit()
+            self.active = True
+            logger.info(f"Change capture {self.capture_id} started on {self.table_name}")
+        finally:
+            conn.close()
+        return self
+
+    def stop(self) -> ChangeSet:
+        """
+        Drop the triggers and return the net changes recorded since start().
+        The log rows of this capture are removed.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?",
+                (f"dmtool_cc_{self.capture_id}_%",),
+            )
+            remaining = {row[0] for row in cursor.fetchall()}
+            for name in remaining:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {_quote(name)}")
+
+            cursor.execute(
+                f"SELECT row_id, operation FROM {CHANGE_LOG_TABLE} WHERE capture_id = ? ORDER BY seq",
+                (self.capture_id,),
+            )
+            log = cursor.fetchall()
+            cursor.execute(f"DELETE FROM {CHANGE_LOG_TABLE} WHERE capture_id = ?", (self.capture_id,))
+            cursor.execute(f"DELETE FROM {CAPTURE_TABLE} WHERE capture_id = ?", (self.capture_id,))
+
+            columns_after = self._table_columns(cursor)
+            added_columns = [c for c in columns_after if c not in self.columns]
+            added_rows = []
+            if added_columns and len(remaining) == 3:
+                # Existing rows start with NULL in columns added by ALTER TABLE ... ADD COLUMN;
+                # the update triggers did not watch them
+                condition = " OR ".join(f"{_quote(c)} IS NOT NULL" for c in added_columns)
+                cursor.execute(f"SELECT ROWID FROM {_quote(self.table_name)} WHERE {condition}")
+                added_rows = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+        finally:
+            conn.close()
+            self.active = False
+
+        if len(remaining) < 3:
+            # The table was dropped or rebuilt during the execution: every current row is new
+            logger.warning(f"Change capture {self.capture_id} lost its triggers on {self.table_name}")
+            return ChangeSet(inserted=self._all_rowids(), complete=False)
+
+        changes = self._net_changes(log, added_rows)
+        logger.info(f"Change capture {self.capture_id} on {self.table_name}: {changes}")
+        return changes
+
+    def _all_rowids(self) -> List[int]:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT ROWID FROM {_quote(self.table_name)}")
+            return [row[0] for row in cursor.fetchall()]
+        except sqlite3.Error:
+            return []
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _net_changes(log, updated_rows=()) -> ChangeSet:
+        """Reduce the logged operations to one outcome per ROWID"""
+        first, last = {}, {}
+        for row_id, operation in log:
+            first.setdefault(row_id, operation)
+            last[row_id] = operation
+        for row_id in updated_rows:
+            first.setdefault(row_id, "U")
+            last.setdefault(row_id, "U")
+
+        inserted, updated, deleted = [], [], []
+        for row_id, operation in first.items():
+            existed_before = operation != "I"
+            exists_after = last[row_id] != "D"
+            if existed_before and exists_after:
+                updated.append(row_id)
+            elif exists_after:
+                inserted.append(row_id)
+            elif existed_before:
+                deleted.append(row_id)
+        return ChangeSet(inserted, updated, deleted)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.active:
+            self.changes = self.stop()
+        return False
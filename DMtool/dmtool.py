@@ -19,6 +19,7 @@ from DMtool.executor import SQLExecutor
 from DMtool.logging_config import setup_logging
 from DMtool.llm_config import LLMManager
 from DMtool.source_table_manager import generate_lineage_report
+from DMtool.change_capture import TableChangeCapture
 
 setup_logging(log_to_file=True, log_to_console=True)
 
@@ -187,6 +188,8 @@ class DMTool:
 
 
             self.current_context = None
+            # ChangeSet of the last process_sequential_query/process_selection_criteria call
+            self.last_changes = None
 
             logger.info("DMToolSQL initialized successfully")
         except Exception as e:
@@ -428,19 +431,37 @@ class DMTool:
             logger.error(f"Error formatting table column context: {e}")
             return "Error formatting table column context"
 
-    def _find_affected_indexes(self, old_table,updated_table) -> List[str]:
-        """Identify indexes that may be affected by transformations"""
-        if len(old_table) == 0 and len(updated_table) != 0:
-            return updated_table.index.tolist()
-        min_len = min(len(old_table), len(updated_table))
-        old_hash = pd.util.hash_pandas_object(old_table.iloc[:min_len], index=False)
-        new_hash = pd.util.hash_pandas_object(updated_table.iloc[:min_len], index=False)
-
-        change_mask = old_hash != new_hash
-        changed_indexes = updated_table.index[:min_len][change_mask].tolist()
-        inserted_indexes = updated_table.index[min_len:].tolist()
+    def _start_change_capture(self, target_table, sql_query=None):
+        """
+        Start recording the rows of target_table that the next statements
+        insert, update or delete (see TableChangeCapture)
+        
+        Returns:
+        TableChangeCapture or None when the table cannot be captured
+        """
+        try:
+            return TableChangeCapture(self.sql_executor.db_path, validate_sql_identifier(target_table),
+                                      sql_query).start()
+        except Exception as e:
+            logger.warning(f"Could not start change capture on {target_table}: {e}")
+            return None
 
-        return list(set(changed_indexes + inserted_indexes))
+    def _stop_change_capture(self, capture) -> List[int]:
+        """
+        Stop a change capture and keep its ChangeSet in self.last_changes
+        
+        Returns:
+        List[int]: ROWIDs of the rows that were inserted or updated
+        """
+        self.last_changes = None
+        if capture is None:
+            return []
+        try:
+            self.last_changes = capture.stop()
+            return self.last_changes.affected_rowids()
+        except Exception as e:
+            logger.warning(f"Could not read change capture on {capture.table_name}: {e}")
+            return []
 
 
     def _generate_fallback_plan_with_qualified_fields(self, template, planner_info):
@@ -573,15 +594,18 @@ class DMTool:
                 planner_info = resolved_data
 
                 # sql_plan = self._create_operation_plan(planner_info["restructured_query"], planner_info, template)
-                select_query = f"SELECT * FROM {validate_sql_identifier(target_table)}"
-                target_data_before = self.sql_executor.execute_and_fetch_df(select_query)
                 sql_query, sql_params = self.sql_generator.generate_sql(planner_info, template,sql_plan=planner_info.get("transformation_plan", ""))
                 logger.info(f"Generated SQL query: {sql_query}")
-                result = self._execute_sql_query(sql_query, sql_params, planner_info,
-                object_id=object_id,
-                segment_id=segment_id,
-                project_id=project_id,
-                is_selection_criteria=is_selection_criteria)
+                # Triggers record the rows the SQL touches instead of diffing full snapshots
+                capture = self._start_change_capture(target_table, sql_query)
+                try:
+                    result = self._execute_sql_query(sql_query, sql_params, planner_info,
+                    object_id=object_id,
+                    segment_id=segment_id,
+                    project_id=project_id,
+                    is_selection_criteria=is_selection_criteria)
+                finally:
+                    affected_indexes = self._stop_change_capture(capture)
 
 
                 if isinstance(result, dict) and "error_type" in result:
@@ -612,8 +636,6 @@ class DMTool:
                                 "steps_completed": result.get("completed_statements", 0)
                             }
                             context_manager.add_transformation_record(session_id, transformation_data)
-                            target_data_after = self.sql_executor.execute_and_fetch_df(select_query)
-                            affected_indexes = self._find_affected_indexes(target_data_before,target_data_after)
                         except Exception as e:
                             logger.warning(f"Could not save transformation record for multi-query: {e}")
                     
@@ -668,8 +690,6 @@ class DMTool:
                                 }
                                 
                                 context_manager.add_transformation_record(session_id, transformation_data)
-                                target_data_after = self.sql_executor.execute_and_fetch_df(select_query)
-                                affected_indexes = self._find_affected_indexes(target_data_before,target_data_after)
                                 
                             except Exception as e:
                                 logger.warning(f"Could not save transformation record: {e}")
@@ -806,7 +826,7 @@ class DMTool:
 
             try:
                 resolved_data["original_query"] = query
-                
+                target_table = None
 
                 try:
                     if "target_table_name" in resolved_data:
@@ -831,38 +851,54 @@ class DMTool:
 
                 
                 planner_info = resolved_data
-                select_query = f"SELECT * FROM {validate_sql_identifier(target_table)}"
-                target_data_before = self.sql_executor.execute_and_fetch_df(select_query)
+                affected_indexes = []
                 sql_query, sql_params = self.sql_generator.generate_sql(planner_info, template,sql_plan=planner_info.get("transformation_plan", ""))
                 logger.info(f"Generated SQL query: {sql_query}")
-                result = self._execute_sql_query(sql_query, sql_params, planner_info,
-                object_id=object_id,
-                segment_id=segment_id,
-                project_id=project_id,
-                is_selection_criteria=is_selection_criteria)
-
-
-                if isinstance(result, dict) and "error_type" in result:
-                    logger.error(f"SQL execution error: {result}")
-                    return f"SQL execution failed: {result.get('error_message', 'Unknown error')}", session_id
 
                 if "selection_criteria_target_table" in resolved_data:
                     target_table = resolved_data["selection_criteria_target_table"]
                     if isinstance(target_table, list) and len(target_table) > 0:
                         target_table = target_table[0]
-                segment_name = self._get_segment_name(segment_id, conn)
-                if segment_name:
-                    context_manager.add_segment(
-                        session_id,
-                        segment_name,
-                        planner_info["target_table_name"],
-                    )
+
+                # One capture spans the generated SQL and the sync below, so rows
+                # the SQL changes are reported as well as those the sync rewrites.
+                # Every path out of the block stops it and drops its triggers.
+                capture = self._start_change_capture(target_table, sql_query) if target_table else None
+                sync_failed = False
+                try:
+                    result = self._execute_sql_query(sql_query, sql_params, planner_info,
+                    object_id=object_id,
+                    segment_id=segment_id,
+                    project_id=project_id,
+                    is_selection_criteria=is_selection_criteria)
+
+                    if isinstance(result, dict) and "error_type" in result:
+                        logger.error(f"SQL execution error: {result}")
+                        return f"SQL execution failed: {result.get('error_message', 'Unknown error')}", session_id
+
+                    segment_name = self._get_segment_name(segment_id, conn)
+                    if segment_name:
+                        context_manager.add_segment(
+                            session_id,
+                            segment_name,
+                            planner_info["target_table_name"],
+                        )
+
+                    if target_table:
+                        try:
+                            self.sql_executor.sync_src_to_target(target_table)
+                        except Exception as e:
+                            logger.warning(f"Could not sync {target_table}: {e}")
+                            sync_failed = True
+                finally:
+                    affected_indexes = self._stop_change_capture(capture)
 
                 if target_table:
+                    if sync_failed:
+                        return result, []
                     try:
 
                         select_query = f"SELECT * FROM [{validate_sql_identifier(target_table)}]"
-                        self.sql_executor.sync_src_to_target(target_table)
                         target_data = self.sql_executor.execute_and_fetch_df(select_query)
                         
                         if isinstance(target_data, pd.DataFrame) and not target_data.empty:
@@ -891,7 +927,6 @@ class DMTool:
                                 }
                                 
                                 context_manager.add_transformation_record(session_id, transformation_data)
-                                affected_indexes = self._find_affected_indexes(target_data_before,target_data) 
                                 return target_data, affected_indexes
                                 
                             except Exception as e:
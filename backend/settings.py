@@ -13,9 +13,14 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 import os
 
+from dotenv import load_dotenv
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Credentials (SAP logon etc.) come from the environment or a local .env, see .env.example
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -134,3 +139,90 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# SAP RFC
+# Logon used by extraction paths that are not tied to a saved Connection row.
+# Host, user and password have no default: set them in the environment or .env
+
+SAP_RFC_DEFAULT_PARAMS = {
+    'ASHOST': os.environ.get('SAP_RFC_ASHOST'),
+    'SYSNR': os.environ.get('SAP_RFC_SYSNR', '01'),
+    'CLIENT': os.environ.get('SAP_RFC_CLIENT', '100'),
+    'USER': os.environ.get('SAP_RFC_USER'),
+    'PASSWD': os.environ.get('SAP_RFC_PASSWD'),
+}
+
+# Open RFC handles kept per connection, seconds of idleness before a handle is
+# re-checked with RfcPing, and seconds to wait for a free handle
+SAP_RFC_POOL_MAX_SIZE = int(os.environ.get('SAP_RFC_POOL_MAX_SIZE', 4))
+SAP_RFC_POOL_PING_AFTER = int(os.environ.get('SAP_RFC_POOL_PING_AFTER', 30))
+SAP_RFC_POOL_TIMEOUT = int(os.environ.get('SAP_RFC_POOL_TIMEOUT', 120))
+
+# Number of field chunks of one table read concurrently (1 = one after another)
+SAP_RFC_CHUNK_PARALLELISM = int(os.environ.get('SAP_RFC_CHUNK_PARALLELISM', 4))
+
+# Rows requested per Z450RFC_READ_TAB_DATA page when streaming a table into SQLite
+SAP_RFC_PAGE_SIZE = int(os.environ.get('SAP_RFC_PAGE_SIZE', 50000))
+
+# Seconds a cached table layout (key fields, field catalog) stays valid
+SAP_METADATA_TTL = int(os.environ.get('SAP_METADATA_TTL', 86400))
+
+# Rows per bulk_create batch when loading the ERP table catalog of a connection
+ERP_TABLES_BATCH_SIZE = int(os.environ.get('ERP_TABLES_BATCH_SIZE', 5000))
+
+# Seconds after which an unused pooled RFC handle is closed
+SAP_RFC_POOL_MAX_IDLE = int(os.environ.get('SAP_RFC_POOL_MAX_IDLE', 600))
+
+# HANA
+# Pooled hdbcli connections per Connection row: size, seconds of idleness before
+# a liveness check, seconds after which an unused connection is closed, and
+# seconds to wait for a free connection
+HANA_POOL_MAX_SIZE = int(os.environ.get('HANA_POOL_MAX_SIZE', 4))
+HANA_POOL_PING_AFTER = int(os.environ.get('HANA_POOL_PING_AFTER', 30))
+HANA_POOL_MAX_IDLE = int(os.environ.get('HANA_POOL_MAX_IDLE', 600))
+HANA_POOL_TIMEOUT = int(os.environ.get('HANA_POOL_TIMEOUT', 120))
+
+# Rows fetched per fetchmany() and written per executemany() when copying HANA tables
+HANA_FETCH_SIZE = int(os.environ.get('HANA_FETCH_SIZE', 50000))
+
+# SQLite bulk loads: rows per executemany batch, and whether to relax
+# synchronous / cache_size / temp_store while loading
+SQLITE_BULK_BATCH_SIZE = int(os.environ.get('SQLITE_BULK_BATCH_SIZE', 10000))
+SQLITE_BULK_PRAGMAS = os.environ.get('SQLITE_BULK_PRAGMAS', 'True') == 'True'
+
+# Rows parsed and inserted per chunk when loading uploaded CSV/TXT files
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 50000))
+
+# Column type inference: SAP extracts typed from the ABAP field types, uploads
+# typed from a sample of rows (per request with inferTypes); TEXT otherwise
+SAP_TYPED_COLUMNS = os.environ.get('SAP_TYPED_COLUMNS', 'False') == 'True'
+UPLOAD_INFER_TYPES = os.environ.get('UPLOAD_INFER_TYPES', 'False') == 'True'
+TYPE_INFERENCE_SAMPLE_SIZE = int(os.environ.get('TYPE_INFERENCE_SAMPLE_SIZE', 1000))
+
+# Default duplicate removal after 1:1 copies: 'group_by' (GROUP BY every column),
+# 'hash' (hash of all columns) or 'keys' (key fields)
+DEDUP_MODE = os.environ.get('DEDUP_MODE', 'group_by')
+
+# Per-column statistics catalog: seconds until a full recompute, and how many
+# most frequent values are kept per column for the profiling charts
+TABLE_STATS_TTL = int(os.environ.get('TABLE_STATS_TTL', 3600))
+TABLE_STATS_TOP_K = int(os.environ.get('TABLE_STATS_TOP_K', 20))
+
+# Rows fetched and encoded per chunk by streamed table responses
+# (?stream=json or ?stream=ndjson)
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', 5000))
+
+# NDJSON renderer so that DRF content negotiation accepts Accept: application/x-ndjson
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'connection.streaming.NDJSONRenderer',
+    ],
+}
+
+# Parquet/Arrow table export (needs pyarrow): rows per record batch / row
+# group, and the Parquet compression codec
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 100000))
+EXPORT_PARQUET_COMPRESSION = os.environ.get('EXPORT_PARQUET_COMPRESSION', 'snappy')
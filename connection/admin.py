@@ -10,3 +10,6 @@ admin.site.register(SaveRule)
 admin.site.register(Rule)
 admin.site.register(erp_tables_description)
 
+admin.site.register(ExtractionWatermark)
+admin.site.register(SapTableMetadata)
+admin.site.register(TableColumnStats)
@@ -0,0 +1,165 @@
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, transaction
+
+
+def quote_name(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def insert_sql(table_name, columns):
+    return (f"INSERT INTO {quote_name(table_name)} (" + ", ".join(quote_name(c) for c in columns)
+            + ") VALUES (" + ", ".join(["%s"] * len(columns)) + ")")
+
+
+def _batch_size(batch_size):
+    return int(batch_size or getattr(settings, 'SQLITE_BULK_BATCH_SIZE', 10000))
+
+
+def insert_rows(cursor, table_name, columns, rows, batch_size=None, also_into=()):
+    """
+    Insert rows (an iterable of value sequences in columns order) with one
+    executemany per batch on an already open cursor. Every batch is also
+    written to the tables in also_into, so the rows are only produced once.
+    Returns the row count.
+    """
+    statements = [insert_sql(t, columns) for t in (table_name, *also_into)]
+    batch_size = _batch_size(batch_size)
+    rows = iter(rows)
+    written = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return written
+        for sql in statements:
+            cursor.executemany(sql, batch)
+        written += len(batch)
+
+
+@contextmanager
+def bulk_load_pragmas(cursor, database='default'):
+    """
+    Relax SQLite durability while loading (synchronous=OFF, larger page cache,
+    temp storage in memory) and restore the previous settings afterwards.
+    Inside an atomic block SQLite refuses to change synchronous and
+    temp_store, so only the cache is tuned there.
+    """
+    if connections[database].vendor != 'sqlite':
+        yield
+        return
+    pragmas = {'synchronous': 'OFF', 'cache_size': '-262144', 'temp_store': 'MEMORY'}
+    if connections[database].in_atomic_block:
+        del pragmas['synchronous'], pragmas['temp_store']
+    previous = {}
+    for name in pragmas:
+        cursor.execute(f"PRAGMA {name}")
+        previous[name] = cursor.fetchone()[0]
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def bulk_insert_rows(table_name, columns, rows, database='default', batch_size=None, tune=None,
+                     also_into=()):
+    """
+    Insert rows into table_name (and the tables in also_into) in executemany
+    batches inside one transaction, optionally under bulk_load_pragmas
+    (defaults to SQLITE_BULK_PRAGMAS). Returns the number of rows written.
+    """
+    if tune is None:
+        tune = getattr(settings, 'SQLITE_BULK_PRAGMAS', True)
+    with connections[database].cursor() as cursor:
+        with bulk_load_pragmas(cursor, database) if tune else nullcontext():
+            with transaction.atomic(using=database):
+                return insert_rows(cursor, table_name, columns, rows, batch_size, also_into)
+
+
+def dataframe_rows(dataframe, batch_size=None):
+    """
+    Yield the rows of dataframe as tuples of plain Python values (NaN/NaT as None),
+    converting one slice of batch_size rows at a time.
+    """
+    batch_size = _batch_size(batch_size)
+    for start in range(0, len(dataframe), batch_size):
+        frame = dataframe.iloc[start:start + batch_size].astype(object)
+        frame = frame.where(frame.notna(), None)
+        yield from frame.itertuples(index=False, name=None)
+
+
+def table_column_count(table_name, database='default'):
+    with connections[database].cursor() as cursor:
+        cursor.execute(f"PRAGMA table_info({quote_name(table_name)})")
+        return len(cursor.fetchall())
+
+
+def bulk_insert_dataframe(dataframe, table_name, database='default', batch_size=None, tune=None,
+                          also_into=()):
+    """
+    Bulk-load a DataFrame into an existing table (and the identically shaped
+    tables in also_into). Columns beyond the table's column count are dropped,
+    as insert_data_from_dataframe always did. Returns the number of rows written.
+    """
+    dataframe = dataframe.iloc[:, :table_column_count(table_name, database)]
+    return bulk_insert_rows(table_name, list(dataframe.columns), dataframe_rows(dataframe, batch_size),
+                            database=database, batch_size=batch_size, tune=tune, also_into=also_into)
+
+
+def bulk_insert_frames(frames, table_name, columns=None, database='default', batch_size=None, tune=None):
+    """
+    Stream an iterable of DataFrames (e.g. pd.read_csv(..., chunksize=n)) into an
+    existing table inside one transaction, printing progress after every frame.
+    columns, when given, replaces the column names of every frame.
+    Returns the number of rows written.
+    """
+    if tune is None:
+        tune = getattr(settings, 'SQLITE_BULK_PRAGMAS', True)
+    written = 0
+    with connections[database].cursor() as cursor:
+        with bulk_load_pragmas(cursor, database) if tune else nullcontext():
+            with transaction.atomic(using=database):
+                for frame in frames:
+                    if columns is not None:
+                        frame.columns = columns
+                    written += insert_rows(cursor, table_name, list(frame.columns),
+                                           dataframe_rows(frame, batch_size), batch_size)
+                    print(f"{table_name}: {written} rows loaded")
+    return written
+
+
+def src_table(table_name):
+    """Name of the _src copy that is kept next to every segment table."""
+    return table_name + "_src"
+
+
+def write_tables(table_name, dual_write=False):
+    """table_name, followed by its _src copy when dual_write is set."""
+    return [table_name, src_table(table_name)] if dual_write else [table_name]
+
+
+def create_index(cursor, table_name, columns):
+    """
+    CREATE INDEX IF NOT EXISTS on the given columns of table_name (those that
+    exist in the table, compared case-insensitively). Returns the index name,
+    or None when none of the columns exist.
+    """
+    cursor.execute(f"PRAGMA table_info({quote_name(table_name)})")
+    existing = {row[1].lower(): row[1] for row in cursor.fetchall()}
+    columns = list(dict.fromkeys(existing[c.lower()] for c in columns if c and c.lower() in existing))
+    if not columns:
+        return None
+    index_name = f"{table_name}__" + "_".join(columns)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {quote_name(index_name)} ON {quote_name(table_name)} ("
+                   + ", ".join(quote_name(c) for c in columns) + ")")
+    return index_name
+
+
+def ensure_index(table_name, columns, database='default', dual_write=False):
+    """create_index on table_name, and on its _src copy when dual_write is set."""
+    with connections[database].cursor() as cursor:
+        return [create_index(cursor, t, columns) for t in write_tables(table_name, dual_write)]
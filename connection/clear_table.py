@@ -228,10 +228,10 @@ db_path = r"C:\Users\gajananda.mallidi\Downloads\NEWPUSH\NEWPUSH\LLM_Backend\db.
 #     print("Hana")
 #     try:
 #         conn = dbapi.connect(
-#             address="10.56.7.40",
+#             address=os.environ["HANA_ADDRESS"],
 #             port=30015,
-#             user = 'SATYAR',
-#             password= 'SunR!se@6789',
+#             user = os.environ["HANA_USER"],
+#             password= os.environ["HANA_PASSWORD"],
 #             encrypt='true',
 #             sslValidateCertificate='false'
 #         )
@@ -0,0 +1,110 @@
+import re
+
+# Values SQLite stores compactly under INTEGER/REAL affinity. Leading zeros
+# (material numbers, NUMC fields) are significant, so they keep a column TEXT.
+_INTEGER = re.compile(r"-?(0|[1-9][0-9]{0,17})")
+_REAL = re.compile(r"-?(0|[1-9][0-9]*)\.[0-9]+")
+_ISO_DATE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+
+# ABAP types reported by Z450RFC_READ_TABLE (FIELDS-TYPE): INT1/INT2/INT4/INT8,
+# float and date. CHAR, NUMC, TIMS, RAW etc. stay TEXT, and so do packed (P)
+# amounts and quantities: a REAL column would round them.
+ABAP_SQLITE_TYPES = {
+    "I": "INTEGER",
+    "b": "INTEGER",
+    "s": "INTEGER",
+    "8": "INTEGER",
+    "F": "REAL",
+    "D": "DATE",
+}
+
+
+def _value_type(value):
+    if value is None or isinstance(value, bool):
+        return None if value is None else "TEXT"
+    if isinstance(value, int):
+        return "INTEGER"
+    if isinstance(value, float):
+        return None if value != value else "REAL"
+    text = str(value)
+    if text == "":
+        return None
+    if _INTEGER.fullmatch(text):
+        return "INTEGER"
+    if _REAL.fullmatch(text):
+        return "REAL"
+    if _ISO_DATE.fullmatch(text):
+        return "DATE"
+    return "TEXT"
+
+
+def infer_sqlite_type(values):
+    """
+    Column type for a sample of values: INTEGER, REAL or DATE when every
+    non-empty value is one, TEXT otherwise (and for an empty sample).
+    """
+    seen = set()
+    for value in values:
+        kind = _value_type(value)
+        if kind == "TEXT":
+            return "TEXT"
+        if kind:
+            seen.add(kind)
+    if seen == {"INTEGER"}:
+        return "INTEGER"
+    if seen and seen <= {"INTEGER", "REAL"}:
+        return "REAL"
+    if seen == {"DATE"}:
+        return "DATE"
+    return "TEXT"
+
+
+def infer_column_types(columns, rows, sample_size=1000):
+    """{column: type} inferred from the first sample_size rows (sequences in columns order)."""
+    sample = list(rows[:sample_size])
+    return {column: infer_sqlite_type(row[i] for row in sample if i < len(row))
+            for i, column in enumerate(columns)}
+
+
+def infer_dataframe_types(dataframe, sample_size=1000):
+    """{column: type} inferred from the first sample_size rows of a DataFrame."""
+    sample = dataframe.head(sample_size)
+    return {str(column): infer_sqlite_type(sample.iloc[:, i].tolist())
+            for i, column in enumerate(sample.columns)}
+
+
+def sap_sqlite_type(abap_type):
+    return ABAP_SQLITE_TYPES.get((abap_type or "").strip(), "TEXT")
+
+
+def sap_value(value, sqlite_type):
+    """
+    Convert a field value read through RFC for a column of sqlite_type.
+    Dates become YYYY-MM-DD (00000000 and blanks NULL), numbers lose their
+    padding and trailing minus sign. Values that do not parse are kept as
+    they are, which SQLite stores as TEXT in any column.
+    """
+    if value is None or sqlite_type == "TEXT":
+        return value
+    text = value.strip()
+    if not text:
+        return None
+    if sqlite_type == "DATE":
+        if text == "00000000":
+            return None
+        if len(text) == 8 and text.isdigit():
+            return f"{text[:4]}-{text[4:6]}-{text[6:]}"
+        return value
+    if text.endswith("-"):
+        text = "-" + text[:-1]
+    try:
+        return int(text) if sqlite_type == "INTEGER" else float(text)
+    except ValueError:
+        return value
+
+
+def sap_literal(value, sqlite_type):
+    """Inverse of sap_value for values used in an OPTIONS WHERE clause."""
+    if sqlite_type == "DATE" and isinstance(value, str) and _ISO_DATE.fullmatch(value):
+        return value.replace("-", "")
+    return value
@@ -0,0 +1,157 @@
+import io
+
+from django.conf import settings
+from django.db import connections
+
+from .bulk_load import quote_name
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only the Parquet/Arrow export needs it
+    pa = pq = None
+
+# fmt query value -> (content type, file extension)
+EXPORT_FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.file", "arrow"),
+    "arrows": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+class ColumnarExportUnavailable(Exception):
+    """Raised when pyarrow is not installed."""
+
+
+def columnar_export_available():
+    return pa is not None
+
+
+def _batch_size(batch_size):
+    return int(batch_size or getattr(settings, 'EXPORT_BATCH_SIZE', 100000))
+
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only file that collects what the Arrow writers produce until drained
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_type(declared, clean):
+    # INTEGER/REAL columns keep their type only when every stored value has it
+    declared = (declared or "").upper()
+    if clean and "INT" in declared:
+        return pa.int64()
+    if clean and any(t in declared for t in ("REAL", "FLOA", "DOUB")):
+        return pa.float64()
+    return pa.string()
+
+
+def export_schema(table_name, columns=None, database='default'):
+    """
+    Arrow schema for exporting columns of table_name (all by default, names
+    matched case-insensitively). INTEGER and REAL columns become int64 and
+    float64 unless they hold values of another storage class, everything
+    else is exported as string.
+    Raises ValueError for unknown tables or columns.
+    """
+    if pa is None:
+        raise ColumnarExportUnavailable("pyarrow is not installed")
+    with connections[database].cursor() as cursor:
+        cursor.execute(f"PRAGMA table_info({quote_name(table_name)})")
+        declared = {row[1]: row[2] for row in cursor.fetchall()}
+        if not declared:
+            raise ValueError(f"table {table_name} not found")
+        if columns:
+            by_lower = {name.lower(): name for name in declared}
+            unknown = [c for c in columns if c.lower() not in by_lower]
+            if unknown:
+                raise ValueError(f"unknown columns: {', '.join(unknown)}")
+            names = [by_lower[c.lower()] for c in columns]
+        else:
+            names = list(declared)
+
+        numeric = [n for n in names if _arrow_type(declared[n], True) != pa.string()]
+        clean = set()
+        if numeric:
+            # One pass: count values whose storage class does not fit the declared type
+            checks = []
+            for n in numeric:
+                allowed = "('integer', 'null')" if _arrow_type(declared[n], True) == pa.int64() \
+                    else "('integer', 'real', 'null')"
+                checks.append(f"SUM(typeof({quote_name(n)}) NOT IN {allowed})")
+            cursor.execute(f"SELECT {', '.join(checks)} FROM {quote_name(table_name)}")
+            clean = {n for n, bad in zip(numeric, cursor.fetchone()) if not bad}
+    return pa.schema([(n, _arrow_type(declared[n], n in clean)) for n in names])
+
+
+def _string_value(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return str(value)
+
+
+def _record_batch(rows, schema):
+    arrays = []
+    for i, field in enumerate(schema):
+        values = [row[i] for row in rows]
+        if field.type == pa.string():
+            values = [_string_value(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _open_writer(fmt, sink, schema):
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, schema,
+                                compression=getattr(settings, 'EXPORT_PARQUET_COMPRESSION', 'snappy'))
+    if fmt == "arrow":
+        return pa.ipc.new_file(sink, schema)
+    if fmt == "arrows":
+        return pa.ipc.new_stream(sink, schema)
+    raise ValueError(f"unknown export format {fmt}")
+
+
+def export_chunks(table_name, schema, fmt="parquet", database='default', batch_size=None):
+    """
+    Yield table_name encoded as Parquet (one row group per batch) or Arrow IPC
+    file/stream, batch_size rows at a time, so the export is streamed while it
+    is written and memory is bounded by one batch.
+    """
+    batch_size = _batch_size(batch_size)
+    sink = _ChunkSink()
+    writer = _open_writer(fmt, sink, schema)
+    select_list = ", ".join(quote_name(n) for n in schema.names)
+    with connections[database].cursor() as cursor:
+        cursor.execute(f"SELECT {select_list} FROM {quote_name(table_name)}")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            writer.write_batch(_record_batch(rows, schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    writer.close()
+    yield sink.drain()
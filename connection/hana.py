@@ -0,0 +1,234 @@
+import re
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+from hdbcli import dbapi
+
+from .bulk_load import insert_rows, quote_name
+from .table_stats import invalidate_column_stats
+from .utils import ConnectionPool
+
+
+class HanaPoolError(Exception):
+    """Raised when no pooled HANA connection can be handed out."""
+
+
+def hana_params_from_connection(conn):
+    return {
+        "address": conn.host,
+        "port": int(conn.port),
+        "user": conn.username,
+        "password": conn.password,
+    }
+
+
+def hana_connect(params):
+    return dbapi.connect(
+        address=params["address"],
+        port=int(params["port"]),
+        user=params["user"],
+        password=params["password"],
+        encrypt='true',
+        sslValidateCertificate='false'
+    )
+
+
+class HanaConnectionPool(ConnectionPool):
+    """
+    Pool of hdbcli connections for one HANA logon, so the TLS handshake is paid
+    once per connection instead of once per request. Idle connections are
+    re-checked with SELECT 1 FROM DUMMY before reuse and closed after
+    HANA_POOL_MAX_IDLE seconds.
+    """
+    error_class = HanaPoolError
+    broken_errors = (dbapi.OperationalError, dbapi.InterfaceError)
+
+    def __init__(self, params):
+        super().__init__(
+            params,
+            max_size=getattr(settings, 'HANA_POOL_MAX_SIZE', 4),
+            ping_after=getattr(settings, 'HANA_POOL_PING_AFTER', 30),
+            acquire_timeout=getattr(settings, 'HANA_POOL_TIMEOUT', 120),
+            max_idle=getattr(settings, 'HANA_POOL_MAX_IDLE', 600),
+        )
+
+    def _open(self):
+        return hana_connect(self.params)
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except dbapi.Error:
+            pass
+
+    def _is_alive(self, conn):
+        try:
+            if not conn.isconnected():
+                return False
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1 FROM DUMMY")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            return True
+        except dbapi.Error:
+            return False
+
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _pool_key(params):
+    return (params["address"], int(params["port"]), params["user"])
+
+
+def _reap_idle_pools(keep):
+    # Pools only evict on acquire/release: sweep the other logons so an unused
+    # pool does not keep its connections open, and forget pools left empty
+    with _POOLS_LOCK:
+        others = [(key, pool) for key, pool in _POOLS.items() if key != keep]
+    for key, pool in others:
+        if pool.evict_idle():
+            with _POOLS_LOCK:
+                if _POOLS.get(key) is pool:
+                    del _POOLS[key]
+
+
+def get_hana_pool(params):
+    """
+    Return the shared pool for a HANA logon (host, port, user). A pool whose
+    password no longer matches is closed and replaced. Idle connections of
+    the other pools are closed on the way.
+    """
+    # Port as int, like _pool_key, so "30015" and 30015 are the same logon
+    params = {**params, "port": int(params["port"])}
+    key = _pool_key(params)
+    stale = None
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is not None and pool.params != params:
+            stale, pool = pool, None
+        if pool is None:
+            pool = HanaConnectionPool(params)
+            _POOLS[key] = pool
+    if stale is not None:
+        stale.close()
+    _reap_idle_pools(key)
+    return pool
+
+
+def get_hana_connection_pool(conn):
+    return get_hana_pool(hana_params_from_connection(conn))
+
+
+def close_hana_pool(conn):
+    try:
+        key = _pool_key(hana_params_from_connection(conn))
+    except (TypeError, ValueError):
+        return
+    with _POOLS_LOCK:
+        pool = _POOLS.pop(key, None)
+    if pool is not None:
+        pool.close()
+
+
+def _quote_hana(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _sqlite_value(value):
+    # Decimal, datetime, LOB objects etc. are stored as text like the rest of the staging area
+    if value is None or isinstance(value, (str, int, float, bytes)):
+        return value
+    return str(value)
+
+
+# Local copies of HANA tables are always named hana_<...>, which no Django
+# (app_model) or segment (t_<n>_...) table can match
+HANA_TARGET_PREFIX = "hana_"
+_TARGET_NAME = re.compile(r"hana_[A-Za-z0-9_]+")
+
+
+def hana_target_table(table, target_table=None):
+    """
+    Local table name for a HANA extract: target_table when it is a valid
+    hana_ name, hana_<table> by default. Raises ValueError otherwise.
+    """
+    name = target_table or HANA_TARGET_PREFIX + re.sub(r"[^A-Za-z0-9_]", "_", str(table))
+    if not _TARGET_NAME.fullmatch(name):
+        raise ValueError(f"target_table must match {_TARGET_NAME.pattern}")
+    return name
+
+
+def hana_table_columns(cursor, schema, table):
+    cursor.execute("SELECT COLUMN_NAME FROM SYS.TABLE_COLUMNS WHERE SCHEMA_NAME = ? AND TABLE_NAME = ? "
+                   "ORDER BY POSITION", [schema, table])
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _check_columns(requested, available, what):
+    unknown = [c for c in requested if c not in available]
+    if unknown:
+        raise ValueError(f"unknown {what}: {', '.join(map(str, unknown))}")
+
+
+def extract_hana_table(pool, schema, table, columns=None, filters=None,
+                       target_table=None, replace=False, batch_size=None, database='default'):
+    """
+    Copy a HANA table into the SQLite staging area.
+
+    Projection (columns) and filter (filters, {column: value} ANDed as
+    column = ? with bound values) run on the HANA server; both are checked
+    against the HANA column list first. Rows are fetched with
+    fetchmany(batch_size) and every batch is written with executemany before
+    the next one is fetched.
+    The local table is hana_target_table(table, target_table). An existing
+    one is only dropped and recreated with replace, inside one transaction.
+    Returns (local table name, number of rows written).
+    """
+    batch_size = int(batch_size or getattr(settings, 'HANA_FETCH_SIZE', 50000))
+    target_table = hana_target_table(table, target_table)
+    filters = filters or {}
+
+    with connections[database].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [target_table])
+        if cursor.fetchone() and not replace:
+            raise ValueError(f"{target_table} already exists; pass replace to overwrite it")
+
+    written = 0
+    with pool.connection() as conn:
+        hana_cursor = conn.cursor()
+        try:
+            available = hana_table_columns(hana_cursor, schema, table)
+            if not available:
+                raise ValueError(f"{schema}.{table} not found")
+            _check_columns(columns or [], available, "columns")
+            _check_columns(list(filters), available, "filter columns")
+
+            select_list = ", ".join(_quote_hana(c) for c in columns) if columns else "*"
+            sql = f"SELECT {select_list} FROM {_quote_hana(schema)}.{_quote_hana(table)}"
+            if filters:
+                sql += " WHERE " + " AND ".join(f"{_quote_hana(c)} = ?" for c in filters)
+
+            hana_cursor.arraysize = batch_size
+            hana_cursor.execute(sql, list(filters.values()))
+            names = [d[0] for d in hana_cursor.description]
+            create_sql = f"CREATE TABLE {quote_name(target_table)} (" + ", ".join(f"{quote_name(c)} TEXT" for c in names) + ")"
+
+            with transaction.atomic(using=database), connections[database].cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {quote_name(target_table)}")
+                cursor.execute(create_sql)
+                invalidate_column_stats(target_table)
+                while True:
+                    rows = hana_cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    written += insert_rows(cursor, target_table, names,
+                                           ([_sqlite_value(v) for v in row] for row in rows), batch_size)
+                    print(f"{schema}.{table}: {written} rows copied")
+        finally:
+            hana_cursor.close()
+    return target_table, written
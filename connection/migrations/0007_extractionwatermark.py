@@ -0,0 +1,29 @@
+# Generated by Django 5.0.13 on 2025-10-02 10:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connection', '0006_rule_lookup_field_rule_lookup_table_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=50)),
+                ('delta_field', models.CharField(max_length=50)),
+                ('watermark', models.CharField(blank=True, max_length=255, null=True)),
+                ('rows_loaded', models.IntegerField(default=0)),
+                ('last_extracted_on', models.DateTimeField(auto_now=True)),
+                ('connection_id', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='watermarks', to='connection.connection')),
+            ],
+            options={
+                'unique_together': {('connection_id', 'table_name')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.13 on 2025-10-03 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connection', '0007_extractionwatermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SapTableMetadata',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=50)),
+                ('key_fields', models.JSONField(default=list)),
+                ('field_catalog', models.JSONField(default=list)),
+                ('fetched_on', models.DateTimeField(auto_now=True)),
+                ('connection_id', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='table_metadata', to='connection.connection')),
+            ],
+            options={
+                'unique_together': {('connection_id', 'table_name')},
+            },
+        ),
+    ]
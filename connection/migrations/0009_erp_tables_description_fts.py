@@ -0,0 +1,65 @@
+# Generated by Django 5.0.13 on 2025-10-06 11:27
+
+from django.db import migrations
+
+FTS_TABLE = "connection_erp_tables_description_fts"
+CONTENT_TABLE = "connection_erp_tables_description"
+
+# External-content FTS5 index over table name and description, kept in sync by
+# triggers. The trigram tokenizer gives indexed substring (icontains) matching.
+CREATE_FTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS "{FTS_TABLE}" USING fts5(
+        "table", description, content='{CONTENT_TABLE}', content_rowid='id', tokenize='trigram')""",
+    f"""CREATE TRIGGER IF NOT EXISTS "{FTS_TABLE}_ai" AFTER INSERT ON "{CONTENT_TABLE}" BEGIN
+        INSERT INTO "{FTS_TABLE}"(rowid, "table", description) VALUES (new.id, new."table", new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS "{FTS_TABLE}_ad" AFTER DELETE ON "{CONTENT_TABLE}" BEGIN
+        INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, "table", description) VALUES ('delete', old.id, old."table", old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS "{FTS_TABLE}_au" AFTER UPDATE ON "{CONTENT_TABLE}" BEGIN
+        INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, "table", description) VALUES ('delete', old.id, old."table", old.description);
+        INSERT INTO "{FTS_TABLE}"(rowid, "table", description) VALUES (new.id, new."table", new.description);
+    END""",
+    f"""INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}") VALUES ('rebuild')""",
+]
+
+DROP_FTS = [
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_ai"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_ad"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_au"',
+    f'DROP TABLE IF EXISTS "{FTS_TABLE}"',
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            for sql in CREATE_FTS:
+                cursor.execute(sql)
+    except Exception as e:
+        # SQLite without FTS5 / trigram (< 3.34): SAPTableSearch falls back to LIKE scans
+        print(f"FTS5 index for ERP tables not created: {e}")
+        with schema_editor.connection.cursor() as cursor:
+            for sql in DROP_FTS:
+                cursor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in DROP_FTS:
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connection', '0008_saptablemetadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.13 on 2025-10-06 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connection', '0009_erp_tables_description_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='erp_tables_description',
+            index=models.Index(fields=['connection_id', 'table'], name='erp_tables_conn_table_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.13 on 2025-10-07 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connection', '0010_erp_tables_description_conn_table_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableColumnStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=255)),
+                ('column_name', models.CharField(max_length=255)),
+                ('position', models.IntegerField(default=0)),
+                ('row_count', models.IntegerField(default=0)),
+                ('non_empty_count', models.IntegerField(default=0)),
+                ('max_rowid', models.BigIntegerField(default=0)),
+                ('refreshed_on', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('table_name', 'column_name')},
+            },
+        ),
+    ]
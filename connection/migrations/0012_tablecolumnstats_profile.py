@@ -0,0 +1,33 @@
+# Generated by Django 5.0.13 on 2025-10-09 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connection', '0011_tablecolumnstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tablecolumnstats',
+            name='null_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tablecolumnstats',
+            name='distinct_estimate',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tablecolumnstats',
+            name='top_values',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='tablecolumnstats',
+            name='sketch',
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.13 on 2025-10-10 11:05
+
+from django.db import migrations, models
+
+
+def fill_target_table(apps, schema_editor):
+    # Watermarks so far always described the local table named like the SAP table;
+    # of several connections' marks on one table only the latest still matches it
+    ExtractionWatermark = apps.get_model('connection', 'ExtractionWatermark')
+    seen = set()
+    for mark in ExtractionWatermark.objects.order_by('-last_extracted_on'):
+        if mark.table_name in seen:
+            mark.delete()
+            continue
+        seen.add(mark.table_name)
+        mark.target_table = mark.table_name
+        mark.save(update_fields=['target_table'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connection', '0012_tablecolumnstats_profile'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='extractionwatermark',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='extractionwatermark',
+            name='target_table',
+            field=models.CharField(default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_target_table, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='extractionwatermark',
+            unique_together={('table_name', 'target_table')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.13 on 2025-10-10 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connection', '0013_extractionwatermark_target_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saptablemetadata',
+            name='field_types',
+            field=models.JSONField(default=dict),
+        ),
+    ]
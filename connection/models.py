@@ -66,6 +66,11 @@ class erp_tables_description(models.Model):
     )
     table = models.CharField(max_length=50, blank=False, null=False)
     description = models.CharField(max_length=255, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['connection_id', 'table'], name='erp_tables_conn_table_idx'),  # Keyset paging in SAPtables
+        ]
  
     def __str__ (self):
         return self.table
@@ -249,4 +254,69 @@ class FileConnection(models.Model):
     def __str__(self):
         return self.fileName  
     
-    
\ No newline at end of file
+    
+
+
+class ExtractionWatermark(models.Model):
+    connection_id = models.ForeignKey(
+        Connection,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,  # Null for tables pulled with the default SAP logon
+        related_name='watermarks'  # Helpful for reverse lookups
+    )
+    table_name = models.CharField(max_length=50)
+    target_table = models.CharField(max_length=255)  # Local SQLite table the watermark describes
+    delta_field = models.CharField(max_length=50)  # e.g. AEDAT / LAEDA, or a key field for key ranges
+    watermark = models.CharField(max_length=255, blank=True, null=True)  # Highest delta_field value loaded
+    rows_loaded = models.IntegerField(default=0)
+    last_extracted_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('table_name', 'target_table')
+
+    def __str__(self):
+        return f"{self.table_name}.{self.delta_field} >= {self.watermark}"
+
+
+
+class SapTableMetadata(models.Model):
+    connection_id = models.ForeignKey(
+        Connection,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,  # Null for tables read with the default SAP logon
+        related_name='table_metadata'  # Helpful for reverse lookups
+    )
+    table_name = models.CharField(max_length=50)
+    key_fields = models.JSONField(default=list)  # ["MANDT", "MATNR", ...]
+    field_catalog = models.JSONField(default=list)  # [["MANDT", 3], ["MATNR", 40], ...] in DDIC order
+    field_types = models.JSONField(default=dict)  # {"MANDT": "C", "MENGE": "P", ...}, filled on first typed extract
+    fetched_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('connection_id', 'table_name')
+
+    def __str__(self):
+        return f"{self.table_name} ({len(self.field_catalog)} fields)"
+
+
+
+class TableColumnStats(models.Model):
+    table_name = models.CharField(max_length=255)  # Segment, _src, _err ... table in the default database
+    column_name = models.CharField(max_length=255)
+    position = models.IntegerField(default=0)  # cid from PRAGMA table_info
+    row_count = models.IntegerField(default=0)
+    non_empty_count = models.IntegerField(default=0)  # Neither NULL nor blank after trimming
+    null_count = models.IntegerField(default=0)
+    distinct_estimate = models.IntegerField(default=0)  # Non-NULL values, estimated from sketch
+    top_values = models.JSONField(default=list)  # [[value, count], ...] most frequent non-NULL values
+    sketch = models.JSONField(default=list)  # Smallest value hashes (KMV), merged when rows are appended
+    max_rowid = models.BigIntegerField(default=0)  # MAX(ROWID) when computed, to notice appended rows
+    refreshed_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('table_name', 'column_name')
+
+    def __str__(self):
+        return f"{self.table_name}.{self.column_name}: {self.non_empty_count}/{self.row_count}"
@@ -0,0 +1,319 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .bulk_load import create_index, insert_rows
+from .column_types import sap_sqlite_type, sap_value, sap_literal
+from .models import ExtractionWatermark, SapTableMetadata, erp_tables_description
+from .table_stats import invalidate_column_stats
+from .utils import (read_table_layout, read_chunks, chunk_workers, chunk_row_count, plan_field_chunks,
+                    iter_table_descriptions, read_field_types)
+
+
+def _page_size(page_size):
+    return int(page_size or getattr(settings, 'SAP_RFC_PAGE_SIZE', 50000))
+
+
+def cached_table_metadata(connection, table_names):
+    """
+    Unexpired SapTableMetadata rows for table_names, keyed by table name.
+    Never calls SAP; tables that are not cached are simply missing.
+    """
+    cutoff = timezone.now() - timedelta(seconds=int(getattr(settings, 'SAP_METADATA_TTL', 86400)))
+    metadata = SapTableMetadata.objects.filter(connection_id=connection, table_name__in=table_names,
+                                               fetched_on__gte=cutoff)
+    return {m.table_name: m for m in metadata}
+
+
+def get_table_layout(pool, table_name, connection=None, refresh=False):
+    """
+    Key fields, field catalog and field chunks of table_name.
+    Served from SapTableMetadata while it is younger than SAP_METADATA_TTL,
+    otherwise read through CACS_GET_TABLE_FIELD450 / Z450RFC_READ_TABLE and cached.
+    """
+    table_name = table_name.upper()
+    if not refresh:
+        metadata = cached_table_metadata(connection, [table_name]).get(table_name)
+        if metadata is not None:
+            keyFields = list(metadata.key_fields)
+            catalog = [(fieldName, int(length)) for fieldName, length in metadata.field_catalog]
+            return keyFields, catalog, plan_field_chunks(keyFields, catalog)
+
+    keyFields, catalog, chunks = read_table_layout(pool, table_name)
+    SapTableMetadata.objects.update_or_create(
+        connection_id=connection, table_name=table_name,
+        defaults={'key_fields': keyFields, 'field_catalog': [list(f) for f in catalog], 'field_types': {}},
+    )
+    return keyFields, catalog, chunks
+
+
+def invalidate_table_metadata(connection=None, table_name=None):
+    """Drop the cached layout of one table, or of every table of the connection."""
+    metadata = SapTableMetadata.objects.filter(connection_id=connection)
+    if table_name:
+        metadata = metadata.filter(table_name=table_name.upper())
+    metadata.delete()
+
+
+def iter_table_pages(pool, executor, table_name, keyFields, chunks, page_size, options=None):
+    """
+    Yield the table page by page as {field: [values]}, reading every page with
+    ROWSKIPS/ROWCOUNT for all field chunks. Stops after the first page when the
+    function module turns out to ignore the paging parameters.
+    Tables without key fields are read in one call: their pages can neither be
+    aligned across chunks nor told apart from a repeated first page.
+    """
+    if not keyFields:
+        page = read_chunks(pool, executor, table_name, chunks, keyFields, options=options)
+        if chunk_row_count(page):
+            yield page
+        return
+
+    rowskips = 0
+    first_key = None
+    while True:
+        page = read_chunks(pool, executor, table_name, chunks, keyFields,
+                           rowskips=rowskips, rowcount=page_size, options=options)
+        count = chunk_row_count(page)
+        page_key = tuple(page[k][0] for k in keyFields) if count else None
+        if rowskips and page_key == first_key:
+            # A page that starts where the first one did means ROWSKIPS was ignored
+            return
+        if first_key is None:
+            first_key = page_key
+        if count:
+            yield page
+
+        if count > page_size:
+            # The function module ignored ROWSKIPS/ROWCOUNT and returned everything
+            print(f"{table_name}: paging not supported by Z450RFC_READ_TAB_DATA, read in one call")
+            return
+        if count < page_size:
+            return
+        rowskips += page_size
+
+
+def _page_rows(page, columns, column_types=None):
+    empty = [None] * chunk_row_count(page)
+    if not column_types:
+        return list(zip(*(page.get(c, empty) for c in columns)))
+    return list(zip(*([sap_value(v, column_types.get(c, "TEXT")) for v in page.get(c, empty)]
+                      for c in columns)))
+
+
+def sap_column_types(pool, table_name, columns, connection=None):
+    """
+    {field: INTEGER/REAL/DATE/TEXT} from the ABAP types of the field catalog.
+    The ABAP types are kept with the cached layout in SapTableMetadata and only
+    read through RFC when the cached row has none yet.
+    """
+    metadata = cached_table_metadata(connection, [table_name]).get(table_name)
+    abapTypes = dict(metadata.field_types) if metadata is not None else {}
+    if not abapTypes:
+        with pool.connection() as hRFC:
+            abapTypes = read_field_types(hRFC, table_name)
+        if metadata is not None:
+            metadata.field_types = abapTypes
+            # .update() keeps fetched_on: the types share the age of the layout
+            SapTableMetadata.objects.filter(pk=metadata.pk).update(field_types=abapTypes)
+    return {c: sap_sqlite_type(abapTypes.get(c)) for c in columns}
+
+
+def _local_column_types(cursor, table_name):
+    cursor.execute(f'PRAGMA table_info("{table_name}")')
+    return {row[1]: (row[2] or "TEXT").upper() for row in cursor.fetchall()}
+
+
+def _staging_table(target_table):
+    return f"{target_table}__staging"
+
+
+def _drop_table(table_name, database):
+    with connections[database].cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+
+
+def _load_staging(pool, table_name, staging, columns, column_types, keyFields, chunks, page_size,
+                  parallel, database, options=None):
+    """
+    Recreate the staging table and write every page of table_name into it,
+    each page in its own short transaction: SQLite's write lock is never held
+    while SAP is being read. The staging table is dropped again on failure.
+    Returns the number of rows written.
+    """
+    with transaction.atomic(using=database), connections[database].cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS "{staging}"')
+        cursor.execute(f'CREATE TABLE "{staging}" ('
+                       + ", ".join(f'"{c}" {column_types.get(c, "TEXT")}' for c in columns) + ")")
+    written = 0
+    try:
+        with ThreadPoolExecutor(max_workers=chunk_workers(pool, chunks, parallel)) as executor:
+            for page in iter_table_pages(pool, executor, table_name, keyFields, chunks, page_size,
+                                         options=options):
+                with transaction.atomic(using=database), connections[database].cursor() as cursor:
+                    written += insert_rows(cursor, staging, columns, _page_rows(page, columns, column_types))
+    except BaseException:
+        _drop_table(staging, database)
+        raise
+    return written
+
+
+def extract_table_to_sqlite(pool, table_name, target_table=None, page_size=None,
+                            parallel=None, database='default', connection=None, typed=None):
+    """
+    Stream a SAP table into SQLite one page of rows at a time.
+
+    Every page is read with ROWSKIPS/ROWCOUNT for all field chunks, joined on the
+    key fields and written with executemany before the next page is requested,
+    so memory stays bounded by page_size rather than by the table size.
+    Pages go to <target>__staging, each in its own transaction; one short
+    transaction at the end replaces the target with it and indexes the key
+    fields, so readers see the old table until then.
+    With typed (default SAP_TYPED_COLUMNS) integer, float and date fields get
+    INTEGER, REAL and DATE columns; packed numbers stay TEXT to keep them exact.
+    Returns the number of rows written.
+    """
+    table_name = table_name.upper()
+    target_table = target_table or table_name
+    page_size = _page_size(page_size)
+    if typed is None:
+        typed = getattr(settings, 'SAP_TYPED_COLUMNS', False)
+
+    keyFields, catalog, chunks = get_table_layout(pool, table_name, connection=connection)
+    columns = [fieldName for fieldName, _ in catalog]
+    column_types = sap_column_types(pool, table_name, columns, connection=connection) if typed else {}
+
+    staging = _staging_table(target_table)
+    written = _load_staging(pool, table_name, staging, columns, column_types, keyFields, chunks,
+                            page_size, parallel, database)
+    with transaction.atomic(using=database), connections[database].cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS "{target_table}"')
+        cursor.execute(f'ALTER TABLE "{staging}" RENAME TO "{target_table}"')
+        create_index(cursor, target_table, keyFields)
+        invalidate_column_stats(target_table)
+
+    print(f"Table '{target_table}' extracted: {written} rows.")
+    return written
+
+
+def _local_table_exists(cursor, table_name):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=%s", [table_name])
+    return cursor.fetchone() is not None
+
+
+def _max_value(cursor, table_name, field):
+    cursor.execute(f'SELECT MAX("{field}") FROM "{table_name}"')
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def refresh_table_delta(pool, table_name, connection=None, delta_field=None, target_table=None,
+                        page_size=None, parallel=None, database='default', typed=None):
+    """
+    Bring the local SQLite copy of a SAP table up to date using a watermark.
+
+    The watermark is the highest delta_field value loaded so far, stored per
+    table and local target table in ExtractionWatermark together with the
+    connection it was loaded from; a target last loaded from another
+    connection is extracted in full again. delta_field must be given (or be
+    stored with the watermark): a change date such as AEDAT / LAEDA, or the
+    single key field of an append-only table. A field of a composite key is
+    refused, its maximum does not order new rows (a new document's item 10
+    sorts below an old document's item 20). Only rows with
+    delta_field >= watermark are read (as an OPTIONS WHERE clause) and
+    upserted on the key fields. Rows deleted in SAP are not picked up: they
+    stay in the local table until the next full extraction.
+    Without a watermark or a local table the whole table is extracted first
+    (typed as in extract_table_to_sqlite); delta rows follow the column types
+    of the existing local table.
+    Returns the number of rows written.
+    """
+    table_name = table_name.upper()
+    target_table = target_table or table_name
+    page_size = _page_size(page_size)
+
+    mark = ExtractionWatermark.objects.filter(table_name=table_name, target_table=target_table).first()
+    keyFields, catalog, chunks = get_table_layout(pool, table_name, connection=connection)
+    columns = [fieldName for fieldName, _ in catalog]
+    if not keyFields:
+        raise ValueError(f"{table_name} has no key fields to upsert on")
+    delta_field = delta_field or (mark.delta_field if mark else None)
+    if not delta_field:
+        raise ValueError(f"No delta field for {table_name}: pass a change date field such as AEDAT or LAEDA")
+    delta_field = delta_field.upper()
+    if delta_field not in columns:
+        raise ValueError(f"{delta_field} is not a field of {table_name}")
+    if delta_field in keyFields and len(keyFields) > 1:
+        raise ValueError(f"{delta_field} is part of the composite key of {table_name} and cannot order "
+                         f"new rows: pass a change date field such as AEDAT or LAEDA")
+
+    with connections[database].cursor() as cursor:
+        local_exists = _local_table_exists(cursor, target_table)
+
+    if (mark is None or not mark.watermark or mark.delta_field != delta_field or not local_exists
+            or mark.connection_id != connection):
+        written = extract_table_to_sqlite(pool, table_name, target_table=target_table,
+                                          page_size=page_size, parallel=parallel, database=database,
+                                          connection=connection, typed=typed)
+    else:
+        with connections[database].cursor() as cursor:
+            column_types = _local_column_types(cursor, target_table)
+        literal = str(sap_literal(mark.watermark, column_types.get(delta_field))).replace("'", "''")
+        options = [f"{delta_field} >= '{literal}'"]
+        staging = _staging_table(target_table)
+        written = _load_staging(pool, table_name, staging, columns, column_types, keyFields, chunks,
+                                page_size, parallel, database, options=options)
+        # Upsert in one short transaction: changed rows replace their local version, new
+        # rows are added; of a key read twice across pages the last read wins
+        key_join = " AND ".join(f't."{k}" = s."{k}"' for k in keyFields)
+        column_list = ", ".join(f'"{c}"' for c in columns)
+        with transaction.atomic(using=database), connections[database].cursor() as cursor:
+            create_index(cursor, target_table, keyFields)
+            cursor.execute(f'DELETE FROM "{target_table}" WHERE ROWID IN '
+                           f'(SELECT t.ROWID FROM "{staging}" s JOIN "{target_table}" t ON {key_join})')
+            cursor.execute(f'INSERT INTO "{target_table}" ({column_list}) SELECT {column_list} FROM "{staging}" '
+                           f'WHERE ROWID IN (SELECT MAX(ROWID) FROM "{staging}" GROUP BY '
+                           + ", ".join(f'"{k}"' for k in keyFields) + ")")
+            cursor.execute(f'DROP TABLE "{staging}"')
+            # Upserted rows replace rows in place, which the stats cannot fold in
+            invalidate_column_stats(target_table)
+        print(f"Table '{target_table}' delta refreshed from {delta_field} >= {mark.watermark}: {written} rows.")
+
+    with connections[database].cursor() as cursor:
+        watermark = _max_value(cursor, target_table, delta_field)
+    ExtractionWatermark.objects.update_or_create(
+        table_name=table_name, target_table=target_table,
+        defaults={'connection_id': connection, 'delta_field': delta_field, 'watermark': watermark,
+                  'rows_loaded': written},
+    )
+    return written
+
+
+def load_table_descriptions(pool, connection, batch_size=None):
+    """
+    Replace the ERP table catalog (erp_tables_description) of one connection.
+
+    Rows are streamed from ZTABLE_NAMES_DESC and written with bulk_create in
+    fixed batches, so memory stays flat however large the catalog is. The
+    delete of the old rows and all inserts run in one transaction: readers see
+    either the old catalog or the complete new one.
+    Returns the number of tables loaded.
+    """
+    batch_size = int(batch_size or getattr(settings, 'ERP_TABLES_BATCH_SIZE', 5000))
+    loaded = 0
+    batch = []
+    with pool.connection() as hRFC, transaction.atomic():
+        erp_tables_description.objects.filter(connection_id=connection).delete()
+        for tab, desc in iter_table_descriptions(hRFC):
+            batch.append(erp_tables_description(connection_id=connection, table=tab, description=desc))
+            if len(batch) >= batch_size:
+                erp_tables_description.objects.bulk_create(batch)
+                loaded += len(batch)
+                batch = []
+        if batch:
+            erp_tables_description.objects.bulk_create(batch)
+            loaded += len(batch)
+    return loaded
@@ -62,4 +62,9 @@ class ErpTablesSerializer(serializers.ModelSerializer):
 class ChatSerializer(serializers.ModelSerializer):
     class Meta:
         model = Chat
-        fields = '__all__'              
\ No newline at end of file
+        fields = '__all__'              
+
+class SapTableMetadataSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SapTableMetadata
+        fields = '__all__'
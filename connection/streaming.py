@@ -0,0 +1,148 @@
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from .bulk_load import quote_name
+
+STREAM_FORMATS = ("json", "ndjson")
+CONTENT_TYPES = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+
+def _encode(value):
+    # Same encoder as JsonResponse, so streamed and buffered rows look alike
+    return json.dumps(value, cls=DjangoJSONEncoder)
+
+
+def _batch_size(batch_size):
+    return int(batch_size or getattr(settings, 'STREAM_BATCH_SIZE', 5000))
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Lets DRF views accept Accept: application/x-ndjson. Streamed responses
+    bypass it; buffered ones (errors, small payloads) become one JSON line.
+    """
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return (_encode(data) + "\n").encode()
+
+
+def stream_format(request):
+    """
+    'json' or 'ndjson' when the client asked for a streamed response
+    (?stream=json|ndjson, or Accept: application/x-ndjson), else None.
+    """
+    fmt = (request.GET.get('stream') or "").lower()
+    if fmt in ("1", "true"):
+        fmt = "json"
+    if fmt in STREAM_FORMATS:
+        return fmt
+    if "application/x-ndjson" in request.META.get('HTTP_ACCEPT', ""):
+        return "ndjson"
+    return None
+
+
+def iter_table_rows(table_name, columns=None, database='default', batch_size=None,
+                    skip_empty=False, blank_as_null=False):
+    """
+    Yield the rows of table_name as dicts, fetched batch_size at a time from one
+    cursor, so only one batch is held in memory.
+    skip_empty leaves out NULL/'' values (and rows with nothing left);
+    blank_as_null turns whitespace-only strings into None.
+    """
+    batch_size = _batch_size(batch_size)
+    select_list = ", ".join(quote_name(c) for c in columns) if columns else "*"
+    with connections[database].cursor() as cursor:
+        cursor.execute(f"SELECT {select_list} FROM {quote_name(table_name)}")
+        names = [col[0] for col in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                if blank_as_null:
+                    row = [None if isinstance(v, str) and not v.strip() else v for v in row]
+                if skip_empty:
+                    record = {c: v for c, v in zip(names, row) if v is not None and v != ""}
+                    if record:
+                        yield record
+                else:
+                    yield dict(zip(names, row))
+
+
+def json_array_chunks(rows, batch_size=None):
+    """Encode rows as one JSON array, yielded batch_size elements per chunk."""
+    batch_size = _batch_size(batch_size)
+    yield "["
+    batch, first = [], True
+    for row in rows:
+        batch.append(_encode(row))
+        if len(batch) >= batch_size:
+            yield ("" if first else ",") + ",".join(batch)
+            batch, first = [], False
+    if batch:
+        yield ("" if first else ",") + ",".join(batch)
+    yield "]"
+
+
+def ndjson_chunks(rows, batch_size=None):
+    """Encode rows as newline-delimited JSON, batch_size lines per chunk."""
+    batch_size = _batch_size(batch_size)
+    batch = []
+    for row in rows:
+        batch.append(_encode(row))
+        if len(batch) >= batch_size:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+def json_document_chunks(head, key, rows, batch_size=None):
+    """Encode {**head, key: [rows]} with the rows streamed as the last member."""
+    yield _encode(head)[:-1] + ("," if head else "") + _encode(key) + ":"
+    yield from json_array_chunks(rows, batch_size)
+    yield "}"
+
+
+def streaming_response(chunks, fmt="json", filename=None):
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[fmt])
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def stream_rows_response(rows, fmt="json", filename=None, head=None, key="rows", batch_size=None):
+    """
+    StreamingHttpResponse of rows: a JSON array (or {**head, key: [...]} when a
+    head is given) or NDJSON, where a head becomes the first line.
+    """
+    if fmt == "ndjson":
+        chunks = ndjson_chunks(rows, batch_size)
+        if head is not None:
+            chunks = _prepend(_encode(head) + "\n", chunks)
+    elif head is not None:
+        chunks = json_document_chunks(head, key, rows, batch_size)
+    else:
+        chunks = json_array_chunks(rows, batch_size)
+    return streaming_response(chunks, fmt, filename)
+
+
+def _prepend(first, chunks):
+    yield first
+    yield from chunks
+
+
+def stream_table_response(table_name, fmt="json", columns=None, filename=None, database='default',
+                          head=None, key="rows", **row_options):
+    """Stream a whole table; row_options go to iter_table_rows."""
+    rows = iter_table_rows(table_name, columns=columns, database=database, **row_options)
+    return stream_rows_response(rows, fmt, filename=filename, head=head, key=key)
@@ -0,0 +1,230 @@
+import hashlib
+import heapq
+from datetime import timedelta
+from itertools import count
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .bulk_load import quote_name
+from .models import TableColumnStats
+
+# Number of smallest value hashes kept per column (KMV sketch). Distinct counts
+# below it are exact, above it the estimate is within a few percent.
+SKETCH_SIZE = 256
+_HASH_SPACE = 2 ** 63
+_FETCH_SIZE = 10000
+
+
+def table_columns(cursor, table_name):
+    """Column names of table_name in table order."""
+    cursor.execute(f"PRAGMA table_info({quote_name(table_name)})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _max_rowid(cursor, table_name):
+    cursor.execute(f"SELECT COALESCE(MAX(ROWID), 0) FROM {quote_name(table_name)}")
+    return cursor.fetchone()[0]
+
+
+def _non_empty(column):
+    return f"SUM(CASE WHEN TRIM(COALESCE({quote_name(column)}, '')) <> '' THEN 1 ELSE 0 END)"
+
+
+def _top_k():
+    return int(getattr(settings, 'TABLE_STATS_TOP_K', 20))
+
+
+def _json_value(value):
+    # Values are kept in JSONFields; BLOBs and the like are stored as text
+    return value if value is None or isinstance(value, (str, int, float)) else str(value)
+
+
+def _value_hash(value):
+    return int.from_bytes(hashlib.blake2b(repr(value).encode(), digest_size=8).digest(), 'big') >> 1
+
+
+def distinct_estimate(sketch):
+    """Distinct values behind a KMV sketch (ascending list of the smallest hashes)."""
+    if len(sketch) < SKETCH_SIZE:
+        return len(sketch)
+    return int((SKETCH_SIZE - 1) * _HASH_SPACE / (sketch[-1] + 1))
+
+
+def _profile_column(cursor, table_name, column, since_rowid, max_rowid, previous=None):
+    """
+    Top values and sketch of column over the rows in (since_rowid, max_rowid],
+    merged into previous (a TableColumnStats) when given. One GROUP BY on the
+    column; only top-k and SKETCH_SIZE entries are held in memory.
+    """
+    top_k = _top_k()
+    carried = {v: n for v, n in previous.top_values} if previous else {}
+    top, hashes, order = [], [], count()
+
+    def offer(value, n):
+        entry = (n, next(order), value)
+        if len(top) < top_k:
+            heapq.heappush(top, entry)
+        elif n > top[0][0]:
+            heapq.heapreplace(top, entry)
+
+    q = quote_name(column)
+    cursor.execute(f"SELECT {q}, COUNT(*) FROM {quote_name(table_name)} "
+                   f"WHERE ROWID > %s AND ROWID <= %s AND {q} IS NOT NULL GROUP BY {q}",
+                   [since_rowid, max_rowid])
+    for rows in iter(lambda: cursor.fetchmany(_FETCH_SIZE), []):
+        for value, n in rows:
+            value = _json_value(value)
+            offer(value, n + carried.pop(value, 0))
+            h = _value_hash(value)
+            if len(hashes) < SKETCH_SIZE:
+                heapq.heappush(hashes, -h)
+            elif h < -hashes[0]:
+                heapq.heapreplace(hashes, -h)
+    # Earlier top values that did not occur in the new rows keep their count
+    for value, n in carried.items():
+        offer(value, n)
+
+    sketch = sorted(set(previous.sketch if previous else []) | {-h for h in hashes})[:SKETCH_SIZE]
+    return {
+        'top_values': [[value, n] for n, _, value in sorted(top, reverse=True)],
+        'sketch': sketch,
+        'distinct_estimate': distinct_estimate(sketch),
+    }
+
+
+def _scan(cursor, table_name, columns, since_rowid, max_rowid, previous):
+    """
+    Statistics of columns over the rows in (since_rowid, max_rowid], added to
+    previous ({column: TableColumnStats}) where present: one counting pass for
+    all columns, then one GROUP BY per column.
+    """
+    counts = ", ".join(f"SUM({quote_name(c)} IS NULL), {_non_empty(c)}" for c in columns)
+    cursor.execute(f"SELECT COUNT(*), {counts} FROM {quote_name(table_name)} "
+                   f"WHERE ROWID > %s AND ROWID <= %s", [since_rowid, max_rowid])
+    row_count, *column_counts = cursor.fetchone()
+
+    result = {}
+    for i, column in enumerate(columns):
+        before = previous.get(column)
+        values = {
+            'row_count': row_count,
+            'null_count': column_counts[2 * i] or 0,
+            'non_empty_count': column_counts[2 * i + 1] or 0,
+            'max_rowid': max_rowid,
+        }
+        if before is not None:
+            for field in ('row_count', 'null_count', 'non_empty_count'):
+                values[field] += getattr(before, field)
+        values.update(_profile_column(cursor, table_name, column, since_rowid, max_rowid, before))
+        result[column] = values
+    return result
+
+
+def refresh_column_stats(table_name, columns=None, database='default'):
+    """
+    Recompute TableColumnStats of table_name from scratch, for the given
+    columns or all of them. Stats of the other columns are left as they are.
+    """
+    with connections[database].cursor() as cursor:
+        all_columns = table_columns(cursor, table_name)
+        if not all_columns:
+            TableColumnStats.objects.filter(table_name=table_name).delete()
+            return []
+        columns = [c for c in all_columns if columns is None or c in columns]
+        max_rowid = _max_rowid(cursor, table_name)
+        computed = _scan(cursor, table_name, columns, 0, max_rowid, {}) if columns else {}
+
+    stats = [TableColumnStats(table_name=table_name, column_name=column, position=all_columns.index(column),
+                              **values)
+             for column, values in computed.items()]
+    stale = TableColumnStats.objects.filter(table_name=table_name)
+    if len(columns) < len(all_columns):
+        stale = stale.filter(column_name__in=columns)
+    with transaction.atomic():
+        stale.delete()
+        TableColumnStats.objects.bulk_create(stats)
+    return stats
+
+
+def _append_column_stats(table_name, stats, max_rowid, database='default'):
+    """
+    Fold the rows appended after each stat's max_rowid into it. Counts stay
+    exact, top values are approximate (values outside the stored top-k restart
+    at zero) until the next full refresh. refreshed_on is not touched, so the
+    TABLE_STATS_TTL full refresh still comes due.
+    """
+    by_since = {}
+    for stat in stats:
+        by_since.setdefault(stat.max_rowid, []).append(stat)
+    with connections[database].cursor() as cursor:
+        for since, group in by_since.items():
+            computed = _scan(cursor, table_name, [s.column_name for s in group], since, max_rowid,
+                             {s.column_name: s for s in group})
+            for stat in group:
+                for field, value in computed[stat.column_name].items():
+                    setattr(stat, field, value)
+    TableColumnStats.objects.bulk_update(stats, ['row_count', 'null_count', 'non_empty_count', 'max_rowid',
+                                                 'top_values', 'sketch', 'distinct_estimate'])
+
+
+def invalidate_column_stats(table_name, columns=None):
+    """
+    Forget the stats of table_name (or of some of its columns) after rows were
+    updated or deleted; they are recomputed on the next read. Appended rows need
+    no invalidation, column_stats folds them in.
+    """
+    stats = TableColumnStats.objects.filter(table_name__iexact=table_name)
+    if columns is not None:
+        # SQL names are case-insensitive and may come quoted
+        wanted = {str(c).strip().strip('"').lower() for c in columns}
+        stats = stats.filter(pk__in=[s.pk for s in stats if s.column_name.lower() in wanted])
+    stats.delete()
+
+
+def column_stats(table_name, database='default'):
+    """
+    TableColumnStats of table_name in column order, read from the catalog.
+    Columns whose stats were invalidated are recomputed, rows appended since
+    the last read (MAX(ROWID) moved) are folded in, and everything is rebuilt
+    when the columns changed, rows disappeared or the stats are older than
+    TABLE_STATS_TTL seconds. Checking that never scans the table.
+    """
+    stored = {s.column_name: s for s in TableColumnStats.objects.filter(table_name=table_name)}
+    with connections[database].cursor() as cursor:
+        columns = table_columns(cursor, table_name)
+        max_rowid = _max_rowid(cursor, table_name) if columns else 0
+    cutoff = timezone.now() - timedelta(seconds=int(getattr(settings, 'TABLE_STATS_TTL', 3600)))
+    positions = {c: i for i, c in enumerate(columns)}
+
+    if any(positions.get(name) != s.position or s.max_rowid > max_rowid or s.refreshed_on < cutoff
+           for name, s in stored.items()):
+        stats = refresh_column_stats(table_name, database=database)
+        return sorted(stats, key=lambda s: s.position)
+
+    missing = [c for c in columns if c not in stored]
+    behind = [s for s in stored.values() if s.max_rowid < max_rowid]
+    if missing:
+        refresh_column_stats(table_name, missing, database)
+    if behind:
+        _append_column_stats(table_name, behind, max_rowid, database)
+    if missing or behind:
+        stored = {s.column_name: s for s in TableColumnStats.objects.filter(table_name=table_name)}
+    return [stored[c] for c in columns if c in stored]
+
+
+def column_stats_by_name(table_name, database='default'):
+    """{column: TableColumnStats} of table_name."""
+    return {s.column_name: s for s in column_stats(table_name, database)}
+
+
+def non_empty_columns(table_name, database='default'):
+    """Columns of table_name holding at least one non-blank value, in table order."""
+    return [s.column_name for s in column_stats(table_name, database) if s.non_empty_count > 0]
+
+
+def column_display_flags(table_name, database='default'):
+    """[{key, value, display}] for the rules grid; display is 1 when the column has a non-empty value."""
+    return [{'key': s.position, 'value': s.column_name, 'display': int(s.non_empty_count > 0)}
+            for s in column_stats(table_name, database)]
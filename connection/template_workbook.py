@@ -0,0 +1,45 @@
+from datetime import date, datetime
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# Rows of a segment sheet that are not data: title/description rows above the
+# technical field names (row 5) and the description rows below them
+SEGMENT_SKIP_ROWS = frozenset([0, 1, 2, 3, 5, 6, 7])
+
+
+def open_template_workbook(file):
+    """
+    Open a migration template once, read-only, so the segment sheets are
+    streamed from the same parse instead of reloading the file per sheet.
+    The caller closes it.
+    """
+    return load_workbook(file, read_only=True, data_only=False)
+
+
+def _cell_text(value):
+    # Same text Excel shows: dates as DD.MM.YYYY, everything else as str
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%d.%m.%Y')
+    return value if isinstance(value, str) else str(value)
+
+
+def read_segment_sheet(workbook, sheet_name):
+    """
+    Read one segment sheet in a single pass as a DataFrame of strings, with the
+    technical field names (row 5) as header and the data from row 9 onwards.
+    """
+    rows = (row for index, row in enumerate(workbook[sheet_name].iter_rows(values_only=True))
+            if index not in SEGMENT_SKIP_ROWS)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    width = len(header)
+    data = []
+    for row in rows:
+        values = [_cell_text(v) for v in row[:width]]
+        values.extend([""] * (width - len(values)))
+        data.append(values)
+    return pd.DataFrame(data, columns=[_cell_text(h) for h in header])
@@ -1,3 +1,1280 @@
-from django.test import TestCase
+import io
+import json
+import os
+import sqlite3
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import pandas as pd
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from DMtool.change_capture import CAPTURE_TABLE, MAX_CAPTURE_AGE, TableChangeCapture
+from .bulk_load import bulk_insert_frames, bulk_load_pragmas, create_index, ensure_index
+from .column_types import infer_sqlite_type, sap_literal, sap_sqlite_type, sap_value
+from .columnar_export import columnar_export_available, export_chunks, export_schema
+from .hana import close_hana_pool, extract_hana_table, get_hana_connection_pool, get_hana_pool
+from .models import (Connection, ExtractionWatermark, Project, Rule, SapTableMetadata, TableColumnStats,
+                     erp_tables_description, fields, objects, segments)
+from .sap_extract import (extract_table_to_sqlite, get_table_layout, invalidate_table_metadata, iter_table_pages,
+                          load_table_descriptions, refresh_table_delta)
+from .streaming import iter_table_rows, json_array_chunks, stream_rows_response
+from .template_workbook import open_template_workbook, read_segment_sheet
+from .table_stats import column_display_flags, column_stats_by_name, invalidate_column_stats
+from .utils import (ChunkMergeError, ConnectionPool, RfcError, chunk_workers, default_rfc_params,
+                    merge_chunk_columns, plan_field_chunks, read_sap_table)
+from .views import (ERP_TABLES_PAGE_SIZE, _correlated_update_sql, _update_from_sql,
+                    compile_rule_plan, copy_data_between_tables_with_field_mapping, erp_tables_page, run_rule_plan, insert_data_from_dataframe,
+                    load_delimited_upload, table_rowid_marks, update_columns_with_constants,
+                    invalidate_segment_stats, remove_duplicate_rows_group_by_all, table_page,
+                    update_related_data_with_mapping_and_composite_pks)
+
+
+def create_table(table_name, columns, rows):
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE "{table_name}" ({", ".join(columns)})')
+        cursor.executemany(f'INSERT INTO "{table_name}" VALUES ({", ".join(["%s"] * len(columns))})', rows)
+
+
+def create_segment(table_name):
+    project = Project.objects.create(project_name="p")
+    obj = objects.objects.create(project_id=project)
+    return segments.objects.create(project_id=project, obj_id=obj, table_name=table_name)
+
+
+def table_rows(table_name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT ROWID, * FROM "{table_name}" ORDER BY ROWID')
+        return cursor.fetchall()
+
+
+class RelatedUpdateTests(TestCase):
+    """UPDATE ... FROM and the correlated subqueries must give the same rows."""
+
+    def setUp(self):
+        create_table("upd_src", ["K1", "K2", "V", "W"], [
+            ("A", "1", "a1", "keep"),
+            ("A", "1", "a1-dup", "keep"),   # duplicate key: the first row wins
+            ("B", "1", "b1", "skip"),       # filtered out by the condition...
+            ("B", "1", "b1-dup", "keep"),   # ...so the second row of the key wins
+            ("C", None, "c-null", "keep"),  # NULL keys never match
+            ("D", "1", None, "keep"),       # a NULL value is still copied
+        ])
+        target = [
+            ("A", "1", "old", "old"),
+            ("B", "1", "old", "old"),
+            ("C", None, "old", "old"),
+            ("D", "1", "old", "old"),
+            ("E", "1", "old", "old"),       # no source row: untouched
+        ]
+        create_table("upd_from", ["K1", "K2", "X", "Y"], target)
+        create_table("upd_corr", ["K1", "K2", "X", "Y"], target)
+
+    def run_update(self, sql_form, target, condition):
+        sql = sql_form("upd_src", target, {"V": "X", "W": "Y"}, condition, ["K1", "K2"], ["K1", "K2"])
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+        return table_rows(target)
+
+    @skipUnless(sqlite3.sqlite_version_info >= (3, 33, 0), "UPDATE ... FROM needs SQLite 3.33")
+    def test_same_result_with_condition(self):
+        condition = "upd_src.W <> 'skip'"
+        self.assertEqual(self.run_update(_update_from_sql, "upd_from", condition),
+                         self.run_update(_correlated_update_sql, "upd_corr", condition))
+
+    @skipUnless(sqlite3.sqlite_version_info >= (3, 33, 0), "UPDATE ... FROM needs SQLite 3.33")
+    def test_same_result_without_condition(self):
+        rows = self.run_update(_update_from_sql, "upd_from", "")
+        self.assertEqual(rows, self.run_update(_correlated_update_sql, "upd_corr", ""))
+        self.assertEqual(rows[0][3:], ("a1", "keep"))
+        self.assertEqual(rows[2][3:], ("old", "old"))
+
+    def test_dual_write_updates_the_src_copy(self):
+        create_table("upd_from_src", ["K1", "K2", "X", "Y"], [("A", "1", "old", "old")])
+        update_related_data_with_mapping_and_composite_pks("upd_src", "upd_from", {"V": "X"}, "", ["K1", "K2"],
+                                                           ["K1", "K2"], dual_write=True)
+        self.assertEqual(table_rows("upd_from")[0][3], "a1")
+        self.assertEqual(table_rows("upd_from_src")[0][3], "a1")
+
+
+
+
+
+
+
+class ColumnStatsTests(TestCase):
+
+    def setUp(self):
+        create_table("stats_t", ["A", "B"], [("x", None), ("x", " "), ("y", "b"), (None, "b")])
+
+    def test_counts_and_profile(self):
+        stats = column_stats_by_name("stats_t")
+        self.assertEqual([stats["A"].row_count, stats["A"].null_count, stats["A"].non_empty_count], [4, 1, 3])
+        self.assertEqual([stats["B"].null_count, stats["B"].non_empty_count], [1, 2])
+        self.assertEqual(stats["A"].top_values[0], ["x", 2])
+        self.assertEqual(stats["A"].distinct_estimate, 2)
+        self.assertEqual(column_display_flags("stats_t"),
+                         [{'key': 0, 'value': 'A', 'display': 1}, {'key': 1, 'value': 'B', 'display': 1}])
+
+    def test_appended_rows_are_folded_in(self):
+        column_stats_by_name("stats_t")
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO stats_t VALUES ('z', NULL), ('x', NULL)")
+        stats = column_stats_by_name("stats_t")
+        self.assertEqual([stats["A"].row_count, stats["B"].null_count], [6, 3])
+        self.assertEqual(stats["A"].top_values[0], ["x", 3])
+        self.assertEqual(stats["A"].distinct_estimate, 3)
+
+    def test_updated_rows_are_recomputed_after_invalidation(self):
+        column_stats_by_name("stats_t")
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE stats_t SET B = NULL")
+        invalidate_column_stats("STATS_T", ['"B"'])
+        self.assertEqual(TableColumnStats.objects.filter(table_name="stats_t").count(), 1)
+        self.assertEqual(column_stats_by_name("stats_t")["B"].null_count, 4)
+        self.assertEqual(column_display_flags("stats_t")[1]["display"], 0)
+
+    def test_dmtool_run_invalidates_the_segment_and_its_src_copy(self):
+        create_table("stats_t_src", ["A", "B"], [("x", None)])
+        column_stats_by_name("stats_t")
+        column_stats_by_name("stats_t_src")
+        invalidate_segment_stats("stats_t")
+        self.assertFalse(TableColumnStats.objects.filter(table_name__in=["stats_t", "stats_t_src"]).exists())
+
+
+class MergeChunkColumnsTests(SimpleTestCase):
+
+    def test_same_order_takes_columns_over(self):
+        base = {"K": ["1", "2"], "A": ["a1", "a2"]}
+        merged = merge_chunk_columns(base, {"K": ["1", "2"], "B": ["b1", "b2"]}, ["K"])
+        self.assertEqual(merged["B"], ["b1", "b2"])
+
+    def test_rows_are_aligned_on_the_composite_key(self):
+        base = {"K1": ["1", "1", "2"], "K2": ["a", "b", "a"], "A": ["1a", "1b", "2a"]}
+        data = {"K1": ["2", "1", "1"], "K2": ["a", "b", "a"], "B": ["x2a", "x1b", "x1a"]}
+        self.assertEqual(merge_chunk_columns(base, data, ["K1", "K2"])["B"], ["x1a", "x1b", "x2a"])
+
+    def test_first_chunk_is_taken_as_is(self):
+        data = {"K": ["1"], "A": ["a"]}
+        self.assertIs(merge_chunk_columns({}, data, ["K"]), data)
+
+    def test_unmatched_keys_raise(self):
+        base = {"K": ["1", "2"], "A": ["a1", "a2"]}
+        with self.assertRaises(ChunkMergeError):
+            merge_chunk_columns(base, {"K": ["2", "3"], "B": ["b2", "b3"]}, ["K"])
+        with self.assertRaises(ChunkMergeError):
+            merge_chunk_columns(base, {"K": ["2"], "B": ["b2"]}, ["K"])
+
+    def test_duplicate_keys_raise(self):
+        with self.assertRaises(ChunkMergeError):
+            merge_chunk_columns({}, {"K": ["1", "1"], "A": ["a", "b"]}, ["K"])
+
+    def test_keyless_chunks_need_the_same_row_count(self):
+        merged = merge_chunk_columns({"A": ["x", "y"]}, {"B": ["1", "2"]}, [])
+        self.assertEqual(merged, {"A": ["x", "y"], "B": ["1", "2"]})
+        with self.assertRaises(ChunkMergeError):
+            merge_chunk_columns({"A": ["x", "y"]}, {"B": ["1"]}, [])
+
+
+class IterTablePagesTests(SimpleTestCase):
+
+    def pages(self, key_fields, results):
+        with mock.patch("connection.sap_extract.read_chunks", side_effect=results) as read:
+            pages = list(iter_table_pages(None, None, "T", key_fields, [["K"]], 2))
+        return pages, read
+
+    def test_pages_until_a_short_page(self):
+        pages, read = self.pages(["K"], [{"K": ["1", "2"]}, {"K": ["3", "4"]}, {"K": ["5"]}])
+        self.assertEqual([p["K"] for p in pages], [["1", "2"], ["3", "4"], ["5"]])
+        self.assertEqual([c.kwargs["rowskips"] for c in read.call_args_list], [0, 2, 4])
+
+    def test_stops_when_rowskips_is_ignored(self):
+        pages, _ = self.pages(["K"], [{"K": ["1", "2"]}, {"K": ["1", "2"]}])
+        self.assertEqual(len(pages), 1)
+
+    def test_stops_when_everything_comes_back_at_once(self):
+        pages, read = self.pages(["K"], [{"K": ["1", "2", "3"]}])
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(read.call_count, 1)
+
+    def test_keyless_table_is_read_in_one_call(self):
+        pages, read = self.pages([], [{"A": ["x", "y", "z"]}])
+        self.assertEqual(pages, [{"A": ["x", "y", "z"]}])
+        self.assertNotIn("rowcount", read.call_args.kwargs)
+
+
+class FakeSapTable:
+    """Patches the layout lookup and the chunk reads of sap_extract with an in-memory table."""
+
+    def __init__(self, rows, on_read=None, key_fields=("K",), fields=("K", "A")):
+        self.rows = rows
+        self.on_read = on_read
+        self.options = []
+        self.layout = (list(key_fields), [(f, 10) for f in fields], [list(fields)])
+
+    def read_chunks(self, pool, executor, table_name, chunks, key_fields, rowskips=None, rowcount=None,
+                    options=None):
+        if self.on_read:
+            self.on_read(rowskips)
+        self.options.append(options)
+        rows = self.rows[rowskips:rowskips + rowcount] if rowcount else self.rows
+        return {f: [r[i] for r in rows] for i, (f, _) in enumerate(self.layout[1])}
+
+    def __enter__(self):
+        self.patches = [mock.patch("connection.sap_extract.get_table_layout", return_value=self.layout),
+                        mock.patch("connection.sap_extract.read_chunks", side_effect=self.read_chunks)]
+        for patch in self.patches:
+            patch.start()
+        return self
+
+    def __exit__(self, *exc):
+        for patch in self.patches:
+            patch.stop()
+
+
+POOL = SimpleNamespace(max_size=1)
+
+
+def local_tables():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        return {row[0].lower() for row in cursor.fetchall()}
+
+
+class ExtractTableTests(TransactionTestCase):
+
+    def setUp(self):
+        create_table("ext_t", ["K", "A"], [("old", "old")])
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS "ext_t"')
+            cursor.execute('DROP TABLE IF EXISTS "ext_t__staging"')
+
+    def test_target_is_replaced_by_the_staging_table(self):
+        rows = [("1", "a"), ("2", "b"), ("3", "c")]
+        with FakeSapTable(rows):
+            written = extract_table_to_sqlite(POOL, "ext_t", page_size=2, typed=False)
+        self.assertEqual(written, 3)
+        self.assertEqual([r[1:] for r in table_rows("ext_t")], rows)
+        self.assertNotIn("ext_t__staging", local_tables())
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA index_list(\"ext_t\")")
+            self.assertTrue(cursor.fetchall())
+
+    def test_no_transaction_is_open_while_sap_is_read(self):
+        states = []
+        on_read = lambda rowskips: states.append(connections["default"].in_atomic_block)
+        with FakeSapTable([("1", "a"), ("2", "b"), ("3", "c")], on_read):
+            extract_table_to_sqlite(POOL, "ext_t", page_size=2, typed=False)
+        self.assertEqual(states, [False, False])
+
+    def test_failed_read_keeps_the_old_table(self):
+        def on_read(rowskips):
+            if rowskips:
+                raise RuntimeError("RFC failed")
+        with FakeSapTable([("1", "a"), ("2", "b"), ("3", "c")], on_read), self.assertRaises(RuntimeError):
+            extract_table_to_sqlite(POOL, "ext_t", page_size=2, typed=False)
+        self.assertEqual([r[1:] for r in table_rows("ext_t")], [("old", "old")])
+        self.assertNotIn("ext_t__staging", local_tables())
+
+
+class DeltaRefreshTests(TestCase):
+
+    FIELDS = ("VBELN", "POSNR", "AEDAT", "A")
+    KEYS = ("VBELN", "POSNR")
+
+    def sap(self, rows):
+        return FakeSapTable(rows, key_fields=self.KEYS, fields=self.FIELDS)
+
+    def refresh(self, rows, **kwargs):
+        kwargs.setdefault("delta_field", "AEDAT")
+        with self.sap(rows) as sap:
+            written = refresh_table_delta(POOL, "vbap", typed=False, page_size=10, **kwargs)
+        return written, sap.options
+
+    def local(self, table_name="VBAP"):
+        return sorted(r[1:] for r in table_rows(table_name))
+
+    def test_first_run_extracts_everything_and_sets_the_watermark(self):
+        rows = [("1", "10", "20240101", "a"), ("2", "10", "20240103", "b")]
+        written, options = self.refresh(rows)
+        self.assertEqual(written, 2)
+        self.assertEqual(options, [None])
+        self.assertEqual(self.local(), sorted(rows))
+        mark = ExtractionWatermark.objects.get(table_name="VBAP", target_table="VBAP")
+        self.assertEqual((mark.delta_field, mark.watermark), ("AEDAT", "20240103"))
+
+    def test_delta_rows_are_upserted_on_the_key(self):
+        self.refresh([("1", "10", "20240101", "a"), ("2", "10", "20240103", "b")])
+        changed = [("2", "10", "20240105", "b2"), ("3", "10", "20240104", "c"), ("3", "10", "20240104", "c")]
+        written, options = self.refresh(changed, delta_field=None)
+        self.assertEqual(options, [["AEDAT >= '20240103'"]])
+        self.assertEqual(self.local(), [("1", "10", "20240101", "a"), ("2", "10", "20240105", "b2"),
+                                        ("3", "10", "20240104", "c")])
+        self.assertEqual(ExtractionWatermark.objects.get(target_table="VBAP").watermark, "20240105")
+        self.assertNotIn("vbap__staging", local_tables())
+
+    def test_quotes_in_the_watermark_are_escaped(self):
+        self.refresh([("1", "10", "O'Neil", "a")])
+        _, options = self.refresh([], delta_field=None)
+        self.assertEqual(options, [["AEDAT >= 'O''Neil'"]])
+
+    def test_a_delta_field_is_required(self):
+        with self.assertRaises(ValueError):
+            self.refresh([("1", "10", "20240101", "a")], delta_field=None)
+
+    def test_a_composite_key_field_is_refused(self):
+        with self.assertRaises(ValueError):
+            self.refresh([("1", "10", "20240101", "a")], delta_field="POSNR")
+
+    def test_watermarks_are_kept_per_target_table(self):
+        self.refresh([("1", "10", "20240101", "a")])
+        _, options = self.refresh([("1", "10", "20240101", "a")], target_table="VBAP_COPY")
+        self.assertEqual(options, [None])
+        self.assertEqual(ExtractionWatermark.objects.filter(table_name="VBAP").count(), 2)
+
+    def test_a_target_loaded_from_another_connection_is_reloaded(self):
+        self.refresh([("1", "10", "20240101", "a")])
+        project = Project.objects.create(project_name="p")
+        other = Connection.objects.create(project_id=project, connection_name="other")
+        _, options = self.refresh([("1", "10", "20240101", "a")], delta_field=None, connection=other)
+        self.assertEqual(options, [None])
+        self.assertEqual(ExtractionWatermark.objects.get(target_table="VBAP").connection_id, other)
+
+
+class NetChangesTests(SimpleTestCase):
+
+    def net(self, log, updated_rows=()):
+        return TableChangeCapture._net_changes(log, updated_rows).as_dict()
+
+    def test_one_outcome_per_rowid(self):
+        log = [(1, "U"), (2, "I"), (2, "U"), (3, "D"), (4, "I"), (4, "D"), (5, "D"), (5, "I")]
+        self.assertEqual(self.net(log), {"inserted": [2], "updated": [1, 5], "deleted": [3]})
+
+    def test_rows_filled_by_added_columns_count_as_updated(self):
+        self.assertEqual(self.net([(1, "I")], updated_rows=[1, 2]),
+                         {"inserted": [1], "updated": [2], "deleted": []})
+
+
+class StaleTriggerTests(SimpleTestCase):
+    """start() drops the triggers of abandoned captures only."""
+
+    def setUp(self):
+        handle, self.db_path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(handle)
+        self.addCleanup(os.remove, self.db_path)
+        self.execute("CREATE TABLE T (K, V)", "INSERT INTO T VALUES (1, 'a')")
+
+    def execute(self, *statements, params=()):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for sql in statements:
+                conn.execute(sql, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def triggers(self, capture):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?",
+                                (f"dmtool_cc_{capture.capture_id}_%",)).fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_live_capture_keeps_its_triggers(self):
+        live = TableChangeCapture(self.db_path, "T").start()
+        other = TableChangeCapture(self.db_path, "T").start()
+        self.assertEqual(self.triggers(live), 3)
+        self.execute("UPDATE T SET V = 'b'")
+        self.assertEqual(live.stop().updated, [1])
+        self.assertEqual(other.stop().updated, [1])
+
+    def test_dead_owner_is_dropped(self):
+        abandoned = TableChangeCapture(self.db_path, "T").start()
+        self.execute(f"UPDATE {CAPTURE_TABLE} SET pid = -1")
+        with mock.patch("DMtool.change_capture._process_alive", return_value=False):
+            TableChangeCapture(self.db_path, "T").start().stop()
+        self.assertEqual(self.triggers(abandoned), 0)
+
+    def test_old_capture_is_dropped(self):
+        abandoned = TableChangeCapture(self.db_path, "T").start()
+        self.execute(f"UPDATE {CAPTURE_TABLE} SET started_at = started_at - ?", params=(MAX_CAPTURE_AGE + 1,))
+        TableChangeCapture(self.db_path, "T").start().stop()
+        self.assertEqual(self.triggers(abandoned), 0)
+
+    def test_unregistered_triggers_are_dropped(self):
+        abandoned = TableChangeCapture(self.db_path, "T").start()
+        self.execute(f"DELETE FROM {CAPTURE_TABLE}")
+        TableChangeCapture(self.db_path, "T").start().stop()
+        self.assertEqual(self.triggers(abandoned), 0)
+
+
+class CountingPool(ConnectionPool):
+    error_class = RfcError
+
+    def __init__(self, *args, **kwargs):
+        super().__init__({}, *args, **kwargs)
+        self.opened, self.closed, self.alive = 0, [], True
+
+    def _open(self):
+        self.opened += 1
+        return self.opened
+
+    def _close(self, conn):
+        self.closed.append(conn)
+
+    def _is_alive(self, conn):
+        return self.alive
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def test_connection_is_reused(self):
+        pool = CountingPool()
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        self.assertEqual((first, second, pool.opened), (1, 1, 1))
+
+    def test_broken_connection_is_discarded(self):
+        pool = CountingPool()
+        pool.broken_errors = (RfcError,)
+        with self.assertRaises(RfcError):
+            with pool.connection():
+                raise RfcError("communication failure")
+        self.assertEqual(pool.closed, [1])
+        with pool.connection() as conn:
+            self.assertEqual(conn, 2)
+
+    def test_dead_connection_is_replaced_after_ping(self):
+        pool = CountingPool(ping_after=0)
+        with pool.connection():
+            pass
+        pool.alive = False
+        with pool.connection() as conn:
+            self.assertEqual(conn, 2)
+        self.assertEqual(pool.closed, [1])
+
+    def test_full_pool_times_out(self):
+        pool = CountingPool(max_size=1, acquire_timeout=0)
+        with pool.connection():
+            with self.assertRaises(RfcError):
+                pool.acquire()
+
+    def test_idle_connections_are_evicted(self):
+        pool = CountingPool(max_idle=0.01)
+        with pool.connection():
+            pass
+        with mock.patch("connection.utils.time.monotonic", return_value=time.monotonic() + 1):
+            self.assertTrue(pool.evict_idle())
+        self.assertEqual(pool.closed, [1])
+
+
+class DefaultRfcParamsTests(SimpleTestCase):
+
+    @override_settings(SAP_RFC_DEFAULT_PARAMS={"ASHOST": "host", "CLIENT": "100", "SYSNR": "00",
+                                               "USER": "", "PASSWD": None, "LANG": "EN"})
+    def test_missing_logon_raises(self):
+        with self.assertRaisesMessage(RfcError, "SAP_RFC_USER, SAP_RFC_PASSWD"):
+            default_rfc_params()
+
+
+@skipUnless(columnar_export_available(), "pyarrow is not installed")
+class ColumnarExportTests(TestCase):
+
+    def setUp(self):
+        create_table("exp_t", ["N INTEGER", "R REAL", "MIXED INTEGER", "S TEXT"], [
+            (1, 1.5, 1, "a"),
+            (2, None, "x", None),
+            (None, 3, 3, "c"),
+        ])
+
+    def read(self, fmt, schema=None, batch_size=2):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = schema or export_schema("exp_t")
+        data = io.BytesIO(b"".join(export_chunks("exp_t", schema, fmt, batch_size=batch_size)))
+        if fmt == "parquet":
+            return pq.read_table(data)
+        if fmt == "arrow":
+            return pa.ipc.open_file(data).read_all()
+        return pa.ipc.open_stream(data).read_all()
+
+    def test_schema_keeps_clean_numeric_columns(self):
+        schema = export_schema("exp_t")
+        self.assertEqual([str(t) for t in schema.types], ["int64", "double", "string", "string"])
+
+    def test_columns_are_matched_case_insensitively(self):
+        self.assertEqual(export_schema("exp_t", ["s", "n"]).names, ["S", "N"])
+        with self.assertRaises(ValueError):
+            export_schema("exp_t", ["NOPE"])
+
+    def test_every_format_round_trips(self):
+        expected = {"N": [1, 2, None], "R": [1.5, None, 3.0], "MIXED": ["1", "x", "3"], "S": ["a", None, "c"]}
+        for fmt in ("parquet", "arrow", "arrows"):
+            with self.subTest(fmt=fmt):
+                self.assertEqual(self.read(fmt).to_pydict(), expected)
+
+    def test_parquet_has_one_row_group_per_batch(self):
+        import pyarrow.parquet as pq
+        data = io.BytesIO(b"".join(export_chunks("exp_t", export_schema("exp_t"), "parquet", batch_size=2)))
+        self.assertEqual(pq.ParquetFile(data).num_row_groups, 2)
+
+    def test_view_streams_the_segment_table(self):
+        segment = create_segment("exp_t")
+        response = self.client.get(f"/api/exportTable/{segment.segment_id}/", {"fmt": "arrows", "columns": "S"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/vnd.apache.arrow.stream")
+        import pyarrow as pa
+        table = pa.ipc.open_stream(io.BytesIO(b"".join(response.streaming_content))).read_all()
+        self.assertEqual(table.to_pydict(), {"S": ["a", None, "c"]})
+        self.assertEqual(self.client.get(f"/api/exportTable/{segment.segment_id}/", {"fmt": "csv"}).status_code, 400)
+
+
+class DedupModeTests(TestCase):
+    """The hash mode must delete exactly the rows the GROUP BY mode deletes."""
+
+    ROWS = [
+        (1, "x", None), (1.0, "x", None), ("1", "x", None), (1, "x", None),
+        (2, "", None), (2, None, None), (2, "", None), (2.5, "y", 0), (2.5, "y", -0.0),
+    ]
+
+    def remaining(self, table_name, mode, since_rowid=None, more_rows=(), key_fields=None):
+        create_table(table_name, ["A", "B", "C"], self.ROWS)
+        with connection.cursor() as cursor:
+            cursor.executemany(f'INSERT INTO "{table_name}" VALUES (%s, %s, %s)', more_rows)
+        remove_duplicate_rows_group_by_all(table_name, since_rowid=since_rowid, mode=mode, key_fields=key_fields)
+        return [row[0] for row in table_rows(table_name)]
+
+    def test_hash_matches_group_by(self):
+        self.assertEqual(self.remaining("dedup_hash", "hash"), self.remaining("dedup_group", "group_by"))
+
+    def test_hash_matches_group_by_after_since_rowid(self):
+        since = len(self.ROWS)
+        more = [(1, "x", None), ("1", "x", None), (3, "z", None), (3.0, "z", None), (2, "", None)]
+        self.assertEqual(self.remaining("dedup_hash", "hash", since, more),
+                         self.remaining("dedup_group", "group_by", since, more))
+
+    def test_keys_keep_the_first_row_per_key(self):
+        self.assertEqual(self.remaining("dedup_keys", None, key_fields=["A"]), [1, 3, 5, 8])
+
+
+class TablePageTests(TestCase):
+
+    def setUp(self):
+        create_table("page_t", ["N", "S"], [
+            (3, "c"), (None, "n1"), (1, "a"), (3, "c2"), (None, "n2"), (2, "b"), (1, "a2"),
+        ])
+
+    def read_all(self, **kwargs):
+        rows, after = [], None
+        while True:
+            page, after = table_page("page_t", limit=2, after=after, **kwargs)
+            rows += [row["S"] for row in page]
+            if after is None:
+                return rows
+
+    def expected(self, order):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT S FROM page_t ORDER BY {order}")
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_pages_in_rowid_order(self):
+        self.assertEqual(self.read_all(), self.expected("ROWID"))
+
+    def test_pages_sorted_ascending_with_nulls(self):
+        self.assertEqual(self.read_all(sort="N"), self.expected("N, ROWID"))
+
+    def test_pages_sorted_descending_with_nulls(self):
+        self.assertEqual(self.read_all(sort="-N"), self.expected("N DESC, ROWID DESC"))
+
+    def test_filters_apply_to_every_page(self):
+        self.assertEqual(self.read_all(filters={"S": "a"}), ["a", "a2"])
+        self.assertEqual(self.read_all(filters={"S": "%"}), [])
+
+    def test_unknown_columns_raise(self):
+        for kwargs in ({"columns": ["NOPE"]}, {"sort": "-NOPE"}, {"filters": {"NOPE": "x"}}):
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                table_page("page_t", **kwargs)
+
+    def test_view_projects_and_rejects_bad_parameters(self):
+        url = f"/api/getTablePage/{create_segment('page_t').segment_id}/"
+        response = self.client.get(url, {"columns": "S", "limit": 3, "sort": "N"})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["rows"], [{"S": "n1"}, {"S": "n2"}, {"S": "a"}])
+        self.assertEqual(len(self.client.get(url, {"after": body["next"], "sort": "N"}).json()["rows"]), 4)
+        for params in ({"filter": "S"}, {"columns": "NOPE"}, {"variant": "x"}, {"after": "junk"}):
+            with self.subTest(**params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+
+class SAPTableSearchTests(TestCase):
+
+    def setUp(self):
+        project = Project.objects.create(project_name="p")
+        self.conn = Connection.objects.create(project_id=project, connection_name="sap")
+        other = Connection.objects.create(project_id=project, connection_name="other")
+        for table, description in [("BKPF", "Accounting for MARA documents"), ("ZMARA_X", "Custom"),
+                                   ("MARA", "General material data"), ("MARC", "Plant data")]:
+            erp_tables_description.objects.create(connection_id=self.conn, table=table, description=description)
+        erp_tables_description.objects.create(connection_id=other, table="MARA", description="Other system")
+
+    def search(self, tab, **params):
+        response = self.client.get(f"/api/SAPTableSearch/{tab}/{self.conn.connection_id}/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row["table"] for row in response.json()]
+
+    def test_names_rank_before_descriptions(self):
+        self.assertEqual(self.search("mara"), ["MARA", "ZMARA_X", "BKPF"])
+
+    def test_like_fallback_ranks_names(self):
+        with mock.patch("connection.views.erp_tables_fts_available", return_value=False):
+            self.assertEqual(self.search("mara"), ["MARA", "ZMARA_X"])
+        self.assertEqual(self.search("MA"), ["MARA", "MARC", "ZMARA_X"])
+
+    def test_index_follows_description_changes(self):
+        erp_tables_description.objects.filter(table="MARC").update(description="Plant data for MARA")
+        erp_tables_description.objects.filter(table="BKPF").delete()
+        self.assertEqual(self.search("mara"), ["MARA", "ZMARA_X", "MARC"])
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(self.search("mara", limit=2), ["MARA", "ZMARA_X"])
+        self.assertEqual(self.search("mara", limit=-5), ["MARA"])
+        response = self.client.get(f"/api/SAPTableSearch/mara/{self.conn.connection_id}/", {"limit": "all"})
+        self.assertEqual(response.status_code, 400)
+
+
+def pragma(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+
+class BulkLoadTests(TestCase):
+
+    def setUp(self):
+        create_table("bulk_t", ["A", "B NOT NULL"], [])
+        create_table("bulk_t_src", ["A", "B NOT NULL"], [])
+
+    def test_dataframe_rows_go_to_both_tables(self):
+        df = pd.DataFrame({"A": [1, None, 3], "B": ["x", "y", float("nan")], "EXTRA": [7, 8, 9]})
+        df.loc[2, "B"] = "z"
+        with self.settings(SQLITE_BULK_BATCH_SIZE=2):
+            self.assertEqual(insert_data_from_dataframe(df, "bulk_t", dual_write=True), "Success")
+        expected = [(1, 1.0, "x"), (2, None, "y"), (3, 3.0, "z")]
+        self.assertEqual(table_rows("bulk_t"), expected)
+        self.assertEqual(table_rows("bulk_t_src"), expected)
+
+    def test_failed_batch_rolls_back_every_table(self):
+        df = pd.DataFrame({"A": [1, 2, 3], "B": ["x", "y", None]})
+        with self.settings(SQLITE_BULK_BATCH_SIZE=2):
+            self.assertEqual(insert_data_from_dataframe(df, "bulk_t", dual_write=True), "Error")
+        self.assertEqual((table_rows("bulk_t"), table_rows("bulk_t_src")), ([], []))
+
+    def test_frames_are_renamed_and_streamed(self):
+        frames = [pd.DataFrame([[1, "x"], [2, "y"]]), pd.DataFrame([[3, "z"]])]
+        self.assertEqual(bulk_insert_frames(frames, "bulk_t", columns=["A", "B"], batch_size=1), 3)
+        self.assertEqual([row[1:] for row in table_rows("bulk_t")], [(1, "x"), (2, "y"), (3, "z")])
+
+    def test_pragmas_inside_atomic_leave_synchronous_alone(self):
+        synchronous, cache_size = pragma("synchronous"), pragma("cache_size")
+        with connection.cursor() as cursor, bulk_load_pragmas(cursor):
+            self.assertEqual(pragma("synchronous"), synchronous)
+            self.assertEqual(pragma("cache_size"), -262144)
+        self.assertEqual((pragma("synchronous"), pragma("cache_size")), (synchronous, cache_size))
+
+
+class BulkLoadPragmaTests(TransactionTestCase):
+
+    def test_pragmas_outside_atomic_are_restored(self):
+        before = [pragma(name) for name in ("synchronous", "cache_size", "temp_store")]
+        with connection.cursor() as cursor, bulk_load_pragmas(cursor):
+            self.assertEqual([pragma(name) for name in ("synchronous", "cache_size", "temp_store")],
+                             [0, -262144, 2])
+            with transaction.atomic():
+                pass
+        self.assertEqual([pragma(name) for name in ("synchronous", "cache_size", "temp_store")], before)
+
+
+class StreamingTests(TestCase):
+
+    def setUp(self):
+        create_table("stream_t", ["A", "B"], [(1, "x"), (2, " "), (None, ""), (4, 'q"uote')])
+
+    def body(self, response):
+        return b"".join(response.streaming_content).decode()
+
+    def test_json_array_batches(self):
+        self.assertEqual(list(json_array_chunks([], batch_size=2)), ["[", "]"])
+        chunks = list(json_array_chunks([{"a": 1}, {"a": 2}, {"a": 3}], batch_size=2))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(json.loads("".join(chunks)), [{"a": 1}, {"a": 2}, {"a": 3}])
+
+    def test_row_options(self):
+        rows = list(iter_table_rows("stream_t", batch_size=1, skip_empty=True, blank_as_null=True))
+        self.assertEqual(rows, [{"A": 1, "B": "x"}, {"A": 2}, {"A": 4, "B": 'q"uote'}])
+
+    def test_ndjson_head_is_the_first_line(self):
+        response = stream_rows_response([{"a": 1}, {"a": 2}], "ndjson", head={"columns": []})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in self.body(response).splitlines()]
+        self.assertEqual(lines, [{"columns": []}, {"a": 1}, {"a": 2}])
+
+    def test_empty_head_document(self):
+        self.assertEqual(json.loads(self.body(stream_rows_response([{"a": 1}], head={}))), {"rows": [{"a": 1}]})
+
+    def test_streamed_table_matches_buffered_response(self):
+        url = f"/api/getTable/{create_segment('stream_t').segment_id}/"
+        buffered = self.client.get(url).json()
+        with self.settings(STREAM_BATCH_SIZE=3):
+            streamed = json.loads(self.body(self.client.get(url, {"stream": "json"})))
+            ndjson = self.body(self.client.get(url, HTTP_ACCEPT="application/x-ndjson")).splitlines()
+        self.assertEqual(streamed, buffered)
+        self.assertEqual([json.loads(line) for line in ndjson],
+                         [{"columns": buffered["columns"]}] + buffered["rows"])
+
+    def test_ndjson_accept_header_reaches_buffered_views(self):
+        response = self.client.get("/api/getTable/0/", HTTP_ACCEPT="application/x-ndjson")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.content), {"error": "Segment not found"})
+
+
+class ParallelChunkReadTests(SimpleTestCase):
+    """Concurrent chunk reads must give the rows of a sequential read."""
+
+    KEYS = ["K"]
+    CATALOG = [("K", 10), ("A", 150), ("B", 150), ("C", 150), ("D", 150)]
+    ROWS = {"K": ["3", "1", "2"], "A": ["a3", "a1", "a2"], "B": ["b3", "b1", "b2"],
+            "C": ["c3", "c1", "c2"], "D": ["d3", "d1", "d2"]}
+
+    def read(self, parallel):
+        pool = CountingPool(max_size=3)
+        chunks = plan_field_chunks(self.KEYS, self.CATALOG)
+        lock, active, peak = threading.Lock(), [0], [0]
+
+        def read_chunk(hRFC, table_name, fields, **kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            # Later chunks finish first, and every chunk returns its rows in its own order
+            time.sleep(0.02 * (len(chunks) - chunks.index(fields)))
+            order = [0, 1, 2] if chunks.index(fields) % 2 else [2, 0, 1]
+            with lock:
+                active[0] -= 1
+            return {f: [self.ROWS[f][i] for i in order] for f in fields}
+
+        with mock.patch("connection.utils.read_chunk", side_effect=read_chunk):
+            rows = read_sap_table(pool, "t", parallel=parallel, layout=(self.KEYS, self.CATALOG, chunks))
+        return rows, peak[0], pool.opened
+
+    def test_chunks_repeat_the_keys_and_stay_narrow(self):
+        chunks = plan_field_chunks(self.KEYS, self.CATALOG)
+        self.assertEqual(chunks, [["K", "A", "B"], ["K", "C", "D"]])
+        self.assertEqual(chunk_workers(CountingPool(max_size=3), chunks, parallel=8), 2)
+        self.assertEqual(chunk_workers(CountingPool(max_size=1), chunks, parallel=8), 1)
+
+    def test_parallel_read_matches_sequential(self):
+        sequential, sequential_peak, sequential_opened = self.read(parallel=1)
+        parallel, parallel_peak, parallel_opened = self.read(parallel=3)
+        self.assertEqual(parallel, sequential)
+        self.assertEqual(len(sequential), 3)
+        self.assertEqual((sequential_peak, sequential_opened), (1, 1))
+        self.assertEqual((parallel_peak, parallel_opened), (2, 2))
+
+
+class TableLayoutCacheTests(TestCase):
+
+    LAYOUT = (["K"], [("K", 10), ("A", 20)], [["K", "A"]])
+
+    def setUp(self):
+        project = Project.objects.create(project_name="p")
+        self.conn = Connection.objects.create(project_id=project, connection_name="sap")
+        self.other = Connection.objects.create(project_id=project, connection_name="other")
+        patcher = mock.patch("connection.sap_extract.read_table_layout", return_value=self.LAYOUT)
+        self.read = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_layout_is_read_once_per_connection(self):
+        self.assertEqual(get_table_layout(POOL, "mara", connection=self.conn), self.LAYOUT)
+        self.assertEqual(get_table_layout(POOL, "MARA", connection=self.conn), self.LAYOUT)
+        get_table_layout(POOL, "MARA", connection=self.other)
+        get_table_layout(POOL, "MARA")
+        self.assertEqual(self.read.call_count, 3)
+        self.assertEqual(SapTableMetadata.objects.get(connection_id=self.conn).field_catalog, [["K", 10], ["A", 20]])
+
+    def test_refresh_expiry_and_invalidation_read_again(self):
+        get_table_layout(POOL, "MARA", connection=self.conn)
+        get_table_layout(POOL, "MARA", connection=self.conn, refresh=True)
+        self.assertEqual(self.read.call_count, 2)
+        with self.settings(SAP_METADATA_TTL=-1):
+            get_table_layout(POOL, "MARA", connection=self.conn)
+        self.assertEqual(self.read.call_count, 3)
+        invalidate_table_metadata(self.conn, "mara")
+        self.assertFalse(SapTableMetadata.objects.filter(connection_id=self.conn).exists())
+        get_table_layout(POOL, "MARA", connection=self.conn)
+        self.assertEqual(self.read.call_count, 4)
+        self.assertEqual(SapTableMetadata.objects.filter(connection_id=self.conn).count(), 1)
+
+
+class TableDescriptionLoadTests(TestCase):
+
+    def setUp(self):
+        project = Project.objects.create(project_name="p")
+        self.conn = Connection.objects.create(project_id=project, connection_name="sap")
+        self.other = Connection.objects.create(project_id=project, connection_name="other")
+        erp_tables_description.objects.create(connection_id=self.conn, table="OLD", description="Old")
+        erp_tables_description.objects.create(connection_id=self.other, table="KEEP", description="Keep")
+
+    def load(self, rows):
+        with mock.patch("connection.sap_extract.iter_table_descriptions", return_value=iter(rows)):
+            return load_table_descriptions(CountingPool(), self.conn, batch_size=2)
+
+    def tables(self, conn):
+        return sorted(erp_tables_description.objects.filter(connection_id=conn).values_list("table", flat=True))
+
+    def test_catalog_is_replaced_in_batches(self):
+        rows = [("MARA", "General material data"), ("MARC", "Plant data"), ("VBAK", "Sales header")]
+        with mock.patch.object(erp_tables_description.objects, "bulk_create",
+                               wraps=erp_tables_description.objects.bulk_create) as bulk_create:
+            self.assertEqual(self.load(rows), 3)
+        self.assertEqual([len(call.args[0]) for call in bulk_create.call_args_list], [2, 1])
+        self.assertEqual(self.tables(self.conn), ["MARA", "MARC", "VBAK"])
+        self.assertEqual(self.tables(self.other), ["KEEP"])
+
+    def test_failed_read_keeps_the_old_catalog(self):
+        def rows():
+            yield "MARA", "General material data"
+            yield "MARC", "Plant data"
+            raise RfcError("connection lost")
+
+        with self.assertRaises(RfcError):
+            self.load(rows())
+        self.assertEqual(self.tables(self.conn), ["OLD"])
+
+
+class ErpTablesPageTests(TestCase):
+
+    def setUp(self):
+        project = Project.objects.create(project_name="p")
+        self.conn = Connection.objects.create(project_id=project, connection_name="sap")
+        other = Connection.objects.create(project_id=project, connection_name="other")
+        erp_tables_description.objects.bulk_create(
+            [erp_tables_description(connection_id=self.conn, table=f"T{i:03}") for i in range(120, 0, -1)]
+            + [erp_tables_description(connection_id=other, table="T0505")])
+
+    def test_keyset_pages_match_the_legacy_slice(self):
+        tables, after = [], None
+        while True:
+            page = [t.table for t in erp_tables_page(self.conn.connection_id, 1, after)]
+            if not page:
+                break
+            self.assertLessEqual(len(page), ERP_TABLES_PAGE_SIZE)
+            tables += page
+            after = page[-1]
+        legacy = [t.table for t in erp_tables_page(self.conn.connection_id, 3)]
+        self.assertEqual(tables, legacy)
+        self.assertEqual(len(tables), 120)
+
+    def test_page_is_served_from_the_index(self):
+        query = erp_tables_page(self.conn.connection_id, 1, "T050").query
+        sql, params = query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn("erp_tables_conn_table_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_view_follows_after(self):
+        url = f"/api/saptables/1/{self.conn.connection_id}/"
+        self.assertEqual(self.client.get(url, {"after": "T118"}).json()[0]["table"], "T119")
+
+
+class FakeHanaCursor:
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self.arraysize = 1
+        self._rows = []
+
+    def execute(self, sql, params=()):
+        self.conn.statements.append((sql, list(params)))
+        if "SYS.TABLE_COLUMNS" in sql:
+            self._rows = [(c,) for c in self.conn.columns]
+        elif "DUMMY" in sql:
+            self._rows = [(1,)]
+        else:
+            self.description = [(c,) for c in self.conn.columns]
+            self._rows = list(self.conn.rows)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size):
+        self.conn.fetch_sizes.append(size)
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeHanaConnection:
+
+    def __init__(self, columns=(), rows=()):
+        self.columns, self.rows = list(columns), list(rows)
+        self.statements, self.fetch_sizes = [], []
+        self.connected = True
+
+    def cursor(self):
+        return FakeHanaCursor(self)
+
+    def isconnected(self):
+        return self.connected
+
+    def close(self):
+        self.connected = False
+
+
+HANA_LOGON = {"address": "hana", "port": "30015", "user": "u", "password": "p"}
+
+
+class HanaPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        patchers = [mock.patch.dict("connection.hana._POOLS", clear=True),
+                    mock.patch("connection.hana.hana_connect", side_effect=lambda params: FakeHanaConnection())]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_pool_is_shared_per_logon(self):
+        pool = get_hana_pool(HANA_LOGON)
+        self.assertIs(get_hana_pool(dict(HANA_LOGON)), pool)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        conn = SimpleNamespace(host="hana", port="30015", username="u", password="p")
+        self.assertIs(get_hana_connection_pool(conn), pool)
+        close_hana_pool(conn)
+        self.assertFalse(first.connected)
+        self.assertIsNot(get_hana_pool(HANA_LOGON), pool)
+
+    def test_changed_password_replaces_the_pool(self):
+        pool = get_hana_pool(HANA_LOGON)
+        with pool.connection() as conn:
+            pass
+        replaced = get_hana_pool({**HANA_LOGON, "password": "new"})
+        self.assertIsNot(replaced, pool)
+        self.assertFalse(conn.connected)
+
+    def test_dead_connection_is_replaced(self):
+        with self.settings(HANA_POOL_PING_AFTER=0):
+            pool = get_hana_pool(HANA_LOGON)
+        with pool.connection() as first:
+            pass
+        first.connected = False
+        with pool.connection() as second:
+            self.assertIsNot(second, first)
+
+    def test_idle_pools_of_other_logons_are_reaped(self):
+        with self.settings(HANA_POOL_MAX_IDLE=1):
+            idle = get_hana_pool(HANA_LOGON)
+        with idle.connection() as conn:
+            pass
+        with mock.patch("connection.utils.time.monotonic", return_value=time.monotonic() + 5):
+            get_hana_pool({**HANA_LOGON, "user": "other"})
+        self.assertFalse(conn.connected)
+        self.assertIsNot(get_hana_pool(HANA_LOGON), idle)
+
+
+class HanaExtractTests(TestCase):
+
+    COLUMNS = ["ID", "AMOUNT", "PLANT"]
+    ROWS = [(1, Decimal("1.50"), "P1"), (2, None, "P2"), (3, Decimal("7"), "P1")]
+
+    def extract(self, rows=None, **kwargs):
+        self.hana = FakeHanaConnection(self.COLUMNS, self.ROWS if rows is None else rows)
+        pool = CountingPool()
+        pool._open = lambda: self.hana
+        return extract_hana_table(pool, "SCH", "TAB/1", batch_size=2, **kwargs)
+
+    def test_rows_are_copied_in_batches(self):
+        self.assertEqual(self.extract(), ("hana_TAB_1", 3))
+        self.assertEqual([row[1:] for row in table_rows("hana_TAB_1")],
+                         [("1", "1.50", "P1"), ("2", None, "P2"), ("3", "7", "P1")])
+        self.assertEqual(self.hana.fetch_sizes, [2, 2, 2])
+
+    def test_projection_and_filters_run_on_hana(self):
+        self.extract(columns=["ID"], filters={"PLANT": "P1"}, target_table="hana_x")
+        sql, params = self.hana.statements[-1]
+        self.assertEqual(sql, 'SELECT "ID" FROM "SCH"."TAB/1" WHERE "PLANT" = ?')
+        self.assertEqual(params, ["P1"])
+
+    def test_bad_requests_raise(self):
+        for kwargs in ({"columns": ["NOPE"]}, {"filters": {"NOPE": 1}}, {"target_table": "main_table"}):
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                self.extract(**kwargs)
+
+    def test_existing_table_needs_replace(self):
+        self.extract()
+        with self.assertRaises(ValueError):
+            self.extract(rows=[])
+        self.assertEqual(len(table_rows("hana_TAB_1")), 3)
+        self.assertEqual(self.extract(rows=self.ROWS[:1], replace=True), ("hana_TAB_1", 1))
+        self.assertEqual(len(table_rows("hana_TAB_1")), 1)
+
+    def test_failed_fetch_keeps_the_old_table(self):
+        self.extract()
+        with mock.patch.object(FakeHanaCursor, "fetchmany", side_effect=[self.ROWS[:2], RuntimeError("lost")]):
+            with self.assertRaises(RuntimeError):
+                self.extract(replace=True)
+        self.assertEqual(len(table_rows("hana_TAB_1")), 3)
+
+
+class DelimitedUploadTests(TestCase):
+
+    def load(self, text, read=pd.read_csv, **kwargs):
+        parsed = []
+
+        def counting_read(file, **options):
+            for chunk in read(file, **options):
+                if parsed:
+                    # The previous chunk must already be in the table when the next one is parsed
+                    self.assertEqual(len(table_rows("upload_t")), sum(parsed))
+                parsed.append(len(chunk))
+                yield chunk
+
+        with self.settings(UPLOAD_CHUNK_SIZE=2):
+            loaded = load_delimited_upload(io.StringIO(text), "upload_t", counting_read, typed=False, **kwargs)
+        return loaded, parsed
+
+    def test_chunks_are_inserted_as_text(self):
+        loaded, parsed = self.load("MATNR,QTY\n007,1.50\n008,\n009,3\n010,4\n011,5\n")
+        self.assertEqual((loaded, parsed), (5, [2, 2, 1]))
+        self.assertEqual([row[1:] for row in table_rows("upload_t")],
+                         [("007", "1.50"), ("008", None), ("009", "3"), ("010", "4"), ("011", "5")])
+
+    def test_txt_headers_with_colons_become_positional(self):
+        loaded, _ = self.load("A:x\tB:y\n1\t2\n3\t4\n5\t6\n", read=pd.read_table, positional_columns=True)
+        self.assertEqual(loaded, 3)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA table_info("upload_t")')
+            self.assertEqual([row[1] for row in cursor.fetchall()], ["Column0", "Column1"])
+        self.assertEqual(table_rows("upload_t")[-1][1:], ("5", "6"))
+
+
+class TemplateWorkbookTests(SimpleTestCase):
+
+    def workbook(self):
+        from openpyxl import Workbook
+        book = Workbook()
+        sheet = book.active
+        sheet.title = "Material"
+        for row in [["Title"], ["Desc"], [], ["Group"], ["MATNR", "ERSDA", "BRGEW", "MEINS"],
+                    ["Material"], ["Created on"], ["Weight"],
+                    ["007", datetime(2024, 3, 1), 1.5, "KG"],
+                    [8, date(2024, 12, 31)],
+                    [None, None, 0, None, "beyond the header"]]:
+            sheet.append(row)
+        book.create_sheet("Plant").append(["ignored"])
+        data = io.BytesIO()
+        book.save(data)
+        data.seek(0)
+        return open_template_workbook(data)
+
+    def test_segment_sheet_as_display_strings(self):
+        workbook = self.workbook()
+        try:
+            df = read_segment_sheet(workbook, "Material")
+        finally:
+            workbook.close()
+        # Rows span the used width of the sheet, like the cell-by-cell reader did
+        self.assertEqual(list(df.columns), ["MATNR", "ERSDA", "BRGEW", "MEINS", ""])
+        self.assertEqual(df.values.tolist(), [["007", "01.03.2024", "1.5", "KG", ""],
+                                              ["8", "31.12.2024", "", "", ""],
+                                              ["", "", "0", "", "beyond the header"]])
+
+    def test_sheet_without_field_row_is_empty(self):
+        workbook = self.workbook()
+        try:
+            self.assertTrue(read_segment_sheet(workbook, "Plant").empty)
+        finally:
+            workbook.close()
+
+
+class DualWriteTests(TestCase):
+    """Every dual-write helper changes the segment table and its _src copy alike."""
+
+    def setUp(self):
+        create_table("dw_in", ["A", "B"], [("1", "x"), ("2", "y"), ("2", "y")])
+        create_table("dw", ["K", "V", "C"], [("0", "old", None)])
+        create_table("dw_src", ["K", "V", "C"], [("0", "old", None)])
+
+    def both(self):
+        return table_rows("dw"), table_rows("dw_src")
+
+    def test_copy_constants_and_dedup(self):
+        marks = table_rowid_marks(["dw", "dw_src"])
+        copy_data_between_tables_with_field_mapping("dw_in", "dw", {"A": "K", "B": "V"}, dual_write=True)
+        update_columns_with_constants("dw", {"C": "c"}, dual_write=True)
+        remove_duplicate_rows_group_by_all("dw", dual_write=True, key_fields=["K"], since_rowid=marks)
+        expected = [(1, "0", "old", "c"), (2, "1", "x", "c"), (3, "2", "y", "c")]
+        self.assertEqual(self.both(), (expected, expected))
+
+    def test_failed_mirror_rolls_back_the_target(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE "dw_src"')
+        copy_data_between_tables_with_field_mapping("dw_in", "dw", {"A": "K", "B": "V"}, dual_write=True)
+        self.assertEqual(table_rows("dw"), [(1, "0", "old", None)])
+
+
+class ColumnTypeTests(SimpleTestCase):
+
+    def test_inferred_types(self):
+        cases = [
+            (["1", "-20", None, ""], "INTEGER"),
+            (["1", "2.5", float("nan")], "REAL"),
+            (["2024-01-31", ""], "DATE"),
+            (["007", "8"], "TEXT"),        # leading zeros are significant
+            (["1", "2024-01-31"], "TEXT"),
+            (["1.", "2"], "TEXT"),
+            ([True], "TEXT"),
+            ([None, ""], "TEXT"),
+            ([], "TEXT"),
+        ]
+        for values, expected in cases:
+            with self.subTest(values=values):
+                self.assertEqual(infer_sqlite_type(values), expected)
+
+    def test_sap_values(self):
+        self.assertEqual([sap_sqlite_type(t) for t in ("I", "F", "D", "P", "C", None)],
+                         ["INTEGER", "REAL", "DATE", "TEXT", "TEXT", "TEXT"])
+        self.assertEqual(sap_value(" 12- ", "INTEGER"), -12)
+        self.assertEqual(sap_value("1.5E+00", "REAL"), 1.5)
+        self.assertEqual(sap_value("20240131", "DATE"), "2024-01-31")
+        self.assertIsNone(sap_value("00000000", "DATE"))
+        self.assertIsNone(sap_value("   ", "INTEGER"))
+        self.assertEqual(sap_value("12A", "INTEGER"), "12A")
+        self.assertEqual(sap_value(" 007 ", "TEXT"), " 007 ")
+        self.assertEqual(sap_literal("2024-01-31", "DATE"), "20240131")
+
+
+class TypedUploadTests(TestCase):
+
+    def test_upload_columns_are_typed_from_the_first_chunk(self):
+        text = "ID,MATNR,PRICE,ON\n1,007,1.5,2024-01-31\n2,008,2,\n"
+        load_delimited_upload(io.StringIO(text), "typed_t", pd.read_csv, typed=True)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA table_info("typed_t")')
+            self.assertEqual([row[2] for row in cursor.fetchall()], ["INTEGER", "TEXT", "REAL", "DATE"])
+            cursor.execute('SELECT typeof(ID), MATNR, typeof(PRICE) FROM "typed_t" ORDER BY ROWID')
+            self.assertEqual(cursor.fetchall(), [("integer", "007", "real"), ("integer", "008", "real")])
+
+
+def index_columns(table_name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA index_list("{table_name}")')
+        names = [row[1] for row in cursor.fetchall()]
+        columns = {}
+        for name in names:
+            cursor.execute(f'PRAGMA index_info("{name}")')
+            columns[name] = [row[2] for row in cursor.fetchall()]
+        return columns
+
+
+class KeyIndexTests(TestCase):
+
+    def setUp(self):
+        create_table("idx_t", ["MANDT", "MATNR", "V"], [])
+        create_table("idx_t_src", ["MANDT", "MATNR", "V"], [])
+
+    def test_index_on_existing_key_columns(self):
+        with connection.cursor() as cursor:
+            self.assertEqual(create_index(cursor, "idx_t", ["mandt", "NOPE", "MATNR", "MANDT"]), "idx_t__MANDT_MATNR")
+            self.assertEqual(create_index(cursor, "idx_t", ["MANDT", "MATNR"]), "idx_t__MANDT_MATNR")
+            self.assertIsNone(create_index(cursor, "idx_t", ["NOPE", ""]))
+        self.assertEqual(index_columns("idx_t"), {"idx_t__MANDT_MATNR": ["MANDT", "MATNR"]})
+
+    def test_dual_write_indexes_the_src_copy(self):
+        ensure_index("idx_t", ["MATNR"], dual_write=True)
+        self.assertEqual(index_columns("idx_t_src"), {"idx_t_src__MATNR": ["MATNR"]})
+
+    def test_related_update_indexes_the_lookup_side(self):
+        create_table("idx_lookup", ["K", "V"], [])
+        update_related_data_with_mapping_and_composite_pks("idx_lookup", "idx_t", {"V": "V"}, None, ["K"], ["MATNR"])
+        self.assertEqual(index_columns("idx_lookup"), {"idx_lookup__K": ["K"]})
+
+
+class RulePlanTests(TestCase):
+
+    COLUMNS = ["MATNR", "MAKTX", "MEINS", "WERKS"]
+
+    def setUp(self):
+        self.segment = create_segment("t_seg")
+        self.project, self.obj = self.segment.project_id, self.segment.obj_id
+        create_table("t_seg", self.COLUMNS, [])
+        create_table("t_seg_src", self.COLUMNS, [])
+        create_table("MARA", ["MATNR"], [("M1",), ("M2",), ("M2",)])
+        create_table("MAKT", ["MATNR", "MAKTX"], [("M1", "desc1"), ("M2", "desc2")])
+        create_table("LookUp_table", ["Field_Name", "From_Val", "To_Val"], [("WERKS", "P1", "1000")])
+        self.fields = {name: fields.objects.create(project_id=self.project, obj_id=self.obj,
+                                                   segement_id=self.segment, fields=name,
+                                                   isKey="True" if name == "MATNR" else "False")
+                       for name in self.COLUMNS}
+
+    def rule(self, version, field, mapping_type, source_table=None, source_field=None, value=None, lookup=False):
+        Rule.objects.create(project_id=self.project, object_id=self.obj, segment_id=self.segment,
+                            field_id=str(self.fields[field].field_id), version_id=version,
+                            source_table=source_table, source_field_name=source_field,
+                            data_mapping_type=mapping_type, data_mapping_rules=value,
+                            target_sap_field=field, lookup=lookup)
+
+    def first_version(self):
+        self.rule(1, "MATNR", "1:1", "mara", "MATNR")
+        self.rule(1, "MAKTX", "1:1", "MAKT", "MAKTX")
+        self.rule(1, "MEINS", "Constant", value="KG")
+        self.rule(1, "WERKS", "Constant", value="1000", lookup=True)
+
+    def test_plan_is_compiled_in_a_fixed_number_of_queries(self):
+        self.first_version()
+        with self.assertNumQueries(6):
+            plan = compile_rule_plan(self.project.project_id, self.obj.obj_id, self.segment.segment_id)
+        self.assertEqual(plan["extract_tables"], [])
+        self.assertEqual(plan["copy"], {"source_table": "MARA", "field_mapping": {"MATNR": "MATNR"}})
+        self.assertEqual(plan["key_columns"], (["MATNR"], ["MATNR"]))
+        self.assertEqual(plan["mappings"], {"MAKT": {"MAKTX": "MAKTX"}})
+        self.assertEqual(plan["constants"], {"MEINS": "KG", "WERKS": "1000"})
+        self.assertEqual(plan["reverse_lookups"], ["WERKS"])
+
+    def test_first_version_fills_both_segment_tables(self):
+        self.first_version()
+        run_rule_plan(compile_rule_plan(self.project.project_id, self.obj.obj_id, self.segment.segment_id))
+        self.assertEqual(table_rows("t_seg"), [(1, "M1", "desc1", "KG", "P1"), (2, "M2", "desc2", "KG", "P1")])
+        # Lookups translate the segment table only; _src keeps the untranslated value
+        self.assertEqual(table_rows("t_seg_src"), [(1, "M1", "desc1", "KG", "1000"), (2, "M2", "desc2", "KG", "1000")])
+
+    def test_later_version_reapplies_changed_mappings_only(self):
+        self.first_version()
+        self.rule(2, "MATNR", "1:1", "mara", "MATNR")
+        self.rule(2, "MAKTX", "1:1", "MAKT", "MAKTX")   # unchanged: not re-applied
+        self.rule(2, "MEINS", "1:1", "MAKT2", "TEXT")   # was a constant
+        plan = compile_rule_plan(self.project.project_id, self.obj.obj_id, self.segment.segment_id)
+        self.assertIsNone(plan["copy"])
+        self.assertEqual(plan["extract_tables"], ["MAKT2"])
+        self.assertEqual(plan["mappings"], {"MAKT2": {"TEXT": "MEINS"}})
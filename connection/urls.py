@@ -8,10 +8,13 @@ urlpatterns = [
     path('api/hanaconn/',views.HANAconn,name="HANAconn"),
     path('api/hanatables/<int:p_id>/<str:c_name>/',views.HANAtables,name="hanatables"),
     path('api/hanadata/',views.HANAtables,name="HANAtables"),
+    path('api/hanaextract/<int:p_id>/<str:c_name>/',views.HANAextract,name="HANAextract"),
 
 
     # path('api/saptables_to_sqlite/<int:connection_id>/',views.saptables_to_sqlite,name="sqltolite"),
     path('api/SAPTableSearch/<str:tab>/<int:connection_id>/',views.SAPTableSearch,name="SAPTableSearch"),
+    path('api/SAPDeltaRefresh/<str:tab>/',views.SAPDeltaRefresh,name="SAPDeltaRefresh"),
+    path('api/SAPTableMetadata/<str:tab>/<int:connection_id>/',views.SAPTableMetadata,name="SAPTableMetadata"),
 
     # project CURD
     path('api/Pcreate/',views.ProjectCreate,name="Pcreate"),
@@ -42,6 +45,8 @@ urlpatterns = [
     path('api/Osegements/<int:pid>/<int:oid>/',views.DataObject_Segements,name="DataObject_Segements"),
     path('api/Sfields/<int:pid>/<int:oid>/<int:sid>/',views.Segements_Fields,name="Segements_Fields"),
     path('api/getTable/<int:sid>/',views.getTableData,name="getTableData"),
+    path('api/getTablePage/<int:sid>/',views.getTablePage,name="getTablePage"),
+    path('api/exportTable/<int:sid>/',views.exportTable,name="exportTable"),
     path('api/execute_queries/<int:pid>/<int:oid>/<int:sid>/',views.execute_queries,name="execute_queries"),
     path('api/execute_selection_criteria/<int:pid>/<int:oid>/<int:sid>/',views.execute_selection_criteria,name="execute_selection_criteria"),
     path('api/getLatestVersion/<int:pid>/<int:oid>/<int:sid>/',views.getLatestVersion,name="getLatestVersion"),
@@ -1,5 +1,9 @@
 from ctypes import *
 import platform, os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 
 class RFC_ERROR_INFO(Structure):
@@ -18,108 +22,132 @@ class RFC_ERROR_INFO(Structure):
 class RFC_CONNECTION_PARAMETER(Structure):
     _fields_ = [("name", c_wchar_p),
                 ("value", c_wchar_p)]
-def sapnwrfc():
-    RFC_OK = 0
-    RFC_COMMUNICATION_FAILURE = 1
-    RFC_LOGON_FAILURE = 2
-    RFC_ABAP_RUNTIME_FAILURE = 3
-    RFC_ABAP_MESSAGE = 4
-    RFC_ABAP_EXCEPTION = 5
-    RFC_CLOSED = 6
-    RFC_CANCELED = 7
-    RFC_TIMEOUT = 8
-    RFC_MEMORY_INSUFFICIENT = 9
-    RFC_VERSION_MISMATCH = 10
-    RFC_INVALID_PROTOCOL = 11
-    RFC_SERIALIZATION_FAILURE = 12
-    RFC_INVALID_HANDLE = 13
-    RFC_RETRY = 14
-    RFC_EXTERNAL_FAILURE = 15
-    RFC_EXECUTED = 16
-    RFC_NOT_FOUND = 17
-    RFC_NOT_SUPPORTED = 18
-    RFC_ILLEGAL_STATE = 19
-    RFC_INVALID_PARAMETER = 20
-    RFC_CODEPAGE_CONVERSION_FAILURE = 21
-    RFC_CONVERSION_FAILURE = 22
-    RFC_BUFFER_TOO_SMALL = 23
-    RFC_TABLE_MOVE_BOF = 24
-    RFC_TABLE_MOVE_EOF = 25
-    RFC_START_SAPGUI_FAILURE = 26
-    RFC_ABAP_CLASS_EXCEPTION = 27
-    RFC_UNKNOWN_ERROR = 28
-    RFC_AUTHORIZATION_FAILURE = 29
-
-    #-RFCTYPE - RFC data types----------------------------------------------
-    RFCTYPE_CHAR = 0
-    RFCTYPE_DATE = 1
-    RFCTYPE_BCD = 2
-    RFCTYPE_TIME = 3
-    RFCTYPE_BYTE = 4
-    RFCTYPE_TABLE = 5
-    RFCTYPE_NUM = 6
-    RFCTYPE_FLOAT = 7
-    RFCTYPE_INT = 8
-    RFCTYPE_INT2 = 9
-    RFCTYPE_INT1 = 10
-    RFCTYPE_NULL = 14
-    RFCTYPE_ABAPOBJECT = 16
-    RFCTYPE_STRUCTURE = 17
-    RFCTYPE_DECF16 = 23
-    RFCTYPE_DECF34 = 24
-    RFCTYPE_XMLDATA = 28
-    RFCTYPE_STRING = 29
-    RFCTYPE_XSTRING = 30
-    RFCTYPE_BOX = 31
-    RFCTYPE_GENERIC_BOX = 32
-
-    #-RFC_UNIT_STATE - Processing status of a background unit---------------
-    RFC_UNIT_NOT_FOUND = 0 
-    RFC_UNIT_IN_PROCESS = 1 
-    RFC_UNIT_COMMITTED = 2 
-    RFC_UNIT_ROLLED_BACK = 3 
-    RFC_UNIT_CONFIRMED = 4 
-
-    #-RFC_CALL_TYPE - Type of an incoming function call---------------------
-    RFC_SYNCHRONOUS = 0 
-    RFC_TRANSACTIONAL = 1 
-    RFC_QUEUED = 2 
-    RFC_BACKGROUND_UNIT = 3 
-
-    #-RFC_DIRECTION - Direction of a function module parameter--------------
-    RFC_IMPORT = 1 
-    RFC_EXPORT = 2 
-    RFC_CHANGING = RFC_IMPORT + RFC_EXPORT 
-    RFC_TABLES = 4 + RFC_CHANGING 
-
-    #-RFC_CLASS_ATTRIBUTE_TYPE - Type of an ABAP object attribute-----------
-    RFC_CLASS_ATTRIBUTE_INSTANCE = 0 
-    RFC_CLASS_ATTRIBUTE_CLASS = 1 
-    RFC_CLASS_ATTRIBUTE_CONSTANT = 2 
-
-    #-RFC_METADATA_OBJ_TYPE - Ingroup repository----------------------------
-    RFC_METADATA_FUNCTION = 0 
-    RFC_METADATA_TYPE = 1 
-    RFC_METADATA_CLASS = 2 
-
-
-    #-Variables-------------------------------------------------------------
-    ErrInf = RFC_ERROR_INFO; RfcErrInf = ErrInf()
-    ConnParams = RFC_CONNECTION_PARAMETER * 5; RfcConnParams = ConnParams()
-    SConParams = RFC_CONNECTION_PARAMETER * 3; RfcSConParams = SConParams()
-
-
-    #-Library---------------------------------------------------------------
-    # if str(platform.architecture()[0]) == "32bit":
-    #   os.environ['PATH'] += ";C:\\SAPRFCSDK\\32bit"
-    #   SAPNWRFC = "C:\\SAPRFCSDK\\32bit\\sapnwrfc.dll"
-    # elif str(platform.architecture()[0]) == "64bit":
-    #   os.environ['PATH'] += ";C:\\SAPRFCSDK\\64bit"
-    #   SAPNWRFC = "C:\\SAPRFCSDK\\64bit\\sapnwrfc.dll"
-
-    SAPNWRFC = "sapnwrfc.dll"
-    SAP = windll.LoadLibrary(SAPNWRFC)
 
+
+#-RFC_RC - RFC return codes---------------------------------------------
+RFC_OK = 0
+RFC_COMMUNICATION_FAILURE = 1
+RFC_LOGON_FAILURE = 2
+RFC_ABAP_RUNTIME_FAILURE = 3
+RFC_ABAP_MESSAGE = 4
+RFC_ABAP_EXCEPTION = 5
+RFC_CLOSED = 6
+RFC_CANCELED = 7
+RFC_TIMEOUT = 8
+RFC_MEMORY_INSUFFICIENT = 9
+RFC_VERSION_MISMATCH = 10
+RFC_INVALID_PROTOCOL = 11
+RFC_SERIALIZATION_FAILURE = 12
+RFC_INVALID_HANDLE = 13
+RFC_RETRY = 14
+RFC_EXTERNAL_FAILURE = 15
+RFC_EXECUTED = 16
+RFC_NOT_FOUND = 17
+RFC_NOT_SUPPORTED = 18
+RFC_ILLEGAL_STATE = 19
+RFC_INVALID_PARAMETER = 20
+RFC_CODEPAGE_CONVERSION_FAILURE = 21
+RFC_CONVERSION_FAILURE = 22
+RFC_BUFFER_TOO_SMALL = 23
+RFC_TABLE_MOVE_BOF = 24
+RFC_TABLE_MOVE_EOF = 25
+RFC_START_SAPGUI_FAILURE = 26
+RFC_ABAP_CLASS_EXCEPTION = 27
+RFC_UNKNOWN_ERROR = 28
+RFC_AUTHORIZATION_FAILURE = 29
+
+#-RFCTYPE - RFC data types----------------------------------------------
+RFCTYPE_CHAR = 0
+RFCTYPE_DATE = 1
+RFCTYPE_BCD = 2
+RFCTYPE_TIME = 3
+RFCTYPE_BYTE = 4
+RFCTYPE_TABLE = 5
+RFCTYPE_NUM = 6
+RFCTYPE_FLOAT = 7
+RFCTYPE_INT = 8
+RFCTYPE_INT2 = 9
+RFCTYPE_INT1 = 10
+RFCTYPE_NULL = 14
+RFCTYPE_ABAPOBJECT = 16
+RFCTYPE_STRUCTURE = 17
+RFCTYPE_DECF16 = 23
+RFCTYPE_DECF34 = 24
+RFCTYPE_XMLDATA = 28
+RFCTYPE_STRING = 29
+RFCTYPE_XSTRING = 30
+RFCTYPE_BOX = 31
+RFCTYPE_GENERIC_BOX = 32
+
+#-RFC_UNIT_STATE - Processing status of a background unit---------------
+RFC_UNIT_NOT_FOUND = 0
+RFC_UNIT_IN_PROCESS = 1
+RFC_UNIT_COMMITTED = 2
+RFC_UNIT_ROLLED_BACK = 3
+RFC_UNIT_CONFIRMED = 4
+
+#-RFC_CALL_TYPE - Type of an incoming function call---------------------
+RFC_SYNCHRONOUS = 0
+RFC_TRANSACTIONAL = 1
+RFC_QUEUED = 2
+RFC_BACKGROUND_UNIT = 3
+
+#-RFC_DIRECTION - Direction of a function module parameter--------------
+RFC_IMPORT = 1
+RFC_EXPORT = 2
+RFC_CHANGING = RFC_IMPORT + RFC_EXPORT
+RFC_TABLES = 4 + RFC_CHANGING
+
+#-RFC_CLASS_ATTRIBUTE_TYPE - Type of an ABAP object attribute-----------
+RFC_CLASS_ATTRIBUTE_INSTANCE = 0
+RFC_CLASS_ATTRIBUTE_CLASS = 1
+RFC_CLASS_ATTRIBUTE_CONSTANT = 2
+
+#-RFC_METADATA_OBJ_TYPE - Ingroup repository----------------------------
+RFC_METADATA_FUNCTION = 0
+RFC_METADATA_TYPE = 1
+RFC_METADATA_CLASS = 2
+
+
+#-Variables-------------------------------------------------------------
+ErrInf = RFC_ERROR_INFO
+ConnParams = RFC_CONNECTION_PARAMETER * 5
+SConParams = RFC_CONNECTION_PARAMETER * 3
+
+# Order in which logon parameters are handed to RfcOpenConnection
+RFC_LOGON_KEYS = ("ASHOST", "SYSNR", "CLIENT", "USER", "PASSWD")
+
+#-Library---------------------------------------------------------------
+# if str(platform.architecture()[0]) == "32bit":
+#   os.environ['PATH'] += ";C:\\SAPRFCSDK\\32bit"
+#   SAPNWRFC = "C:\\SAPRFCSDK\\32bit\\sapnwrfc.dll"
+# elif str(platform.architecture()[0]) == "64bit":
+#   os.environ['PATH'] += ";C:\\SAPRFCSDK\\64bit"
+#   SAPNWRFC = "C:\\SAPRFCSDK\\64bit\\sapnwrfc.dll"
+
+SAPNWRFC = "sapnwrfc.dll"
+
+_SAP = None
+_SAP_LOCK = threading.Lock()
+
+
+class RfcError(Exception):
+    """Raised when an RFC SDK call does not return RFC_OK."""
+
+    def __init__(self, message, key="", code=None):
+        super().__init__(message)
+        self.key = key
+        self.code = code
+
+    @classmethod
+    def from_error_info(cls, err, context=""):
+        message = str(err.message).strip()
+        if context:
+            message = f"{context}: {message}" if message else context
+        return cls(message, key=str(err.key).strip(), code=err.code)
+
+
+def _bind_prototypes(SAP):
     #-Prototypes------------------------------------------------------------
     SAP.RfcAppendNewRow.argtypes = [c_void_p, POINTER(ErrInf)]
     SAP.RfcAppendNewRow.restype = c_void_p
@@ -133,6 +161,9 @@ def sapnwrfc():
     SAP.RfcCreateFunctionDesc.argtypes = [c_wchar_p, POINTER(ErrInf)]
     SAP.RfcCreateFunctionDesc.restype = c_void_p
 
+    SAP.RfcCreateTable.argtypes = [c_void_p, POINTER(ErrInf)]
+    SAP.RfcCreateTable.restype = c_void_p
+
     SAP.RfcDestroyFunction.argtypes = [c_void_p, POINTER(ErrInf)]
     SAP.RfcDestroyFunction.restype = c_ulong
 
@@ -196,8 +227,542 @@ def sapnwrfc():
     POINTER(ErrInf)]
     SAP.RfcSetChars.restype = c_ulong
 
-    return [RfcConnParams,RfcErrInf,SAP]
+    SAP.RfcSetInt.argtypes = [c_void_p, c_wchar_p, c_long, POINTER(ErrInf)]
+    SAP.RfcSetInt.restype = c_ulong
 
 
+def load_sapnwrfc():
+    """
+    Load sapnwrfc.dll and bind its prototypes once per process.
+    Every caller shares the same library handle.
+    """
+    global _SAP
+    if _SAP is None:
+        with _SAP_LOCK:
+            if _SAP is None:
+                SAP = windll.LoadLibrary(SAPNWRFC)
+                _bind_prototypes(SAP)
+                _SAP = SAP
+    return _SAP
 
-    
\ No newline at end of file
+
+def sapnwrfc():
+    RfcErrInf = ErrInf()
+    RfcConnParams = ConnParams()
+    return [RfcConnParams,RfcErrInf,load_sapnwrfc()]
+
+
+def _setting(name, default):
+    try:
+        from django.conf import settings
+        return getattr(settings, name, default)
+    except Exception:
+        return default
+
+
+def rfc_params_from_connection(conn):
+    return {
+        "ASHOST": conn.host,
+        "SYSNR": conn.sysnr,
+        "CLIENT": conn.client,
+        "USER": conn.username,
+        "PASSWD": conn.password,
+    }
+
+
+def default_rfc_params():
+    params = dict(_setting('SAP_RFC_DEFAULT_PARAMS', {}))
+    missing = [f"SAP_RFC_{key}" for key in RFC_LOGON_KEYS if not params.get(key)]
+    if missing:
+        raise RfcError(f"Default SAP logon is not configured, set {', '.join(missing)} in the environment or .env")
+    return params
+
+
+def _conn_params(params):
+    RfcConnParams = ConnParams()
+    for i, key in enumerate(RFC_LOGON_KEYS):
+        RfcConnParams[i].name = key
+        RfcConnParams[i].value = str(params.get(key) or "")
+    return RfcConnParams
+
+
+def rfc_open(params):
+    SAP = load_sapnwrfc()
+    RfcErrInf = ErrInf()
+    hRFC = SAP.RfcOpenConnection(_conn_params(params), len(RFC_LOGON_KEYS), RfcErrInf)
+    if hRFC is None:
+        raise RfcError.from_error_info(RfcErrInf, "RfcOpenConnection failed")
+    return hRFC
+
+
+def rfc_close(hRFC):
+    if hRFC is None:
+        return
+    SAP = load_sapnwrfc()
+    RfcErrInf = ErrInf()
+    SAP.RfcCloseConnection(hRFC, RfcErrInf)
+
+
+def rfc_ping(hRFC):
+    SAP = load_sapnwrfc()
+    RfcErrInf = ErrInf()
+    return SAP.RfcPing(hRFC, RfcErrInf) == RFC_OK
+
+
+def rfc_check_logon(params):
+    """Open a connection with the given logon parameters, ping it and close it again."""
+    hRFC = rfc_open(params)
+    try:
+        if not rfc_ping(hRFC):
+            raise RfcError("RfcPing failed")
+    finally:
+        rfc_close(hRFC)
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of open connections for one set of logon parameters.
+
+    Connections are reused across requests instead of paying a logon per view
+    call. A connection that sat idle longer than ping_after seconds is checked
+    with _is_alive() before it is handed out and replaced when the check fails;
+    connections idle longer than max_idle seconds are closed.
+    Subclasses implement _open, _close and _is_alive.
+    """
+    error_class = Exception
+    broken_errors = ()  # Errors after which a borrowed connection is not reused
+
+    def __init__(self, params, max_size=4, ping_after=30, acquire_timeout=120, max_idle=600):
+        self.params = dict(params)
+        self.max_size = max(1, int(max_size))
+        self.ping_after = ping_after
+        self.acquire_timeout = acquire_timeout
+        self.max_idle = max_idle
+        self._idle = []
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _close(self, conn):
+        raise NotImplementedError
+
+    def _is_alive(self, conn):
+        raise NotImplementedError
+
+    def _evict_idle(self):
+        # Called with self._cond held; returns the connections to close
+        if not self.max_idle:
+            return []
+        cutoff = time.monotonic() - self.max_idle
+        expired = [conn for conn, last_used in self._idle if last_used < cutoff]
+        if expired:
+            self._idle = [(conn, last_used) for conn, last_used in self._idle if last_used >= cutoff]
+        return expired
+
+    def acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            expired = self._evict_idle()
+            while True:
+                if self._closed:
+                    raise self.error_class("Connection pool is closed")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.max_size:
+                    conn, last_used = None, None
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self.error_class(f"No connection became free within {self.acquire_timeout}s")
+                self._cond.wait(remaining)
+
+        for stale in expired:
+            self._close(stale)
+        try:
+            if conn is not None and time.monotonic() - last_used > self.ping_after:
+                if not self._is_alive(conn):
+                    self._close(conn)
+                    conn = None
+            if conn is None:
+                conn = self._open()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, discard=False):
+        if discard or self._closed:
+            self._close(conn)
+        with self._cond:
+            self._in_use -= 1
+            if not discard and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+            expired = self._evict_idle()
+            self._cond.notify()
+        for stale in expired:
+            self._close(stale)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except self.broken_errors:
+            # The connection may be broken (communication failure, closed by the server)
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def evict_idle(self):
+        """
+        Close the connections idle longer than max_idle without borrowing one.
+        Returns True when the pool holds no connection afterwards.
+        """
+        with self._cond:
+            expired = self._evict_idle()
+            empty = not self._idle and not self._in_use
+        for stale in expired:
+            self._close(stale)
+        return empty
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+
+class RfcConnectionPool(ConnectionPool):
+    """
+    Pool of RFC handles. Idle handles are re-checked with RfcPing before reuse.
+    Sizes and timeouts default to the SAP_RFC_POOL_* settings.
+    """
+    error_class = RfcError
+    broken_errors = (RfcError,)
+
+    def __init__(self, params, max_size=None, ping_after=None, acquire_timeout=None, max_idle=None):
+        super().__init__(
+            params,
+            max_size=max_size or _setting('SAP_RFC_POOL_MAX_SIZE', 4),
+            ping_after=ping_after if ping_after is not None else _setting('SAP_RFC_POOL_PING_AFTER', 30),
+            acquire_timeout=acquire_timeout if acquire_timeout is not None else _setting('SAP_RFC_POOL_TIMEOUT', 120),
+            max_idle=max_idle if max_idle is not None else _setting('SAP_RFC_POOL_MAX_IDLE', 600),
+        )
+
+    def _open(self):
+        return rfc_open(self.params)
+
+    def _close(self, hRFC):
+        rfc_close(hRFC)
+
+    def _is_alive(self, hRFC):
+        return rfc_ping(hRFC)
+
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_rfc_pool(key, params):
+    """
+    Return the shared pool registered under key (normally a connection_id).
+    A pool whose logon parameters no longer match (e.g. the password was changed)
+    is closed and replaced.
+    """
+    params = dict(params)
+    stale = None
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is not None and pool.params != params:
+            stale, pool = pool, None
+        if pool is None:
+            pool = RfcConnectionPool(params)
+            _POOLS[key] = pool
+    if stale is not None:
+        stale.close()
+    return pool
+
+
+def get_connection_pool(conn):
+    return get_rfc_pool(conn.connection_id, rfc_params_from_connection(conn))
+
+
+def get_default_rfc_pool():
+    return get_rfc_pool("default", default_rfc_params())
+
+
+def close_rfc_pool(key):
+    with _POOLS_LOCK:
+        pool = _POOLS.pop(key, None)
+    if pool is not None:
+        pool.close()
+
+
+@contextmanager
+def rfc_function(hRFC, function_name, chars=None, ints=None, tables=None):
+    """
+    Create and invoke a function module on hRFC.
+    chars / ints map importing parameter names to values, tables maps table
+    parameter names to lists of {field: value} rows. Yields the function
+    handle so tables can be read from it; the handle is destroyed afterwards.
+    """
+    SAP = load_sapnwrfc()
+    RfcErrInf = ErrInf()
+    hFuncDesc = SAP.RfcGetFunctionDesc(hRFC, function_name, RfcErrInf)
+    if not hFuncDesc:
+        raise RfcError.from_error_info(RfcErrInf, f"RfcGetFunctionDesc({function_name}) failed")
+    hFunc = SAP.RfcCreateFunction(hFuncDesc, RfcErrInf)
+    if not hFunc:
+        raise RfcError.from_error_info(RfcErrInf, f"RfcCreateFunction({function_name}) failed")
+    try:
+        for name, value in (chars or {}).items():
+            value = str(value)
+            SAP.RfcSetChars(hFunc, name, value, len(value), RfcErrInf)
+        for name, value in (ints or {}).items():
+            SAP.RfcSetInt(hFunc, name, int(value), RfcErrInf)
+        for name, rows in (tables or {}).items():
+            hTable = c_void_p(0)
+            if SAP.RfcGetTable(hFunc, name, hTable, RfcErrInf) != RFC_OK:
+                raise RfcError.from_error_info(RfcErrInf, f"RfcGetTable({name}) failed")
+            for row in rows:
+                hRow = SAP.RfcAppendNewRow(hTable, RfcErrInf)
+                for field, value in row.items():
+                    value = str(value)
+                    SAP.RfcSetChars(hRow, field, value, len(value), RfcErrInf)
+        if SAP.RfcInvoke(hRFC, hFunc, RfcErrInf) != RFC_OK:
+            raise RfcError.from_error_info(RfcErrInf, f"RfcInvoke({function_name}) failed")
+        yield hFunc
+    finally:
+        SAP.RfcDestroyFunction(hFunc, ErrInf())
+
+
+def rfc_table_rows(hFunc, table_name, columns, buffer_size=512):
+    """
+    Yield one tuple of character values per row of the table parameter table_name.
+    buffer_size is either one length for every column or a dict per column.
+    """
+    SAP = load_sapnwrfc()
+    RfcErrInf = ErrInf()
+    hTable = c_void_p(0)
+    if SAP.RfcGetTable(hFunc, table_name, hTable, RfcErrInf) != RFC_OK:
+        raise RfcError.from_error_info(RfcErrInf, f"RfcGetTable({table_name}) failed")
+
+    sizes = [buffer_size.get(c, 512) if isinstance(buffer_size, dict) else buffer_size for c in columns]
+    buffers = [create_unicode_buffer(size + 1) for size in sizes]
+
+    RowCount = c_ulong(0)
+    SAP.RfcGetRowCount(hTable, RowCount, RfcErrInf)
+    SAP.RfcMoveToFirstRow(hTable, RfcErrInf)
+    for i in range(0, RowCount.value):
+        hRow = SAP.RfcGetCurrentRow(hTable, RfcErrInf)
+        values = []
+        for column, buffer, size in zip(columns, buffers, sizes):
+            SAP.RfcGetChars(hRow, column, buffer, size, RfcErrInf)
+            values.append(str(buffer.value))
+        yield tuple(values)
+        if i < RowCount.value:
+            SAP.RfcMoveToNextRow(hTable, RfcErrInf)
+
+
+#-Table extraction------------------------------------------------------
+
+def read_key_fields(hRFC, table_name):
+    with rfc_function(hRFC, "CACS_GET_TABLE_FIELD450", chars={"I_TABNAME": table_name}) as hFunc:
+        return [fieldName.strip() for (fieldName,) in rfc_table_rows(hFunc, "T_KEYFIELD", ["FIELDNAME"])]
+
+
+def read_field_catalog(hRFC, table_name, delimiter="~"):
+    """Return [(FIELDNAME, LENGTH), ...] for table_name in DDIC order."""
+    with rfc_function(hRFC, "Z450RFC_READ_TABLE", chars={"QUERY_TABLE": table_name, "DELIMITER": delimiter}) as hFunc:
+        return [(fieldName.strip(), int(length))
+                for fieldName, length in rfc_table_rows(hFunc, "FIELDS", ["FIELDNAME", "LENGTH"])]
+
+
+def read_field_types(hRFC, table_name, delimiter="~"):
+    """Return {FIELDNAME: ABAP type} (FIELDS-TYPE, e.g. C, N, D, P, I) for table_name."""
+    with rfc_function(hRFC, "Z450RFC_READ_TABLE", chars={"QUERY_TABLE": table_name, "DELIMITER": delimiter}) as hFunc:
+        return {fieldName.strip(): abapType.strip()
+                for fieldName, abapType in rfc_table_rows(hFunc, "FIELDS", ["FIELDNAME", "TYPE"])}
+
+
+def iter_table_descriptions(hRFC, n=50):
+    """Yield (table, description) for every table in the ERP catalog (ZTABLE_NAMES_DESC)."""
+    with rfc_function(hRFC, "ZTABLE_NAMES_DESC", ints={"N": n}) as hFunc:
+        for tab, desc in rfc_table_rows(hFunc, "DATA", ["TAB", "DESC"]):
+            yield tab.strip(), desc.strip()
+
+
+def plan_field_chunks(key_fields, catalog, max_width=400):
+    """
+    Split the field catalog into FIELDNAME lists for Z450RFC_READ_TAB_DATA.
+    Every chunk repeats the key fields so the chunks can be joined back
+    together, and stays under max_width characters per row.
+    """
+    keyFieldsCnt = len(key_fields)
+    sum, l, l1 = 0, [], list(key_fields)
+    keyFieldsLen = 0
+    for i, (fieldName, val) in enumerate(catalog):
+        if (i < keyFieldsCnt):
+            keyFieldsLen += val
+        else:
+            if (sum + val + keyFieldsLen < max_width):
+                sum += val
+                l1.append(fieldName)
+            else:
+                l.append(l1)
+                l1 = list(key_fields)
+                l1.append(fieldName)
+                sum = val
+    l.append(l1)
+    return l
+
+
+def read_chunk(hRFC, table_name, chunk_fields, delimiter="~", rowskips=None, rowcount=None, options=None):
+    """
+    Read one field chunk of table_name. rowskips / rowcount page through the
+    rows and options is a list of WHERE clause lines (same meaning as in
+    RFC_READ_TABLE); without them every row is returned.
+    """
+    field = ','.join(chunk_fields)
+    chars = {"QUERY_TABLE": table_name, "DELIMITER": delimiter, "FIELDNAME": field}
+    ints = {}
+    if rowcount is not None:
+        ints = {"ROWSKIPS": rowskips or 0, "ROWCOUNT": rowcount}
+    data = {f: [] for f in chunk_fields}
+    columns = [data[f] for f in chunk_fields]
+    tables = {"OPTIONS": [{"TEXT": line} for line in options]} if options else None
+    with rfc_function(hRFC, "Z450RFC_READ_TAB_DATA", chars=chars, ints=ints, tables=tables) as hFunc:
+        for (wa,) in rfc_table_rows(hFunc, "DATA", ["WA"], buffer_size=1024):
+            data_row = wa.split(delimiter)
+            for i, column in enumerate(columns):
+                column.append(data_row[i].strip() if i < len(data_row) else None)
+    return data
+
+
+class ChunkMergeError(Exception):
+    """Raised when field chunks of one table cannot be aligned on its key fields."""
+
+
+def chunk_row_count(data):
+    return len(next(iter(data.values()))) if data else 0
+
+
+def _duplicate_key(keys):
+    seen = set()
+    for key in keys:
+        if key in seen:
+            return key
+        seen.add(key)
+    return None
+
+
+def merge_chunk_columns(base, data, key_fields):
+    """
+    Add the columns of chunk data to base (both {field: [values]}), aligned on
+    the composite key. When both chunks came back in the same row order the
+    columns are taken over as they are; otherwise rows are matched through a
+    key index.
+    Duplicate keys, and keys present in only one of the chunks (the table
+    changed between the chunk reads, or pages of one offset differ), raise
+    ChunkMergeError instead of silently keeping one row or padding with None.
+    """
+    data_keys = list(zip(*(data[k] for k in key_fields))) if key_fields else []
+    duplicate = _duplicate_key(data_keys)
+    if duplicate is not None:
+        raise ChunkMergeError(f"Duplicate key {duplicate} in chunk")
+    if not base:
+        return data
+
+    new_fields = [f for f in data if f not in base]
+    if not key_fields:
+        if chunk_row_count(base) != chunk_row_count(data):
+            raise ChunkMergeError("Chunks without key fields returned different row counts")
+        for f in new_fields:
+            base[f] = data[f]
+        return base
+
+    base_keys = list(zip(*(base[k] for k in key_fields)))
+    if base_keys == data_keys:
+        for f in new_fields:
+            base[f] = data[f]
+        return base
+
+    index = {key: pos for pos, key in enumerate(data_keys)}
+    positions = [index.get(key) for key in base_keys]
+    missing = positions.count(None)
+    if missing or len(base_keys) != len(data_keys):
+        raise ChunkMergeError(f"Chunks returned different rows ({missing} keys unmatched)")
+    for f in new_fields:
+        column = data[f]
+        base[f] = [column[pos] for pos in positions]
+    return base
+
+
+def columns_to_rows(data):
+    """Turn {field: [values]} into one dict per row."""
+    fields = list(data)
+    return [dict(zip(fields, values)) for values in zip(*(data[f] for f in fields))]
+
+
+def chunk_workers(pool, chunks, parallel=None):
+    if parallel is None:
+        parallel = _setting('SAP_RFC_CHUNK_PARALLELISM', 1)
+    return max(1, min(int(parallel), pool.max_size, len(chunks)))
+
+
+def read_chunks(pool, executor, table_name, chunks, key_fields, rowskips=None, rowcount=None, options=None):
+    """
+    Read every field chunk through executor, each call on its own pooled
+    connection, and join the results on key_fields. executor.map keeps chunk
+    order, so the merge is the same as a sequential read.
+    Returns the table as {field: [values]}.
+    """
+    def read_one(splittedFields):
+        with pool.connection() as hRFC:
+            return read_chunk(hRFC, table_name, splittedFields, rowskips=rowskips, rowcount=rowcount,
+                              options=options)
+
+    merged = {}
+    for data in executor.map(read_one, chunks):
+        merged = merge_chunk_columns(merged, data, key_fields)
+    return merged
+
+
+def read_table_layout(pool, table_name):
+    """Return (key fields, field catalog, field chunks) for table_name."""
+    with pool.connection() as hRFC:
+        keyFields = read_key_fields(hRFC, table_name)
+        catalog = read_field_catalog(hRFC, table_name)
+    return keyFields, catalog, plan_field_chunks(keyFields, catalog)
+
+
+def read_sap_table(pool, table_name, parallel=None, layout=None):
+    """
+    Read a whole SAP table through the pool: key fields, field catalog,
+    one Z450RFC_READ_TAB_DATA call per field chunk, joined on the key fields.
+
+    With parallel > 1 the chunk calls run concurrently, each on its own pooled
+    connection, so wall time is close to the slowest chunk instead of the sum
+    of all of them. parallel defaults to SAP_RFC_CHUNK_PARALLELISM and is capped
+    by the pool size. layout is a (key fields, catalog, chunks) tuple that was
+    already looked up, e.g. from the metadata cache.
+    Returns a list of dicts, one per row.
+    """
+    table_name = table_name.upper()
+    keyFields, catalog, chunks = layout or read_table_layout(pool, table_name)
+    with ThreadPoolExecutor(max_workers=chunk_workers(pool, chunks, parallel)) as executor:
+        return columns_to_rows(read_chunks(pool, executor, table_name, chunks, keyFields))
@@ -1,7 +1,21 @@
 from django.shortcuts import HttpResponse
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework.decorators import api_view
-from .utils import sapnwrfc
+from .utils import (RfcError, rfc_check_logon,
+                    get_connection_pool, get_default_rfc_pool, close_rfc_pool,
+                    read_sap_table)
+from .template_workbook import open_template_workbook, read_segment_sheet
+from .table_stats import (table_columns, column_display_flags, column_stats_by_name, non_empty_columns,
+                          invalidate_column_stats)
+from .column_types import infer_column_types, infer_dataframe_types
+from .columnar_export import (EXPORT_FORMATS, ColumnarExportUnavailable, columnar_export_available,
+                              export_schema, export_chunks)
+from .streaming import (stream_format, iter_table_rows, json_document_chunks, streaming_response,
+                        stream_table_response)
+from .bulk_load import quote_name, bulk_insert_dataframe, bulk_insert_frames, insert_rows, write_tables, ensure_index, create_index
+from .hana import hana_connect, get_hana_connection_pool, close_hana_pool, extract_hana_table
+from .sap_extract import (extract_table_to_sqlite, refresh_table_delta, get_table_layout,
+                          cached_table_metadata, invalidate_table_metadata, load_table_descriptions)
 from ctypes import *
 from rest_framework.response import Response
 from rest_framework import status
@@ -9,11 +23,13 @@ from hdbcli import dbapi
 import sqlite3
 from django.db import connections, transaction
 from .serlializers import *
-from .models import Project,Connection,fields
+from .models import Project,Connection,fields,SapTableMetadata
 import json
 from django.core.serializers import serialize
 import pandas as pd
 import re,string
+import hashlib
+import base64
 from django.db import connection
 from rest_framework.views import APIView
 from .serlializers import FileSerializer
@@ -25,6 +41,8 @@ from django.forms.models import model_to_dict
 import sys
 from datetime import datetime
 import numpy as np
+from itertools import chain
+from django.conf import settings
 # setting path
 sys.path.append('../DMtool')
 from DMtool.dmtool import DMTool
@@ -33,8 +51,11 @@ from DMtool.dmtool import DMTool
 
 
 def get_valid_data_frame(table_name, connection=connection):
-    # Load table from DB to DataFrame
-    df = pd.read_sql_query(f"SELECT * FROM {table_name}", connection)
+    # Load only the columns the statistics catalog knows to hold a non-blank value
+    columns = non_empty_columns(table_name, connection.alias)
+    if not columns:
+        return pd.DataFrame()
+    df = pd.read_sql_query(f"SELECT {', '.join(quote_name(c) for c in columns)} FROM {table_name}", connection)
 
     # Replace empty strings and only-whitespace with NaN
     df = df.replace(r'^\s*$', np.nan, regex=True)
@@ -46,6 +67,10 @@ def get_valid_data_frame(table_name, connection=connection):
 
 @api_view(['GET'])
 def return_target_table(request):
+    fmt = stream_format(request)
+    if fmt:
+        table_name = "t_113_Product_Basic_Data_mandatory"
+        return stream_table_response(table_name, fmt, columns=non_empty_columns(table_name), blank_as_null=True)
     df_valid = get_valid_data_frame("t_113_Product_Basic_Data_mandatory")
     print(df_valid)
     json_data = df_valid.to_dict(orient="records")
@@ -62,23 +87,28 @@ def add_prompt_and_last_updated_on(table_name):
         cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN prompt TEXT;")
         # Add last_updated_on column (as TEXT, or replace with DATETIME if you prefer)
         cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN last_updated_on DATETIME;")
+    invalidate_column_stats(table_name)
     print(f"Columns 'prompt' and 'last_updated_on' added to {table_name}.")
 
 
-def copy_rows_with_reason_and_timestamp(table1, table2, row_indices, prompt):
+def copy_rows_with_reason_and_timestamp(table1, table2, row_ids, prompt):
+    # row_ids: ROWIDs of table1 reported by DMTool's change capture
     import pandas as pd
 
-    # Load table1 into DataFrame using raw connection for full compatibility
-    conn = connection.connection
-    df1 = pd.read_sql_query(f"SELECT * FROM {table1}", conn)
-    
-    if not row_indices:
+    if not row_ids:
         print("No row indices provided to copy.")
         return
-    
-    # Get the rows by index
+
+    # Read only those rows, using raw connection for full compatibility
+    connection.ensure_connection()
+    conn = connection.connection
     try:
-        selected_df = df1.iloc[row_indices].copy()
+        chunks = [row_ids[i:i + 500] for i in range(0, len(row_ids), 500)]
+        selected_df = pd.concat(
+            [pd.read_sql_query(f"SELECT * FROM {table1} WHERE ROWID IN ({', '.join('?' * len(chunk))})",
+                               conn, params=chunk)
+             for chunk in chunks],
+            ignore_index=True)
     except Exception as e:
         print(f"Error selecting rows: {e}")
         return
@@ -94,203 +124,18 @@ def copy_rows_with_reason_and_timestamp(table1, table2, row_indices, prompt):
  
 @api_view(['POST'])
 def SAPconn(request):
-    class RFC_ERROR_INFO(Structure):
-        _fields_ = [("code", c_long),
-                    ("group", c_long),
-                    ("key", c_wchar * 128),
-                    ("message", c_wchar * 512),
-                    ("abapMsgClass", c_wchar * 21),
-                    ("abapMsgType", c_wchar * 2),
-                    ("abapMsgNumber", c_wchar * 4),
-                    ("abapMsgV1", c_wchar * 51),
-                    ("abapMsgV2", c_wchar * 51),
-                    ("abapMsgV3", c_wchar * 51),
-                    ("abapMsgV4", c_wchar * 51)]
-    class RFC_CONNECTION_PARAMETER(Structure):
-        _fields_ = [("name", c_wchar_p),
-                    ("value", c_wchar_p)]
-    RFC_OK = 0
-    RFC_COMMUNICATION_FAILURE = 1
-    RFC_LOGON_FAILURE = 2
-    RFC_ABAP_RUNTIME_FAILURE = 3
-    RFC_ABAP_MESSAGE = 4
-    RFC_ABAP_EXCEPTION = 5
-    RFC_CLOSED = 6
-    RFC_CANCELED = 7
-    RFC_TIMEOUT = 8
-    RFC_MEMORY_INSUFFICIENT = 9
-    RFC_VERSION_MISMATCH = 10
-    RFC_INVALID_PROTOCOL = 11
-    RFC_SERIALIZATION_FAILURE = 12
-    RFC_INVALID_HANDLE = 13
-    RFC_RETRY = 14
-    RFC_EXTERNAL_FAILURE = 15
-    RFC_EXECUTED = 16
-    RFC_NOT_FOUND = 17
-    RFC_NOT_SUPPORTED = 18
-    RFC_ILLEGAL_STATE = 19
-    RFC_INVALID_PARAMETER = 20
-    RFC_CODEPAGE_CONVERSION_FAILURE = 21
-    RFC_CONVERSION_FAILURE = 22
-    RFC_BUFFER_TOO_SMALL = 23
-    RFC_TABLE_MOVE_BOF = 24
-    RFC_TABLE_MOVE_EOF = 25
-    RFC_START_SAPGUI_FAILURE = 26
-    RFC_ABAP_CLASS_EXCEPTION = 27
-    RFC_UNKNOWN_ERROR = 28
-    RFC_AUTHORIZATION_FAILURE = 29
-
-    #-RFCTYPE - RFC data types----------------------------------------------
-    RFCTYPE_CHAR = 0
-    RFCTYPE_DATE = 1
-    RFCTYPE_BCD = 2
-    RFCTYPE_TIME = 3
-    RFCTYPE_BYTE = 4
-    RFCTYPE_TABLE = 5
-    RFCTYPE_NUM = 6
-    RFCTYPE_FLOAT = 7
-    RFCTYPE_INT = 8
-    RFCTYPE_INT2 = 9
-    RFCTYPE_INT1 = 10
-    RFCTYPE_NULL = 14
-    RFCTYPE_ABAPOBJECT = 16
-    RFCTYPE_STRUCTURE = 17
-    RFCTYPE_DECF16 = 23
-    RFCTYPE_DECF34 = 24
-    RFCTYPE_XMLDATA = 28
-    RFCTYPE_STRING = 29
-    RFCTYPE_XSTRING = 30
-    RFCTYPE_BOX = 31
-    RFCTYPE_GENERIC_BOX = 32
-
-    #-RFC_UNIT_STATE - Processing status of a background unit---------------
-    RFC_UNIT_NOT_FOUND = 0 
-    RFC_UNIT_IN_PROCESS = 1 
-    RFC_UNIT_COMMITTED = 2 
-    RFC_UNIT_ROLLED_BACK = 3 
-    RFC_UNIT_CONFIRMED = 4 
-
-    #-RFC_CALL_TYPE - Type of an incoming function call---------------------
-    RFC_SYNCHRONOUS = 0 
-    RFC_TRANSACTIONAL = 1 
-    RFC_QUEUED = 2 
-    RFC_BACKGROUND_UNIT = 3 
-
-    #-RFC_DIRECTION - Direction of a function module parameter--------------
-    RFC_IMPORT = 1 
-    RFC_EXPORT = 2 
-    RFC_CHANGING = RFC_IMPORT + RFC_EXPORT 
-    RFC_TABLES = 4 + RFC_CHANGING 
-
-    #-RFC_CLASS_ATTRIBUTE_TYPE - Type of an ABAP object attribute-----------
-    RFC_CLASS_ATTRIBUTE_INSTANCE = 0 
-    RFC_CLASS_ATTRIBUTE_CLASS = 1 
-    RFC_CLASS_ATTRIBUTE_CONSTANT = 2 
-
-    #-RFC_METADATA_OBJ_TYPE - Ingroup repository----------------------------
-    RFC_METADATA_FUNCTION = 0 
-    RFC_METADATA_TYPE = 1 
-    RFC_METADATA_CLASS = 2 
-
-
-    #-Variables-------------------------------------------------------------
-    ErrInf = RFC_ERROR_INFO; RfcErrInf = ErrInf()
-    ConnParams = RFC_CONNECTION_PARAMETER * 5; RfcConnParams = ConnParams()
-    SConParams = RFC_CONNECTION_PARAMETER * 3; RfcSConParams = SConParams()
-
-
-    SAPNWRFC = "sapnwrfc.dll"
-    SAP = windll.LoadLibrary(SAPNWRFC)
-
-    #-Prototypes------------------------------------------------------------
-    SAP.RfcAppendNewRow.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcAppendNewRow.restype = c_void_p
-
-    SAP.RfcCloseConnection.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcCloseConnection.restype = c_ulong
-
-    SAP.RfcCreateFunction.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcCreateFunction.restype = c_void_p
-
-    SAP.RfcCreateFunctionDesc.argtypes = [c_wchar_p, POINTER(ErrInf)]
-    SAP.RfcCreateFunctionDesc.restype = c_void_p
-
-    SAP.RfcDestroyFunction.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcDestroyFunction.restype = c_ulong
-
-    SAP.RfcDestroyFunctionDesc.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcDestroyFunctionDesc.restype = c_ulong
-
-    SAP.RfcGetChars.argtypes = [c_void_p, c_wchar_p, c_void_p, c_ulong, \
-    POINTER(ErrInf)]
-    SAP.RfcGetChars.restype = c_ulong
-
-    SAP.RfcGetCurrentRow.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcGetCurrentRow.restype = c_void_p
-
-    SAP.RfcGetFunctionDesc.argtypes = [c_void_p, c_wchar_p, POINTER(ErrInf)]
-    SAP.RfcGetFunctionDesc.restype = c_void_p
-
-    SAP.RfcGetRowCount.argtypes = [c_void_p, POINTER(c_ulong), \
-    POINTER(ErrInf)]
-    SAP.RfcGetRowCount.restype = c_ulong
-
-    SAP.RfcGetStructure.argtypes = [c_void_p, c_wchar_p, \
-    POINTER(c_void_p), POINTER(ErrInf)]
-    SAP.RfcGetStructure.restype = c_ulong
-
-    SAP.RfcGetTable.argtypes = [c_void_p, c_wchar_p, POINTER(c_void_p), \
-    POINTER(ErrInf)]
-    SAP.RfcGetTable.restype = c_ulong
-
-    SAP.RfcGetVersion.argtypes = [POINTER(c_ulong), POINTER(c_ulong), \
-    POINTER(c_ulong)]
-    SAP.RfcGetVersion.restype = c_wchar_p
-
-    SAP.RfcInstallServerFunction.argtypes = [c_wchar_p, c_void_p, \
-    c_void_p, POINTER(ErrInf)]
-    SAP.RfcInstallServerFunction.restype = c_ulong
-
-    SAP.RfcInvoke.argtypes = [c_void_p, c_void_p, POINTER(ErrInf)]
-    SAP.RfcInvoke.restype = c_ulong
-
-    SAP.RfcListenAndDispatch.argtypes = [c_void_p, c_ulong, POINTER(ErrInf)]
-    SAP.RfcListenAndDispatch.restype = c_ulong
-
-    SAP.RfcMoveToFirstRow.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcMoveToFirstRow.restype = c_ulong
-
-    SAP.RfcMoveToNextRow.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcMoveToNextRow.restype = c_ulong
-
-    SAP.RfcOpenConnection.argtypes = [POINTER(ConnParams), c_ulong, \
-    POINTER(ErrInf)]
-    SAP.RfcOpenConnection.restype = c_void_p
-
-    SAP.RfcPing.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcPing.restype = c_ulong
-
-    SAP.RfcRegisterServer.argtypes = [POINTER(SConParams), c_ulong, \
-    POINTER(ErrInf)]
-    SAP.RfcRegisterServer.restype = c_void_p
-
-    SAP.RfcSetChars.argtypes = [c_void_p, c_wchar_p, c_wchar_p, c_ulong, \
-    POINTER(ErrInf)]
-    SAP.RfcSetChars.restype = c_ulong
-
-    RfcConnParams[0].name = "ASHOST"; RfcConnParams[0].value = request.data['host']
-    RfcConnParams[1].name = "SYSNR" ; RfcConnParams[1].value = request.data['sysnr']            
-    RfcConnParams[2].name = "CLIENT"; RfcConnParams[2].value = request.data['client']      
-    RfcConnParams[3].name = "USER"  ; RfcConnParams[3].value = request.data['username']     
-    RfcConnParams[4].name = "PASSWD"; RfcConnParams[4].value = request.data['password']  
-
-
-    hRFC = SAP.RfcOpenConnection(RfcConnParams, 5, RfcErrInf)
-    # hRFC = ""
-    if hRFC != None:
+    params = {
+        "ASHOST": request.data['host'],
+        "SYSNR": request.data['sysnr'],
+        "CLIENT": request.data['client'],
+        "USER": request.data['username'],
+        "PASSWD": request.data['password'],
+    }
+    try:
+        rfc_check_logon(params)
         return Response(status=status.HTTP_200_OK)
-    else:
-        print(RfcErrInf.message)
+    except RfcError as e:
+        print(e)
     return Response(status=status.HTTP_404_NOT_FOUND)
 
 
@@ -303,338 +148,54 @@ def SAPconn(request):
 # @api_view(['GET'])
 def saptables_to_sqlite(connection_id):
     try:
-        ashost = ""
-        sysnr = ""
-        client = ""
-        user = ""
-        password = ""
         connection_object = ""
         if Connection.objects.filter(connection_id=connection_id).exists():
             conn = Connection.objects.get(connection_id=connection_id)
             if conn.status == 'InActive':
                 return Response(status=status.HTTP_406_NOT_ACCEPTABLE , data = "Connection is InActive")
             else:
-                ashost = conn.host
-                sysnr = conn.sysnr
-                client = conn.client
-                user = conn.username
-                password = conn.password
                 connection_object = conn
         else:
             return Response(status=status.HTTP_404_NOT_FOUND,data = "Connection Not Found")
-    
-    
-    
-        class RFC_ERROR_INFO(Structure):
-            _fields_ = [("code", c_ulong),
-                        ("group", c_ulong),
-                        ("key", c_wchar * 128),
-                        ("message", c_wchar * 512),
-                        ("abapMsgClass", c_wchar * 21),
-                        ("abapMsgType", c_wchar * 2),
-                        ("abapMsgNumber", c_wchar * 4),
-                        ("abapMsgV1", c_wchar * 51),
-                        ("abapMsgV2", c_wchar * 51),
-                        ("abapMsgV3", c_wchar * 51),
-                        ("abapMsgV4", c_wchar * 51)]
-    
-        class RFC_CONNECTION_PARAMETER(Structure):
-            _fields_ = [("name", c_wchar_p),
-                        ("value", c_wchar_p)]
-    
-    
-        #-Constants-------------------------------------------------------------
-    
-        #-RFC_RC - RFC return codes---------------------------------------------
-        RFC_OK = 0
-        RFC_COMMUNICATION_FAILURE = 1
-        RFC_LOGON_FAILURE = 2
-        RFC_ABAP_RUNTIME_FAILURE = 3
-        RFC_ABAP_MESSAGE = 4
-        RFC_ABAP_EXCEPTION = 5
-        RFC_CLOSED = 6
-        RFC_CANCELED = 7
-        RFC_TIMEOUT = 8
-        RFC_MEMORY_INSUFFICIENT = 9
-        RFC_VERSION_MISMATCH = 10
-        RFC_INVALID_PROTOCOL = 11
-        RFC_SERIALIZATION_FAILURE = 12
-        RFC_INVALID_HANDLE = 13
-        RFC_RETRY = 14
-        RFC_EXTERNAL_FAILURE = 15
-        RFC_EXECUTED = 16
-        RFC_NOT_FOUND = 17
-        RFC_NOT_SUPPORTED = 18
-        RFC_ILLEGAL_STATE = 19
-        RFC_INVALID_PARAMETER = 20
-        RFC_CODEPAGE_CONVERSION_FAILURE = 21
-        RFC_CONVERSION_FAILURE = 22
-        RFC_BUFFER_TOO_SMALL = 23
-        RFC_TABLE_MOVE_BOF = 24
-        RFC_TABLE_MOVE_EOF = 25
-        RFC_START_SAPGUI_FAILURE = 26
-        RFC_ABAP_CLASS_EXCEPTION = 27
-        RFC_UNKNOWN_ERROR = 28
-        RFC_AUTHORIZATION_FAILURE = 29
-    
-        #-RFCTYPE - RFC data types----------------------------------------------
-        RFCTYPE_CHAR = 0
-        RFCTYPE_DATE = 1
-        RFCTYPE_BCD = 2
-        RFCTYPE_TIME = 3
-        RFCTYPE_BYTE = 4
-        RFCTYPE_TABLE = 5
-        RFCTYPE_NUM = 6
-        RFCTYPE_FLOAT = 7
-        RFCTYPE_INT = 8
-        RFCTYPE_INT2 = 9
-        RFCTYPE_INT1 = 10
-        RFCTYPE_NULL = 14
-        RFCTYPE_ABAPOBJECT = 16
-        RFCTYPE_STRUCTURE = 17
-        RFCTYPE_DECF16 = 23
-        RFCTYPE_DECF34 = 24
-        RFCTYPE_XMLDATA = 28
-        RFCTYPE_STRING = 29
-        RFCTYPE_XSTRING = 30
-        RFCTYPE_BOX = 31
-        RFCTYPE_GENERIC_BOX = 32
-    
-        #-RFC_UNIT_STATE - Processing status of a background unit---------------
-        RFC_UNIT_NOT_FOUND = 0
-        RFC_UNIT_IN_PROCESS = 1
-        RFC_UNIT_COMMITTED = 2
-        RFC_UNIT_ROLLED_BACK = 3
-        RFC_UNIT_CONFIRMED = 4
-    
-        #-RFC_CALL_TYPE - Type of an incoming function call---------------------
-        RFC_SYNCHRONOUS = 0
-        RFC_TRANSACTIONAL = 1
-        RFC_QUEUED = 2
-        RFC_BACKGROUND_UNIT = 3
-    
-        #-RFC_DIRECTION - Direction of a function module parameter--------------
-        RFC_IMPORT = 1
-        RFC_EXPORT = 2
-        RFC_CHANGING = RFC_IMPORT + RFC_EXPORT
-        RFC_TABLES = 4 + RFC_CHANGING
-    
-        #-RFC_CLASS_ATTRIBUTE_TYPE - Type of an ABAP object attribute-----------
-        RFC_CLASS_ATTRIBUTE_INSTANCE = 0
-        RFC_CLASS_ATTRIBUTE_CLASS = 1
-        RFC_CLASS_ATTRIBUTE_CONSTANT = 2
-    
-        #-RFC_METADATA_OBJ_TYPE - Ingroup repository----------------------------
-        RFC_METADATA_FUNCTION = 0
-        RFC_METADATA_TYPE = 1
-        RFC_METADATA_CLASS = 2
-    
-    
-        #-Variables-------------------------------------------------------------
-        ErrInf = RFC_ERROR_INFO; RfcErrInf = ErrInf()
-        ConnParams = RFC_CONNECTION_PARAMETER * 5; RfcConnParams = ConnParams()
-        SConParams = RFC_CONNECTION_PARAMETER * 3; RfcSConParams = SConParams()
-    
-    
-        #-Library---------------------------------------------------------------
-        # if str(platform.architecture()[0]) == "32bit":
-        #   os.environ['PATH'] += ";C:\\SAPRFCSDK\\32bit"
-        #   SAPNWRFC = "C:\\SAPRFCSDK\\32bit\\sapnwrfc.dll"
-        # elif str(platform.architecture()[0]) == "64bit":
-        #   os.environ['PATH'] += ";C:\\SAPRFCSDK\\64bit"
-        #   SAPNWRFC = "C:\\SAPRFCSDK\\64bit\\sapnwrfc.dll"
-    
-        SAPNWRFC = "sapnwrfc.dll"
-    
-        SAP = windll.LoadLibrary(SAPNWRFC)
-    
-        #-Prototypes------------------------------------------------------------
-        SAP.RfcAppendNewRow.argtypes = [c_void_p, POINTER(ErrInf)]
-        SAP.RfcAppendNewRow.restype = c_void_p
-    
-        SAP.RfcCloseConnection.argtypes = [c_void_p, POINTER(ErrInf)]
-        SAP.RfcCloseConnection.restype = c_ulong
-    
-        SAP.RfcCreateFunction.argtypes = [c_void_p, POINTER(ErrInf)]
-        SAP.RfcCreateFunction.restype = c_void_p
-    
-        SAP.RfcSetInt.argtypes = [c_void_p, c_wchar_p, c_ulong, POINTER(ErrInf)]
-        SAP.RfcSetInt.restype = c_ulong
-    
-        SAP.RfcCreateFunctionDesc.argtypes = [c_wchar_p, POINTER(ErrInf)]
-        SAP.RfcCreateFunctionDesc.restype = c_void_p
-    
-        SAP.RfcDestroyFunction.argtypes = [c_void_p, POINTER(ErrInf)]
-        SAP.RfcDestroyFunction.restype = c_ulong
-    
-        SAP.RfcDestroyFunctionDesc.argtypes = [c_void_p, POINTER(ErrInf)]
-        SAP.RfcDestroyFunctionDesc.restype = c_ulong
-    
-        SAP.RfcGetChars.argtypes = [c_void_p, c_wchar_p, c_void_p, c_ulong, \
-        POINTER(ErrInf)]
-        SAP.RfcGetChars.restype = c_ulong
-    
-        SAP.RfcGetCurrentRow.argtypes = [c_void_p, POINTER(ErrInf)]
-        SAP.RfcGetCurrentRow.restype = c_void_p
-    
-        SAP.RfcGetFunctionDesc.argtypes = [c_void_p, c_wchar_p, POINTER(ErrInf)]
-        SAP.RfcGetFunctionDesc.restype = c_void_p
-    
-        SAP.RfcCreateTable.argtypes = [c_void_p, POINTER(ErrInf)]
-        SAP.RfcCreateTable.restype = c_void_p
-    
-    
-        SAP.RfcGetRowCount.argtypes = [c_void_p, POINTER(c_ulong), \
-        POINTER(ErrInf)]
-        SAP.RfcGetRowCount.restype = c_ulong
-    
-        SAP.RfcGetStructure.argtypes = [c_void_p, c_wchar_p, \
-        POINTER(c_void_p), POINTER(ErrInf)]
-        SAP.RfcGetStructure.restype = c_ulong
-    
-        SAP.RfcGetTable.argtypes = [c_void_p, c_wchar_p, POINTER(c_void_p), \
-        POINTER(ErrInf)]
-        SAP.RfcGetTable.restype = c_ulong
-    
-        SAP.RfcGetVersion.argtypes = [POINTER(c_ulong), POINTER(c_ulong), \
-        POINTER(c_ulong)]
-        SAP.RfcGetVersion.restype = c_wchar_p
-    
-        SAP.RfcInstallServerFunction.argtypes = [c_wchar_p, c_void_p, \
-        c_void_p, POINTER(ErrInf)]
-        SAP.RfcInstallServerFunction.restype = c_ulong
-    
-        SAP.RfcInvoke.argtypes = [c_void_p, c_void_p, POINTER(ErrInf)]
-        SAP.RfcInvoke.restype = c_ulong
-    
-        SAP.RfcListenAndDispatch.argtypes = [c_void_p, c_ulong, POINTER(ErrInf)]
-        SAP.RfcListenAndDispatch.restype = c_ulong
-    
-        SAP.RfcMoveToFirstRow.argtypes = [c_void_p, POINTER(ErrInf)]
-        SAP.RfcMoveToFirstRow.restype = c_ulong
-    
-        SAP.RfcMoveToNextRow.argtypes = [c_void_p, POINTER(ErrInf)]
-        SAP.RfcMoveToNextRow.restype = c_ulong
-    
-        SAP.RfcOpenConnection.argtypes = [POINTER(ConnParams), c_ulong, \
-        POINTER(ErrInf)]
-        SAP.RfcOpenConnection.restype = c_void_p
-    
-        SAP.RfcPing.argtypes = [c_void_p, POINTER(ErrInf)]
-        SAP.RfcPing.restype = c_ulong
-    
-        SAP.RfcRegisterServer.argtypes = [POINTER(SConParams), c_ulong, \
-        POINTER(ErrInf)]
-        SAP.RfcRegisterServer.restype = c_void_p
-    
-        SAP.RfcSetChars.argtypes = [c_void_p, c_wchar_p, c_wchar_p, c_ulong, \
-        POINTER(ErrInf)]
-        SAP.RfcSetChars.restype = c_ulong
-    
-    
-    
-    
-    
-            
-    
-    
-        # FileName = "sapnwrfc.py"
-        # exec(compile(open(FileName).read(), FileName, "exec"))
-    
-        #-Main------------------------------------------------------------------
-    
-        RfcConnParams[0].name = "ASHOST"; RfcConnParams[0].value = ashost
-        RfcConnParams[1].name = "SYSNR" ; RfcConnParams[1].value = sysnr
-        RfcConnParams[2].name = "CLIENT"; RfcConnParams[2].value = client
-        RfcConnParams[3].name = "USER"  ; RfcConnParams[3].value = user
-        RfcConnParams[4].name = "PASSWD"; RfcConnParams[4].value = password 
-    
-        tables = []
-        res = []
-        val = 50
-        hRFC = SAP.RfcOpenConnection(RfcConnParams, 5, RfcErrInf)
-        if hRFC != None:
-    
-            charBuffer = create_unicode_buffer(1048576 + 1)
-            charBuffer1 = create_unicode_buffer(1048576 + 1)
-    
-        hFuncDesc = SAP.RfcGetFunctionDesc(hRFC, "ZTABLE_NAMES_DESC", RfcErrInf)
-        if hFuncDesc != 0:
-            hFunc = SAP.RfcCreateFunction(hFuncDesc, RfcErrInf)
-            if hFunc != 0:
-                rc = SAP.RfcSetInt(hFunc, "N",val, RfcErrInf)
-                # print(SAP.RfcInvoke(hRFC, hFunc, RfcErrInf))
-                if SAP.RfcInvoke(hRFC, hFunc, RfcErrInf) == RFC_OK:
-        
-                    hTable = c_void_p(0)
-                    print(SAP.RfcGetTable(hFunc, "DATA", hTable, RfcErrInf))
-                    if SAP.RfcGetTable(hFunc, "DATA", hTable, RfcErrInf) == RFC_OK:
-                        RowCount = c_ulong(0)
-                    rc = SAP.RfcGetRowCount(hTable, RowCount, RfcErrInf)
-                    print(RowCount)
-                    rc = SAP.RfcMoveToFirstRow(hTable, RfcErrInf)
-                    for i in range(0, RowCount.value):
-                        hRow = SAP.RfcGetCurrentRow(hTable, RfcErrInf)
-                        rc = SAP.RfcGetChars(hRow, "TAB", charBuffer, 512, RfcErrInf)
-                        rc = SAP.RfcGetChars(hRow, "DESC", charBuffer1, 512, RfcErrInf)
-                        # print(str(charBuffer.value))
-                        # tables.append(dict(table = str(charBuffer.value).strip(),desc = str(charBuffer1.value)))
-                        res.append(str(charBuffer.value) + "~" + str(charBuffer1.value)) # Print as a dictionary
-                        if i < RowCount.value:
-                            rc = SAP.RfcMoveToNextRow(hTable, RfcErrInf)
-        
-                rc = SAP.RfcDestroyFunction(hFunc, RfcErrInf)
-        
-            rc = SAP.RfcCloseConnection(hRFC, RfcErrInf)
-    
-            erp_tables_description.objects.all().delete()
-    
-            print("Hello Yash")
-            # print(res[0][0])
-            customers_to_create=[]
-            for i in range(RowCount.value):
-                result = res[i].split("~")
-                Dd02 = erp_tables_description(
-                            connection_id = connection_object,
-                            table = result[0],
-                            description = result[1]
-                        )
-            
-                # print(i+" "+RowCount.value)
-                # break
-    
-                customers_to_create.append(Dd02)
-                if i%1000 == 0:
-                    erp_tables_description.objects.bulk_create(customers_to_create, ignore_conflicts=True)
-                    customers_to_create = []
-            # Customer.objects.all().delete()
-    
-            # print(tables)
-            return Response("Tables Fetched Successfully",status=status.HTTP_200_OK)
-        else:
-            print(RfcErrInf.key)    
-            print(RfcErrInf.message)
-    
-        del SAP
+
+        loaded = load_table_descriptions(get_connection_pool(connection_object), connection_object)
+        print(f"{loaded} tables loaded")
+
+        return Response("Tables Fetched Successfully",status=status.HTTP_200_OK)
     except Exception as e:
         print("Error in getting table names from ERP: ", e)
         return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR, data=str(e))
  
  
+ERP_TABLES_PAGE_SIZE = 50
+
+
+def erp_tables_page(connection_id, load, after=None):
+    """
+    Tables of a connection ordered by name. With after (the last table name the
+    client already has) this is a keyset page of ERP_TABLES_PAGE_SIZE rows served
+    from the (connection_id, table) index, so deep pages cost the same as the
+    first one. Without it the legacy growing slice of load * 50 rows is returned.
+    """
+    tables = erp_tables_description.objects.filter(connection_id = connection_id).order_by('table')
+    if after is not None:
+        return tables.filter(table__gt=after)[:ERP_TABLES_PAGE_SIZE]
+    return tables[:load * ERP_TABLES_PAGE_SIZE]
+
+
 @api_view(['GET'])
 def SAPtables(request,load,connection_id):
  
     print("Hello called Get Api")
     print("**********")
+    # ?after=<last table name> asks for the next keyset page instead of the first load*50 rows
+    after = request.GET.get('after')
  
     try:
-        print("upup")
         if erp_tables_description.objects.filter(connection_id=connection_id).exists():
-            load = load * 50
-            sorted_objects = erp_tables_description.objects.filter(connection_id = connection_id).order_by('table')[:load]
-            # projects = project_details.objects.all()
+            sorted_objects = erp_tables_page(connection_id, load, after)
             serializer = ErpTablesSerializer(sorted_objects, many=True)
-            return Response(serializer.data)
+            return Response(with_cached_metadata(serializer.data, connection_id))
  
  
         if Connection.objects.filter(connection_id=connection_id).exists():
@@ -643,13 +204,9 @@ def SAPtables(request,load,connection_id):
                 return Response(status=status.HTTP_406_NOT_ACCEPTABLE , data = "Connection is InActive")
             else:
                 saptables_to_sqlite(connection_id)
-                load = load * 50
-                print("up")
-                sorted_objects = erp_tables_description.objects.filter(connection_id = connection_id).order_by('table')[:load]
-                # projects = project_details.objects.all()
-                print("down")
+                sorted_objects = erp_tables_page(connection_id, load, after)
                 serializer = ErpTablesSerializer(sorted_objects, many=True)
-                return Response(serializer.data)
+                return Response(with_cached_metadata(serializer.data, connection_id))
  
         else:
             return Response(status=status.HTTP_404_NOT_FOUND,data = "Connection Not Found")
@@ -659,27 +216,53 @@ def SAPtables(request,load,connection_id):
         return Response(status=status.HTTP_404_NOT_FOUND,data = "Error while fetching tables")
    
    
+ERP_TABLES_FTS = "connection_erp_tables_description_fts"
+
+
+def erp_tables_fts_available():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=%s", [ERP_TABLES_FTS])
+        return cursor.fetchone() is not None
+
+
 @api_view(['GET'])
 def SAPTableSearch(request,tab,connection_id):
     print("Hello called search Get Api")
- 
-      # 1. Query for starts with
-    starts_with_objects = erp_tables_description.objects.filter(connection_id  = connection_id , table__istartswith=tab)
- 
-    # 2. Query for contains (excluding starts with to avoid duplicates)
-    contains_objects = erp_tables_description.objects.filter(
-        connection_id  = connection_id,
-        table__icontains=tab
-    ).exclude(table__istartswith=tab)  # Exclude the starts_with results
- 
-    # 3. Combine and order the results
-    combined_objects = (starts_with_objects.annotate(order_priority=Value(0, output_field=IntegerField()))  # starts with priority 0
-                        .union(contains_objects.annotate(order_priority=Value(1, output_field=IntegerField()))) # contains priority 1
-                        .order_by('order_priority', 'table')) # order by priority and then table name
- 
-    serializer = ErpTablesSerializer(combined_objects, many=True)
-    return Response(serializer.data)
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 500)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(tab) >= 3 and erp_tables_fts_available():
+        # Trigram FTS5 index (migration 0009): table names starting with tab first,
+        # then table names containing it, then description matches, each by rank
+        like = tab.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        combined_objects = erp_tables_description.objects.raw(
+            f'''SELECT d.* FROM "{ERP_TABLES_FTS}" f
+                JOIN "connection_erp_tables_description" d ON d.id = f.rowid
+                WHERE f."{ERP_TABLES_FTS}" MATCH %s AND d.connection_id_id = %s
+                ORDER BY CASE WHEN d."table" LIKE %s ESCAPE '\\' THEN 0
+                              WHEN d."table" LIKE %s ESCAPE '\\' THEN 1 ELSE 2 END,
+                         f.rank, d."table"
+                LIMIT %s''',
+            ['"' + tab.replace('"', '""') + '"', connection_id, like + '%', '%' + like + '%', limit])
+    else:
+        # 1. Query for starts with
+        starts_with_objects = erp_tables_description.objects.filter(connection_id  = connection_id , table__istartswith=tab)
 
+        # 2. Query for contains (excluding starts with to avoid duplicates)
+        contains_objects = erp_tables_description.objects.filter(
+            connection_id  = connection_id,
+            table__icontains=tab
+        ).exclude(table__istartswith=tab)  # Exclude the starts_with results
+
+        # 3. Combine and order the results
+        combined_objects = (starts_with_objects.annotate(order_priority=Value(0, output_field=IntegerField()))  # starts with priority 0
+                            .union(contains_objects.annotate(order_priority=Value(1, output_field=IntegerField()))) # contains priority 1
+                            .order_by('order_priority', 'table'))[:limit] # order by priority and then table name
+
+    serializer = ErpTablesSerializer(combined_objects, many=True)
+    return Response(with_cached_metadata(serializer.data, connection_id))
 
 
 
@@ -690,83 +273,80 @@ def SAPTableSearch(request,tab,connection_id):
 
 
 
-l=[False,""]
 
 @api_view(['POST'])
 def HANAconn(request):
     print("Hana")
-    print(request.data)
     try:
-        conn = dbapi.connect(
-            # address="10.56.7.40",
-            address = request.data['host'],
-            # port=30015,
-            port=int(request.data['port']),
-            # user="SURYAC",
-            # password="Surya@2727",
-            # user="SAMPATHS",
-            # password="Sampath@123",
-            # user="RUPAM",
-            user = request.data['username'],
-            password= request.data['password'],
-            # password="Mrupa09$",
-            encrypt='true',
-            sslValidateCertificate='false'
-        )
-        print(conn.isconnected())
-        l[0]=conn
-        l[1] = request.data['username']
-    #     cursor = conn.cursor()
-    #     cursor.execute("SELECT TABLE_NAME FROM SYS.TABLES WHERE SCHEMA_NAME = '"+l[1]+"'")
-    #     rows = cursor.fetchall()
-    #     rows=list(rows)
-    #     tables = [dict(var = str(row[0]).strip()) for row in rows]
- 
-    #     print(tables)
-    #     # return Response(tables)
-       
-    #     return Response(tables,status=status.HTTP_200_OK)
-    except:
-        # return Response("failure")  
+        params = {
+            "address": request.data['host'],
+            "port": int(request.data['port']),
+            "user": request.data['username'],
+            "password": request.data['password'],
+        }
+        # One-off logon check: the logon may never be saved, so no pool is kept for it
+        conn = hana_connect(params)
+        try:
+            connected = conn.isconnected()
+            print(connected)
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"Error in HANA connection: {e}")
         return Response(status=status.HTTP_404_NOT_FOUND)
-   
-    if(conn.isconnected):  
-        # return HttpResponse("success")
+
+    if connected:
         return Response(status=status.HTTP_200_OK)
-    # return HttpResponse("failure")
     return Response(status=status.HTTP_404_NOT_FOUND)
 
 
 @api_view(['GET'])
 def HANAtables(request,p_id,c_name):
-    connection = Connection.objects.filter(project_id=p_id,connection_name=c_name)
-    json_data = serialize('json', list(connection))
-    json_data = json.loads(json_data)[0]['fields']
-    print(json_data)
-    conn = conn = dbapi.connect(
-            # address="10.56.7.40",
-            address = json_data['host'],
-            # port=30015,
-            port=int(json_data['port']),
-            # user="SURYAC",
-            # password="Surya@2727",
-            # user="SAMPATHS",
-            # password="Sampath@123",
-            # user="RUPAM",
-            user = json_data['username'],
-            password= json_data['password'],
-            # password="Mrupa09$",
-            encrypt='true',
-            sslValidateCertificate='false'
-        )
-    cursor = conn.cursor()
-    cursor.execute("SELECT TABLE_NAME FROM SYS.TABLES WHERE SCHEMA_NAME = '"+json_data['username']+"'")
-    rows = cursor.fetchall()
-    rows=list(rows)
+    connection = Connection.objects.filter(project_id=p_id,connection_name=c_name).first()
+    if connection is None:
+        return Response(status=status.HTTP_404_NOT_FOUND,data = "Connection Not Found")
+    with get_hana_connection_pool(connection).connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT TABLE_NAME FROM SYS.TABLES WHERE SCHEMA_NAME = ?", [connection.username])
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
     tables = [dict(table = str(row[0]).strip(),desc="") for row in rows]
  
-    print(tables)
-    return Response(tables)  
+    print(len(tables))
+    return Response(tables)
+
+
+@api_view(['POST'])
+def HANAextract(request,p_id,c_name):
+    """
+    Pull a HANA table into the local migration DB as a hana_ table.
+    Body: table, optional schema (defaults to the logon user), columns,
+    filters ({column: value}), target_table (hana_...), replace (overwrite an existing target).
+    """
+    connection = Connection.objects.filter(project_id=p_id,connection_name=c_name).first()
+    if connection is None:
+        return Response(status=status.HTTP_404_NOT_FOUND,data = "Connection Not Found")
+    try:
+        filters = request.data.get('filters') or {}
+        if not isinstance(filters, dict):
+            raise ValueError("filters must be an object of column: value")
+        target_table, rows = extract_hana_table(
+            get_hana_connection_pool(connection),
+            request.data.get('schema') or connection.username,
+            request.data['table'],
+            columns=request.data.get('columns'),
+            filters=filters,
+            target_table=request.data.get('target_table'),
+            replace=bool(request.data.get('replace')),
+        )
+        return Response({"table": target_table, "rows": rows}, status=status.HTTP_200_OK)
+    except (KeyError, ValueError) as e:
+        return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        print(f"Error in HANA extraction: {e}")
+        return Response(str(e), status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @api_view(['POST'])
@@ -903,6 +483,8 @@ def ConnectionUpdate(request,p_id,c_name):
             data = ConnectionSerializer(instance=connection, data=info)
             if data.is_valid():
                 data.save()
+                # The connection may now point to another system
+                invalidate_table_metadata(connection)
                 return Response(data.data,status=status.HTTP_202_ACCEPTED)
             else:
                 return Response(status=status.HTTP_404_NOT_FOUND)
@@ -918,6 +500,8 @@ def connectionDelete(request,p_id,c_name):
     if Connection.objects.filter(project_id=p_id,connection_name=c_name).exists():
         connection = Connection.objects.get(project_id=p_id,connection_name=c_name)
         if connection:
+            close_rfc_pool(connection.connection_id)
+            close_hana_pool(connection)
             connection.delete()
             print("ssssssuccesssss")
             return Response(c_name,status=status.HTTP_202_ACCEPTED)
@@ -1064,6 +648,7 @@ def deleteSqlLiteTable(table_name):
                 # Use parameterized query to prevent SQL injection
                 cursor.execute(f"DROP TABLE IF EXISTS  {table_name}") # Correct: parameterized query
                 # or cursor.execute(f"DROP TABLE IF EXISTS {table_name}") # Less secure way
+                invalidate_column_stats(table_name)
                 print(f"Table '{table_name}' dropped (IF EXISTS).")
     except Exception as e:
             print(f"Error dropping table '{table_name}': {e}")
@@ -1119,6 +704,14 @@ import pandas as pd
 from openpyxl import load_workbook
 
 def sheet_get(df,sheet_data,obj_id,file):
+    workbook = open_template_workbook(file)
+    try:
+        return _sheet_get(df,sheet_data,obj_id,workbook)
+    finally:
+        workbook.close()
+
+
+def _sheet_get(df,sheet_data,obj_id,workbook):
  
     print("came to sheet_get")
     # deleteSqlLiteTable()
@@ -1126,8 +719,7 @@ def sheet_get(df,sheet_data,obj_id,file):
         project_id = sheet_data['project_id']
         obj_name = sheet_data['obj_name']
         template_name  = sheet_data['template_name']
-        excel_file = pd.ExcelFile(file)
-        sheet_names = excel_file.sheet_names
+        sheet_names = workbook.sheetnames
         sheet_index = 2
        
    
@@ -1213,47 +805,11 @@ def sheet_get(df,sheet_data,obj_id,file):
                         local_objects_delete(obj_id)
                         return "Error"
  
-                    print("HIIII")
-                    file_path = file        # Your Excel file
-                    sheet = sheet_names[sheet_index]
-                    skip_rows = [0, 1, 2, 3, 5, 6, 7]
-
-                    # Load workbook
-                    wb = load_workbook(file_path, data_only=False)  # Needed to get raw display formatting
-                    ws = wb[sheet]
-
-                    data = []
-                    for ii, row in enumerate(ws.iter_rows()):
-                        if ii in skip_rows:
-                            continue
-                        row_data = []
-                        for cell in row:
-                            if cell.value is None:
-                                row_data.append("")
-                            else:
-                                # NEW: get exactly how Excel displays it
-                                if hasattr(cell, 'number_format') and cell.is_date:
-                                    row_data.append(cell.value.strftime('%d.%m.%Y'))
-                                else:
-                                    # Use the formatted value from Excel's UI representation
-                                    try:
-                                        display_val = cell.number_format
-                                        # Trick: use cell._value as stored raw, but better: formatted
-                                        s = cell._value if isinstance(cell._value, str) else str(cell._value)
-                                        row_data.append(s)
-                                    except:
-                                        row_data.append(str(cell.value))
-                        data.append(row_data)
-
-                    df1 = pd.DataFrame(data)
-
-                    # Set first row as header
-                    df1.columns = df1.iloc[0]
-                    df1 = df1[1:].reset_index(drop=True)
+                    df1 = read_segment_sheet(workbook, sheet_names[sheet_index])
                     sheet_index+=1
                     print("HIIII")
-                    status_inserting_data = insert_data_from_dataframe(df1,tab)
-                    status_inserting_data = insert_data_from_dataframe(df1,tab+"_src")
+                    status_inserting_data = insert_data_from_dataframe(df1,tab,dual_write=True)
+                    ensure_index(tab, [d[0] for d in field_data if d[4] == "True"], dual_write=True)
 
                     if status_inserting_data == "Error":
                         local_objects_delete(obj_id)
@@ -1311,44 +867,10 @@ def sheet_get(df,sheet_data,obj_id,file):
             local_objects_delete(obj_id)
             return "Error"
        
-        file_path = file        # Your Excel file
-        sheet = sheet_names[sheet_index]
-        skip_rows = [0, 1, 2, 3, 5, 6, 7]
-
-        # Load workbook
-        wb = load_workbook(file_path, data_only=False)  # Needed to get raw display formatting
-        ws = wb[sheet]
-
-        data = []
-        for ii, row in enumerate(ws.iter_rows()):
-            if ii in skip_rows:
-                continue
-            row_data = []
-            for cell in row:
-                if cell.value is None:
-                    row_data.append("")
-                else:
-                    # NEW: get exactly how Excel displays it
-                    if hasattr(cell, 'number_format') and cell.is_date:
-                        row_data.append(cell.value.strftime('%d.%m.%Y'))
-                    else:
-                        # Use the formatted value from Excel's UI representation
-                        try:
-                            display_val = cell.number_format
-                            # Trick: use cell._value as stored raw, but better: formatted
-                            s = cell._value if isinstance(cell._value, str) else str(cell._value)
-                            row_data.append(s)
-                        except:
-                            row_data.append(str(cell.value))
-            data.append(row_data)
-
-        df1 = pd.DataFrame(data)
-        df1.columns = df1.iloc[0]
-        df1 = df1[1:].reset_index(drop=True)
-        print("toooppppp",df1.head())
+        df1 = read_segment_sheet(workbook, sheet_names[sheet_index])
         sheet_index+=1
-        status_inserting_data = insert_data_from_dataframe(df1,tab)
-        status_inserting_data = insert_data_from_dataframe(df1,tab+"_src")
+        status_inserting_data = insert_data_from_dataframe(df1,tab,dual_write=True)
+        ensure_index(tab, [d[0] for d in field_data if d[4] == "True"], dual_write=True)
 
         if status_inserting_data == "Error":
             local_objects_delete(obj_id)
@@ -1645,36 +1167,14 @@ def tableDelete(request):
 
 
 
-def insert_data_from_dataframe(dataframe, table_name, database_name='default'):
-    print("prinnnnting tttt",dataframe)
-    cursor = connections[database_name].cursor()
-    cursor.execute(f"PRAGMA table_info({table_name})")
-    number_columns = len(cursor.fetchall())
-    dataframe = dataframe.iloc[:, :number_columns]
-    print(dataframe.dtypes)
+def insert_data_from_dataframe(dataframe, table_name, database_name='default', dual_write=False):
+    # dual_write: every batch also goes to <table_name>_src, in the same transaction
     try:
-        with connections[database_name].cursor() as cursor:
-            for index, row in dataframe.iterrows():
-                # Construct the INSERT INTO statement
-                # column_names = ', '.join(dataframe.columns)
-                quoted_column_names = ', '.join(f'"{col}"' for col in dataframe.columns)
-                column_names = quoted_column_names
-                placeholders = ', '.join(['%s'] * len(dataframe.columns))
-                insert_sql = f"INSERT INTO {table_name} ({column_names}) VALUES ({placeholders});"
- 
-                # Execute the INSERT statement with data from the row
-                cursor.execute(insert_sql, tuple(row))
- 
-            # Commit the changes within a transaction
-            with transaction.atomic(using=database_name):
-                cursor.execute("COMMIT;")
- 
-        print(f"Data inserted successfully into '{table_name}' in {database_name} database.")
+        tables = write_tables(table_name, dual_write)
+        rows = bulk_insert_dataframe(dataframe, table_name, database=database_name, also_into=tables[1:])
+        print(f"Data inserted successfully into {tables} in {database_name} database ({rows} rows).")
         return "Success"
-       
- 
     except Exception as e:
-        print("errorrrr",dataframe.describe)
         print(f"Error inserting data: {e}")
         return "Error"
 
@@ -1701,9 +1201,22 @@ def create_table_dynamically(table_name, fields, database_name='default'):
     except Exception as e:
         print(f"Error creating table: {e}")
  
-def convert_list_to_fields(field_list):
+TEMPLATE_TYPES = {
+    'integer': 'INTEGER',
+    'number': 'INTEGER',
+    'real': 'REAL',
+    'decimal': 'REAL',
+    'date': 'DATE',
+}
+
+
+def convert_list_to_fields(field_list, typed=False):
+    # typed: keep INTEGER/REAL/DATE declarations instead of forcing TEXT
     field_dict = {}
     for field_name, field_type in field_list:
+        if typed:
+            field_dict[field_name] = TEMPLATE_TYPES.get(str(field_type).strip().lower(), 'TEXT')
+            continue
         # if field_type.lower() == 'text':
         #     field_dict[field_name] = 'TEXT'
         # elif field_type.lower() == 'date':
@@ -1733,6 +1246,8 @@ def drop_table_dynamically(table_name, database_name='default'):
  
             with transaction.atomic(using=database_name):
                 cursor.execute(drop_table_sql)
+                if database_name == 'default':
+                    invalidate_column_stats(table_name)
                 return 1
  
             print(f"Table '{table_name}' dropped successfully from {database_name} database.")
@@ -1884,6 +1399,50 @@ class GetXLSheet(APIView):
         insert_data_from_dataframe(dataframe=df,table_name=tablename,database_name='default')
         return Response()
  
+def request_flag(request, name):
+    # True/False from an optional form field or query parameter, None when absent
+    value = request.data.get(name, request.query_params.get(name))
+    if value is None or value == '':
+        return None
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def load_delimited_upload(file, tablename, read, positional_columns=False, typed=None):
+    """
+    Load an uploaded CSV/TXT file into tablename (recreated).
+
+    The file is parsed with read(file, dtype=str, chunksize=UPLOAD_CHUNK_SIZE)
+    and every chunk is inserted before the next one is parsed, so memory stays
+    bounded by the chunk size instead of the file size. With positional_columns,
+    headers containing ':' are replaced by Column0..ColumnN. Columns are TEXT
+    unless typed (default UPLOAD_INFER_TYPES), in which case INTEGER/REAL/DATE
+    are inferred from the first chunk.
+    Returns the number of rows loaded.
+    """
+    chunks = read(file, dtype=str, chunksize=int(getattr(settings, 'UPLOAD_CHUNK_SIZE', 50000)))
+    first = next(chunks, None)
+    if first is None:
+        return 0
+    columns = [str(c) for c in first.columns]
+    if positional_columns and any(':' in c for c in columns):
+        columns = ['Column' + str(i) for i in range(len(columns))]
+    print(*columns, sep = ', ')
+    if typed is None:
+        typed = getattr(settings, 'UPLOAD_INFER_TYPES', False)
+    if typed:
+        inferred = infer_dataframe_types(first, getattr(settings, 'TYPE_INFERENCE_SAMPLE_SIZE', 1000))
+        feilds = dict(zip(columns, inferred.values()))
+    else:
+        feilds = {c: "TEXT" for c in columns}
+    flag = drop_table_dynamically(str(tablename))
+    print(flag)
+    flag = create_table_dynamically(str(tablename),feilds,"default")
+    print(flag)
+    loaded = bulk_insert_frames(chain([first], chunks), str(tablename), columns=columns)
+    print(f"Upload into '{tablename}' finished: {loaded} rows.")
+    return loaded
+
+
 class GetTXT(APIView):
     def post(self, request):
         file = request.FILES['file']
@@ -1906,31 +1465,9 @@ class GetTXT(APIView):
        
         serializer.save()
         print(delim)
-        data = pd.read_table(file)
-        print(data)
-        # df = pd.read_excel(data['file'], sheet_name = data['sheet'])
-        df = pd.DataFrame(data)
-        columns = list(df.columns)
-        n, flag = len(columns), 0
-        for i in columns:
-            if ':' in i:
-                flag = 1
-                break
-        if flag:
-            columns = []
-            for i in range(n):
-                s = 'Column' + str(i)
-                columns.append(s)
-        print(columns)
-        feilds= {}
-        for i in columns:
-            feilds[i] = "TEXT"
         tablename=request.data['tableName']
-        flag = drop_table_dynamically(str(tablename))
-        print(flag)
-        flag = create_table_dynamically(str(tablename),feilds,"default")
-        print(flag)
-        insert_data_from_dataframe(dataframe=df,table_name=tablename,database_name='default')
+        load_delimited_upload(file, tablename, pd.read_table, positional_columns=True,
+                              typed=request_flag(request, 'inferTypes'))
         return Response()
    
 class GetFile(APIView):
@@ -1955,22 +1492,8 @@ class GetFile(APIView):
        
         serializer.save()
         file = request.FILES['file']
-        data = pd.read_csv(file)
-        columns = list(data.columns)
-        print(*columns, sep = ', ')
-        data = pd.DataFrame(data)
- 
-        df = pd.DataFrame(data)
-        columns = list(df.columns)
-        feilds= {}
-        for i in columns:
-            feilds[i] = "TEXT"
         tablename=request.data['tableName']
-        flag = drop_table_dynamically(str(tablename))
-        print(flag)
-        flag = create_table_dynamically(str(tablename),feilds,"default")
-        print(flag)
-        insert_data_from_dataframe(dataframe=df,table_name=tablename,database_name='default')
+        load_delimited_upload(file, tablename, pd.read_csv, typed=request_flag(request, 'inferTypes'))
         return Response()
  
 
@@ -2041,31 +1564,9 @@ class ReuploadTXT(APIView):
        
         serializer.save()
         print(delim)
-        data = pd.read_table(file)
-        print(data)
-        # df = pd.read_excel(data['file'], sheet_name = data['sheet'])
-        df = pd.DataFrame(data)
-        columns = list(df.columns)
-        n, flag = len(columns), 0
-        for i in columns:
-            if ':' in i:
-                flag = 1
-                break
-        if flag:
-            columns = []
-            for i in range(n):
-                s = 'Column' + str(i)
-                columns.append(s)
-        print(columns)
-        feilds= {}
-        for i in columns:
-            feilds[i] = "TEXT"
         tablename=request.data['tableName']
-        flag = drop_table_dynamically(str(tablename))
-        print(flag)
-        flag = create_table_dynamically(str(tablename),feilds,"default")
-        print(flag)
-        insert_data_from_dataframe(dataframe=df,table_name=tablename,database_name='default')
+        load_delimited_upload(file, tablename, pd.read_table, positional_columns=True,
+                              typed=request_flag(request, 'inferTypes'))
         return Response()
    
 class ReuploadCSV(APIView):
@@ -2090,22 +1591,8 @@ class ReuploadCSV(APIView):
        
         serializer.save()
         file = request.FILES['file']
-        data = pd.read_csv(file)
-        columns = list(data.columns)
-        print(*columns, sep = ', ')
-        data = pd.DataFrame(data)
- 
-        df = pd.DataFrame(data)
-        columns = list(df.columns)
-        feilds= {}
-        for i in columns:
-            feilds[i] = "TEXT"
         tablename=request.data['tableName']
-        flag = drop_table_dynamically(str(tablename))
-        print(flag)
-        flag = create_table_dynamically(str(tablename),feilds,"default")
-        print(flag)
-        insert_data_from_dataframe(dataframe=df,table_name=tablename,database_name='default')
+        load_delimited_upload(file, tablename, pd.read_csv, typed=request_flag(request, 'inferTypes'))
         return Response()
  
 
@@ -2121,13 +1608,20 @@ class ReuploadCSV(APIView):
 
 
 def sheet_update(df,sheet_data,obj_id,file):
+    workbook = open_template_workbook(file)
+    try:
+        return _sheet_update(df,sheet_data,obj_id,workbook)
+    finally:
+        workbook.close()
+
+
+def _sheet_update(df,sheet_data,obj_id,workbook):
    
     project_id = sheet_data['project_id']
     obj_name = sheet_data['obj_name']
     template_name  = sheet_data['template_name']
  
-    excel_file = pd.ExcelFile(file)
-    sheet_names = excel_file.sheet_names
+    sheet_names = workbook.sheetnames
     sheet_index = 2
    
  
@@ -2218,10 +1712,10 @@ def sheet_update(df,sheet_data,obj_id,file):
                 # add_prompt_and_last_updated_on(tab+"_val")
                 # create_table(tab+"_err",columns)
  
-                df1 = pd.read_excel(file,sheet_name=sheet_names[sheet_index],skiprows=[0,1,2,3,5,6,7],na_filter=False)
+                df1 = read_segment_sheet(workbook, sheet_names[sheet_index])
                 sheet_index+=1
-                insert_data_from_dataframe(df1,tab)
-                insert_data_from_dataframe(df1,tab+"_src")
+                insert_data_from_dataframe(df1,tab,dual_write=True)
+                ensure_index(tab, [d[0] for d in field_data if d[4] == "True"], dual_write=True)
  
                 field_names = []
                 for fie in columns:
@@ -2373,10 +1867,10 @@ def sheet_update(df,sheet_data,obj_id,file):
 
     # if is_seg==1:
  
-    df1 = pd.read_excel(file,sheet_name=sheet_names[sheet_index],skiprows=[0,1,2,3,5,6,7],na_filter=False)
+    df1 = read_segment_sheet(workbook, sheet_names[sheet_index])
     sheet_index+=1
-    insert_data_from_dataframe(df1,tab)
-    insert_data_from_dataframe(df1,tab+"_src")
+    insert_data_from_dataframe(df1,tab,dual_write=True)
+    ensure_index(tab, [d[0] for d in field_data if d[4] == "True"], dual_write=True)
  
     field_names = []
     for fie in columns:
@@ -2726,182 +2220,126 @@ WHERE EXISTS (
 );
 ''' 
 
-def LocalapplyOneToOne(pid,oid,sid):
-    try:
-        tar_table=""
-        latest_version = Rule.objects.filter(
-                    project_id=pid,  
-                    object_id=oid,
-                    segment_id=sid
-                ).order_by('-version_id').first()
-        rules = Rule.objects.filter(project_id=pid,  
-                    object_id=oid,
-                    segment_id=sid,version_id=latest_version.version_id).all()
-        segmentForTable = segments.objects.filter(segment_id=sid,project_id=pid,obj_id=oid).first()
-        target_table_name = segmentForTable.table_name
-        for rule in rules :
-            if(rule.source_table !="" and not(table_exists(rule.source_table.upper())) and rule.data_mapping_type != ""):
-                for each_table in rule.source_table.upper().split(","):
-                    each_table = each_table.strip()
-                    jsonPrimary=func(each_table)      
-                    create_and_insert_data(each_table,jsonPrimary)
-            if(rule.data_mapping_type == "LKT"):
-                print("LKT",rule.target_sap_field,target_table_name)
-                cursor = connection.cursor()
-                cursor.execute(f"""
-                               UPDATE {target_table_name}
-                                SET {rule.target_sap_field} = (
-                                    SELECT l.To_Val
-                                    FROM LookUp_table l
-                                    WHERE l.Field_Name = '{rule.target_sap_field}'
-                                    AND l.From_Val = {target_table_name}.{rule.target_sap_field}
-                                    LIMIT 1
-                                )
-                                WHERE EXISTS (
-                                    SELECT 1+
-                                    FROM LookUp_table l
-                                    WHERE l.Field_Name = '{rule.target_sap_field}'
-                                    AND l.From_Val = {target_table_name}.{rule.target_sap_field}
-                                );
-                                """)
-                cursor.commit()
-                cursor.close()
-        field_mapping={}
-        print(latest_version.version_id)
-        if(latest_version.version_id==1):
-            for rule in rules:
-                curr_field = fields.objects.filter(field_id=rule.field_id).first()
-                isMandt=curr_field.isKey
-                # print("came1")
-                if(rule.source_table!="" and rule.source_field_name!="" and isMandt != "False" and rule.data_mapping_type == "1:1"):    
-                    print(rule.source_table,rule.source_field_name,target_table_name,rule.target_sap_field)
-                    if(not(table_exists(rule.source_table.upper()))):
-                        jsonPrimary=func(rule.source_table.upper())      
-                        create_and_insert_data(rule.source_table.upper(),jsonPrimary)
-                    # print("came2")
-                    src_table=rule.source_table.upper()
-                    tar_table=target_table_name
-                    field_mapping[rule.source_field_name] = rule.target_sap_field
-            # print(src_table,tar_table,field_mapping)
-            if(src_table!="" and tar_table!=""):
-                copy_data_between_tables_with_field_mapping(src_table,tar_table,field_mapping)
-                copy_data_between_tables_with_field_mapping(src_table,tar_table+"_src",field_mapping)
-                remove_duplicate_rows_group_by_all(tar_table)
-                remove_duplicate_rows_group_by_all(tar_table+"_src")
-        field_mapping={}  
-        print("hii")  
-        rules = Rule.objects.filter(project_id=pid,  
-                    object_id=oid,
-                    segment_id=sid,version_id=1).all()
-        for rule in rules :
-            print("in cur rule")
-            curr_field = fields.objects.filter(field_id=rule.field_id).first()
-            isMandt=curr_field.isKey
-            print("before")
-            print(isMandt)
-            if(isMandt != "False"):
-                print("inside")
-                print(rule.target_sap_field)
-                field_mapping[rule.source_field_name] = rule.target_sap_field
-        # field mapping contains all the mandetory fields from segment along with their techinal filed name
-        rules = Rule.objects.filter(project_id=pid,  
-                    object_id=oid,
-                    segment_id=sid,version_id=latest_version.version_id).all()
-        prev_rules=""
-        if(latest_version.version_id!=1):
-            prev_rules = Rule.objects.filter(project_id=pid,  
-                    object_id=oid,
-                    segment_id=sid,version_id=(latest_version.version_id)-1).all()
-        print(field_mapping)   
-        pkcol1=list(field_mapping.keys())
-        pkcol2=list(field_mapping.values())
-        table_grouping={}   
-        rules_indexing=-1   
-        for rule in rules:
-            print(table_grouping)
-            curr_field = fields.objects.filter(field_id=rule.field_id).first()
-            isMandt=curr_field.isKey
-            rules_indexing+=1
-            prev_rule=""
-            if(prev_rules!=""):
-                prev_rule=prev_rules[rules_indexing]
-            if(rule.source_table!="" and rule.source_field_name!="" and isMandt == "False" and rule.data_mapping_type == "1:1"
-               and prev_rule!="" and prev_rule.source_table!=rule.source_table and prev_rule.source_field_name!=rule.source_field_name
-               ):
-                if(not(table_exists(target_table_name.upper()))):
-                    jsonPrimary=func(rule.source_table)  
-                    # print(jsonPrimary[0])
-                    create_and_insert_data(rule.source_table.upper(),jsonPrimary)
-                print(rule.source_table,rule.source_field_name,rule.target_sap_table,rule.target_sap_field)
-                print("tablename",segmentForTable.table_name)
-                table_grouping[rule.source_table] = table_grouping.get(rule.source_table,{}) 
-                table_grouping[rule.source_table][rule.source_field_name]=rule.target_sap_field
-            elif(prev_rule=="" and rule.source_table!="" and rule.source_field_name!="" and isMandt == "False" and rule.data_mapping_type == "1:1"
-               ):
-                if(not(table_exists(target_table_name.upper()))):
-                    jsonPrimary=func(rule.source_table)  
-                    # print(jsonPrimary[0])
-                    create_and_insert_data(rule.source_table.upper(),jsonPrimary)
-                print(rule.source_table,rule.source_field_name,rule.target_sap_table,rule.target_sap_field)
-                
-                print("tablename",segmentForTable.table_name)
-                table_grouping[rule.source_table] = table_grouping.get(rule.source_table,{}) 
-                table_grouping[rule.source_table][rule.source_field_name]=rule.target_sap_field
+def index_segment_keys(segment):
+    """Composite index on the key fields of a segment table and of its _src copy."""
+    keys = fields.objects.filter(segement_id=segment.segment_id, isKey=True).values_list('fields', flat=True)
+    return ensure_index(segment.table_name, list(keys), dual_write=True)
 
-        print("hackkkkkk",table_grouping,pkcol1,pkcol2)        
-        for table_name in table_grouping.keys(): 
-            try:
-                update_related_data_with_mapping_and_composite_pks(table_name,segmentForTable.table_name,
-                                                    table_grouping[table_name] , " 1 = 1 ",pkcol1,pkcol2)
-                update_related_data_with_mapping_and_composite_pks(table_name,segmentForTable.table_name+"_src",
-                                                    table_grouping[table_name] , " 1 = 1 ",pkcol1,pkcol2)
-            except Exception as e:
-                return Response(str(e))
-        print("hackkkkkk",table_grouping,pkcol1,pkcol2)     
-        latest_version = Rule.objects.filter(
-                        project_id=pid,  
-                        object_id=oid,
-                        segment_id=sid
-                    ).order_by('-version_id').first()
-        rules = Rule.objects.filter(project_id=pid,
-                    object_id=oid,
-                    segment_id=sid,version_id=latest_version.version_id).all()
-        segmentForTable = segments.objects.filter(segment_id=sid,project_id=pid,obj_id=oid).first()
-        target_table_name = segmentForTable.table_name
-        for rule in rules:
-            print(rule.data_mapping_type,rule.data_mapping_rules)  
-            if(rule.data_mapping_type=='Constant'):
-                update_column_with_constant(target_table_name,rule.target_sap_field,rule.data_mapping_rules)
-                update_column_with_constant(target_table_name+"_src",rule.target_sap_field,rule.data_mapping_rules)
+
+def _is_key_rule(field_rows, rule):
+    # Same test as the rule screens: anything but an explicit "False" marks a key field
+    field = field_rows.get(int(rule.field_id)) if str(rule.field_id or "").isdigit() else None
+    return field is not None and field.isKey != "False"
+
+
+def compile_rule_plan(pid, oid, sid):
+    """
+    Compile the latest rule version of a segment into one execution plan.
+
+    The rules of the latest, previous and first version are read in one query
+    and their fields in another. The work is grouped so that every kind of
+    assignment (lookups, 1:1 mappings per source table, constants, reverse
+    lookups) is a single statement pass over the target table.
+    """
+    segment = segments.objects.filter(segment_id=sid,project_id=pid,obj_id=oid).first()
+    latest = Rule.objects.filter(project_id=pid, object_id=oid, segment_id=sid) \
+        .order_by('-version_id').values_list('version_id', flat=True).first()
+
+    by_version = {}
+    versions = {1, latest, latest - 1} - {0}
+    for rule in Rule.objects.filter(project_id=pid, object_id=oid, segment_id=sid,
+                                    version_id__in=versions).order_by('rule_no'):
+        by_version.setdefault(rule.version_id, []).append(rule)
+    rules = by_version.get(latest, [])
+    field_ids = {int(r.field_id) for rs in by_version.values() for r in rs if str(r.field_id or "").isdigit()}
+    field_rows = fields.objects.in_bulk(list(field_ids))
+
+    plan = {
+        "segment": segment,
+        "target_table": segment.table_name,
+        "extract_tables": [],
+        "forward_lookups": [],
+        "copy": None,
+        "key_columns": ([], []),
+        "mappings": {},
+        "constants": {},
+        "reverse_lookups": [],
+    }
+
+    for rule in rules:
+        if rule.source_table and rule.data_mapping_type:
+            for each_table in rule.source_table.upper().split(","):
+                each_table = each_table.strip()
+                if each_table and each_table not in plan["extract_tables"] and not table_exists(each_table):
+                    plan["extract_tables"].append(each_table)
+        if rule.data_mapping_type == "LKT":
+            plan["forward_lookups"].append(rule.target_sap_field)
+        if rule.data_mapping_type == 'Constant':
+            plan["constants"][rule.target_sap_field] = rule.data_mapping_rules
+        if rule.lookup == True:
+            plan["reverse_lookups"].append(rule.target_sap_field)
+
+    # First version: the key fields are copied from their (single) source table
+    if latest == 1:
+        copy_source, copy_mapping = "", {}
         for rule in rules:
-            if(rule.lookup == True):
-                try:    
-                    print("LKT",rule.target_sap_field,target_table_name)
-                    cursor = connection.cursor()
-                    cursor.execute(f"""
-                                UPDATE {target_table_name}
-                                    SET {rule.target_sap_field} = (
-                                        SELECT l.From_Val
-                                        FROM LookUp_table l
-                                        WHERE l.Field_Name = '{rule.target_sap_field}'
-                                        AND l.To_Val = {target_table_name}.{rule.target_sap_field}
-                                        LIMIT 1
-                                    )
-                                    WHERE EXISTS (
-                                        SELECT 1
-                                        FROM LookUp_table l
-                                        WHERE l.Field_Name = '{rule.target_sap_field}'
-                                        AND l.To_Val = {target_table_name}.{rule.target_sap_field}
-                                    );
-                                    """)
-                    connection.commit()
-                    cursor.close()
-                except Exception as e:
-                    print(e) 
-                    
-        
-        
-        
+            if (rule.source_table and rule.source_field_name and _is_key_rule(field_rows, rule)
+                    and rule.data_mapping_type == "1:1"):
+                copy_source = rule.source_table.upper()
+                copy_mapping[rule.source_field_name] = rule.target_sap_field
+        if copy_source:
+            plan["copy"] = {"source_table": copy_source, "field_mapping": copy_mapping}
+
+    # Key fields of the first version join the source tables to the segment
+    key_mapping = {}
+    for rule in by_version.get(1, []):
+        if _is_key_rule(field_rows, rule) and rule.source_field_name:
+            key_mapping[rule.source_field_name] = rule.target_sap_field
+    plan["key_columns"] = (list(key_mapping.keys()), list(key_mapping.values()))
+
+    # Non-key 1:1 mappings, grouped per source table; on later versions only
+    # the fields whose source table and field both changed are re-applied
+    previous = {r.field_id: r for r in by_version.get(latest - 1, [])} if latest != 1 else None
+    for rule in rules:
+        if not (rule.source_table and rule.source_field_name and not _is_key_rule(field_rows, rule)
+                and rule.data_mapping_type == "1:1"):
+            continue
+        prev_rule = previous.get(rule.field_id) if previous is not None else None
+        if prev_rule is not None and (prev_rule.source_table == rule.source_table
+                                      or prev_rule.source_field_name == rule.source_field_name):
+            continue
+        plan["mappings"].setdefault(rule.source_table, {})[rule.source_field_name] = rule.target_sap_field
+
+    return plan
+
+
+def run_rule_plan(plan):
+    target_table_name = plan["target_table"]
+    index_segment_keys(plan["segment"])
+    for each_table in plan["extract_tables"]:
+        extract_sap_table(each_table)
+    if plan["forward_lookups"]:
+        apply_lookup_table(target_table_name, plan["forward_lookups"])
+    if plan["copy"]:
+        marks = table_rowid_marks(write_tables(target_table_name, dual_write=True))
+        copy_data_between_tables_with_field_mapping(plan["copy"]["source_table"], target_table_name,
+                                                    plan["copy"]["field_mapping"], dual_write=True)
+        remove_duplicate_rows_group_by_all(target_table_name, dual_write=True, since_rowid=marks)
+    pkcol1, pkcol2 = plan["key_columns"]
+    for table_name, mapping in plan["mappings"].items():
+        update_related_data_with_mapping_and_composite_pks(table_name, target_table_name, mapping, " 1 = 1 ",
+                                                           pkcol1, pkcol2, dual_write=True)
+    if plan["constants"]:
+        update_columns_with_constants(target_table_name, plan["constants"], dual_write=True)
+    if plan["reverse_lookups"]:
+        apply_lookup_table(target_table_name, plan["reverse_lookups"], reverse=True)
+
+
+def LocalapplyOneToOne(pid,oid,sid):
+    try:
+        plan = compile_rule_plan(pid, oid, sid)
+        print("rule plan", {k: v for k, v in plan.items() if k != "segment"})
+        run_rule_plan(plan)
         return "Success"
     except Exception as e:
         print(e)
@@ -2946,7 +2384,8 @@ def VersionRuleCreate(request):
  
 
 
-def LocalgetTableData(sid):
+def LocalgetTableData(sid, stream=None):
+    # stream: 'json' or 'ndjson' to get a StreamingHttpResponse instead of the list of rows
 
     try:
         segment = segments.objects.filter(segment_id=sid).first()  # Use .first() to get a single object
@@ -2955,6 +2394,8 @@ def LocalgetTableData(sid):
  
         table_name = segment.table_name # Access table_name directly from the segment object
         print(table_name)
+        if stream:
+            return stream_table_response(table_name, stream)
         with connections["default"].cursor() as cursor:
             cursor.execute(f"SELECT * FROM {table_name}")
             data = cursor.fetchall()
@@ -2974,38 +2415,196 @@ def LocalgetTableData(sid):
 
 
 def table_to_custom_json(table_name):
-    # Get column names
-    with connection.cursor() as cursor:
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns_info = cursor.fetchall()
-    columns = [col[1] for col in columns_info]
-    # columns.append(columns.pop(0))
-    # Fetch all rows into pandas DataFrame
-    query = f"SELECT * FROM {table_name}"
-    df = pd.read_sql_query(query, connection)
+    # Display flags come from the cached column statistics instead of string ops over every row
+    json_columns = column_display_flags(table_name)
+    columns = [c['value'] for c in json_columns]
 
-    # Function to determine if column should be displayed
-    def should_display(col):
-        # Check if any value in the column is neither null nor empty (after stripping spaces)
-        return int(df[col].dropna().astype(str).str.strip().replace('', None).notnull().any())
-
-    # Build json_columns as list of {key, value, display}
-    json_columns = [{'key': i, 'value': col, 'display': should_display(col)} for i, col in enumerate(columns)]
-
-    # Convert DataFrame rows into dict list
-    json_data = json.loads(df.to_json(orient='records'))
+    # Rows straight from the cursor: one serialization, by JsonResponse
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM {table_name}")
+        json_data = [dict(zip(columns, row)) for row in cursor.fetchall()]
 
     # Prepare return JSON structure
     return_json = {
         "rows": json_data,
         "columns": json_columns
     }
-    
-    print("hiiiii",json_columns)  # for debug/logging
 
     return JsonResponse(return_json, safe=False)
 
 
+def _encode_page_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_page_cursor(token):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    if not isinstance(values, list) or not values:
+        raise ValueError("invalid cursor")
+    return values
+
+
+def table_page(table_name, limit=100, after=None, columns=None, sort=None, filters=None):
+    """
+    One page of table_name with projection, filtering, sorting and paging in SQL.
+
+    columns: column names to return (all by default).
+    sort: column name, prefixed with '-' for descending; ties are broken on ROWID.
+    filters: {column: text}, rows whose column contains text (LIKE).
+    after: the 'next' cursor of the previous page; pages are keyset-based, so
+    every page costs the same however deep it is.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    Unknown column names raise ValueError.
+    """
+    with connection.cursor() as cursor:
+        all_columns = table_columns(cursor, table_name)
+        if not all_columns:
+            raise ValueError(f"table {table_name} not found")
+        columns = columns or all_columns
+        unknown = [c for c in list(columns) + list(filters or {}) if c not in all_columns]
+        sort_desc = bool(sort) and sort.startswith('-')
+        sort_column = sort.lstrip('-') if sort else None
+        if sort_column and sort_column not in all_columns:
+            unknown.append(sort_column)
+        if unknown:
+            raise ValueError(f"unknown columns: {', '.join(unknown)}")
+
+        where, params = [], []
+        for column, text in (filters or {}).items():
+            escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            where.append(f"{quote_name(column)} LIKE %s ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+
+        if sort_column:
+            sort_sql = quote_name(sort_column)
+            order = f"{sort_sql} DESC, ROWID DESC" if sort_desc else f"{sort_sql}, ROWID"
+        else:
+            sort_sql = "NULL"
+            order = "ROWID"
+        if after:
+            cursor_values = _decode_page_cursor(after)
+            rowid = cursor_values[-1]
+            if not sort_column:
+                where.append("ROWID > %s")
+                params.append(rowid)
+            else:
+                value = cursor_values[0]
+                # NULLs sort first ascending and last descending
+                if value is None and not sort_desc:
+                    where.append(f"(({sort_sql} IS NULL AND ROWID > %s) OR {sort_sql} IS NOT NULL)")
+                    params.append(rowid)
+                elif value is None:
+                    where.append(f"({sort_sql} IS NULL AND ROWID < %s)")
+                    params.append(rowid)
+                else:
+                    op = "<" if sort_desc else ">"
+                    where.append(f"({sort_sql} {op} %s OR ({sort_sql} = %s AND ROWID {op} %s)"
+                                 + (f" OR {sort_sql} IS NULL)" if sort_desc else ")"))
+                    params += [value, value, rowid]
+
+        sql = (f"SELECT ROWID, {sort_sql}, {', '.join(quote_name(c) for c in columns)} "
+               f"FROM {quote_name(table_name)}"
+               + (f" WHERE {' AND '.join(where)}" if where else "")
+               + f" ORDER BY {order} LIMIT %s")
+        cursor.execute(sql, params + [limit + 1])
+        fetched = cursor.fetchall()
+
+    rows = [dict(zip(columns, row[2:])) for row in fetched[:limit]]
+    next_cursor = None
+    if len(fetched) > limit:
+        last = fetched[limit - 1]
+        next_cursor = _encode_page_cursor([last[1], last[0]] if sort_column else [last[0]])
+    return rows, next_cursor
+
+
+TABLE_PAGE_SIZE = 100
+TABLE_PAGE_MAX = 1000
+TABLE_PAGE_VARIANTS = {'src': '_src', 'err': '_err', 'val': '_val'}
+
+
+@api_view(['GET'])
+def getTablePage(request, sid):
+    """
+    Paged rows of a segment table for the rules grid.
+    Query parameters: limit, after (cursor from 'next'), columns (comma separated),
+    sort (column, '-column' for descending), filter (repeatable COLUMN:text),
+    variant (src, err or val for the companion tables).
+    """
+    segment = segments.objects.filter(segment_id=sid).first()
+    if not segment:
+        return Response({"error": "Segment not found"}, status=status.HTTP_404_NOT_FOUND)
+    variant = request.query_params.get('variant', '')
+    if variant and variant not in TABLE_PAGE_VARIANTS:
+        return Response({"error": f"unknown variant {variant}"}, status=status.HTTP_400_BAD_REQUEST)
+    table_name = segment.table_name + TABLE_PAGE_VARIANTS.get(variant, '')
+
+    try:
+        limit = min(max(int(request.query_params.get('limit', TABLE_PAGE_SIZE)), 1), TABLE_PAGE_MAX)
+        columns = [c.strip() for c in request.query_params.get('columns', '').split(',') if c.strip()]
+        filters = {}
+        for item in request.query_params.getlist('filter'):
+            column, sep, text = item.partition(':')
+            if not sep:
+                raise ValueError(f"filter {item} is not COLUMN:text")
+            filters[column] = text
+        rows, next_cursor = table_page(table_name, limit=limit, after=request.query_params.get('after'),
+                                       columns=columns, sort=request.query_params.get('sort'), filters=filters)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        print(f"Error fetching table page: {e}")
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    shown = set(columns)
+    json_columns = [c for c in column_display_flags(table_name) if not shown or c['value'] in shown]
+    return JsonResponse({"rows": rows, "columns": json_columns, "next": next_cursor, "limit": limit})
+
+
+EXPORT_VARIANTS = {**TABLE_PAGE_VARIANTS, 'validation': '_validation',
+                   'validation_pass': '_validation_pass', 'validation_fail': '_validation_fail'}
+
+
+@api_view(['GET'])
+def exportTable(request, sid):
+    """
+    Download a segment table as Parquet or Arrow IPC, streamed batch by batch.
+    Query parameters: fmt (parquet, arrow for the IPC file format, arrows for
+    the IPC stream format), columns (comma separated, all by default) and
+    variant (src, err, val, validation, validation_pass or validation_fail).
+    """
+    if not columnar_export_available():
+        return Response({"error": "Parquet/Arrow export needs pyarrow installed"},
+                        status=status.HTTP_501_NOT_IMPLEMENTED)
+    segment = segments.objects.filter(segment_id=sid).first()
+    if not segment:
+        return Response({"error": "Segment not found"}, status=status.HTTP_404_NOT_FOUND)
+    variant = request.query_params.get('variant', '')
+    fmt = request.query_params.get('fmt', 'parquet').lower()
+    if variant and variant not in EXPORT_VARIANTS:
+        return Response({"error": f"unknown variant {variant}"}, status=status.HTTP_400_BAD_REQUEST)
+    if fmt not in EXPORT_FORMATS:
+        return Response({"error": f"unknown format {fmt}"}, status=status.HTTP_400_BAD_REQUEST)
+    table_name = segment.table_name + EXPORT_VARIANTS.get(variant, '')
+    if not table_exists(table_name):
+        return Response({"error": "Table not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        columns = [c.strip() for c in request.query_params.get('columns', '').split(',') if c.strip()]
+        schema = export_schema(table_name, columns)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ColumnarExportUnavailable as e:
+        return Response({"error": str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+    content_type, extension = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(export_chunks(table_name, schema, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{table_name}.{extension}"'
+    return response
+
+
 @api_view(['GET'])
 def getTableData(request,sid):
 
@@ -3018,6 +2617,10 @@ def getTableData(request,sid):
  
         table_name = segment.table_name # Access table_name directly from the segment object
         print(table_name)
+        fmt = stream_format(request)
+        if fmt:
+            # Same document as table_to_custom_json, rows streamed from the cursor
+            return stream_table_response(table_name, fmt, head={"columns": column_display_flags(table_name)})
         return table_to_custom_json(table_name)
         # df_valid = get_valid_data_frame(table_name)
         # print(df_valid)
@@ -3049,6 +2652,12 @@ def getTableData(request,sid):
         return Response({"error": str(e)}, status=500)
  
 
+def invalidate_segment_stats(table_name):
+    # After a DMTool run: it writes the segment table and its _src copy through its own connections
+    for table in write_tables(table_name, dual_write=True):
+        invalidate_column_stats(table)
+
+
 @api_view(['POST'])
 def execute_selection_criteria(request,pid,oid,sid):
     print("Execute Queries Called...")
@@ -3070,6 +2679,7 @@ def execute_selection_criteria(request,pid,oid,sid):
             project_id=pid,
             session_id = sess_id
         )
+        invalidate_segment_stats(target_table_name)
         copy_rows_with_reason_and_timestamp(target_table_name, 
                                     target_table_name+"_val", 
                                     affected_indexes,
@@ -3124,6 +2734,8 @@ def execute_queries(request,pid,oid,sid):
             project_id=pid,
             session_id = sess_id
         )
+        # The generated SQL may have changed any column of the segment table
+        invalidate_segment_stats(target_table_name)
         copy_rows_with_reason_and_timestamp(target_table_name, 
                                     target_table_name+"_val", 
                                     affected_indexes,
@@ -3164,6 +2776,7 @@ def delete_table_data(request):
             sql = f"DELETE FROM {table_name};"
 
             cursor.execute(sql)
+            invalidate_column_stats(table_name)
             print(f"Data deleted from table '{table_name}' successfully.")
             return Response("Data deleted")
             # return Response("Success")
@@ -3172,61 +2785,102 @@ def delete_table_data(request):
         print(f"An error occurred: {e}")
         # return Response("Error")
 
-def update_related_data_with_mapping_and_composite_pks(table1_name, table2_name, field_mapping, condition1, pk_columns1, pk_columns2):
+def update_related_data_with_mapping_and_composite_pks(table1_name, table2_name, field_mapping, condition1, pk_columns1, pk_columns2,
+                                                       dual_write=False):
     """
     Updates table2 rows by setting columns based on values from table1 using correlated subqueries in SQLite.
     Only rows matching composite primary keys and condition1 in table1 are updated.
+    With dual_write the same update is applied to table2's _src copy in the same transaction.
     """
     try:
-        # Compose SET clause with correlated subqueries for each mapped field
-        set_clauses = []
-        for t1_field, t2_field in field_mapping.items():
-            # Build the correlated subquery using composite keys
-            # WHERE clause to match all composite key parts between table1 and table2
-            join_conditions = []
-            for pk1, pk2 in zip(pk_columns1, pk_columns2):
-                join_conditions.append(f"{table1_name}.{pk1} = {table2_name}.{pk2}")
-            join_condition_str = " AND ".join(join_conditions)
-
-            # Add optional condition1 from table1
-            if condition1:
-                full_condition = f"{join_condition_str} AND ({condition1})"
-            else:
-                full_condition = join_condition_str
+        # The correlated subqueries look table1 up by its key columns once per table2 row
+        ensure_index(table1_name, pk_columns1)
+        with transaction.atomic(using="default"):
+            for target in write_tables(table2_name, dual_write):
+                _update_related_data(table1_name, target, field_mapping, condition1, pk_columns1, pk_columns2)
+    except Exception as e:
+        print(f"Error updating related data: {e}")
+
+
+def _update_related_data(table1_name, table2_name, field_mapping, condition1, pk_columns1, pk_columns2):
+    if sqlite3.sqlite_version_info >= (3, 33, 0):
+        sql = _update_from_sql(table1_name, table2_name, field_mapping, condition1, pk_columns1, pk_columns2)
+    else:
+        sql = _correlated_update_sql(table1_name, table2_name, field_mapping, condition1, pk_columns1, pk_columns2)
+
+    print(sql)  # For debugging
+
+    with connections["default"].cursor() as cursor:
+        cursor.execute(sql)
+        print(f"Successfully updated {cursor.rowcount} rows in {table2_name}.")
+    invalidate_column_stats(table2_name, field_mapping.values())
 
-            set_clause = (
-                f"{t2_field} = (SELECT {t1_field} FROM {table1_name} WHERE {full_condition} LIMIT 1)"
-            )
-            set_clauses.append(set_clause)
 
-        set_clause_str = ", ".join(set_clauses)
+def _update_from_sql(table1_name, table2_name, field_mapping, condition1, pk_columns1, pk_columns2):
+    """
+    Set-based form: table1 is reduced to its first row (lowest ROWID) per key
+    matching condition1, joined to table2 once, and every mapped field is
+    assigned in the same pass (UPDATE ... FROM, SQLite 3.33+). Same result as
+    the correlated subqueries, which probe table1 once per field and row.
+    """
+    key_list = ", ".join(f"{table1_name}.{pk1} AS k{i}" for i, pk1 in enumerate(pk_columns1))
+    value_list = ", ".join(f"{table1_name}.{t1_field} AS v{i}" for i, t1_field in enumerate(field_mapping))
+    group_by = ", ".join(f"{table1_name}.{pk1}" for pk1 in pk_columns1)
+    where = f"WHERE ({condition1})" if condition1 else ""
+    set_clause_str = ", ".join(f"{t2_field} = s.v{i}" for i, t2_field in enumerate(field_mapping.values()))
+    join_condition_str = " AND ".join(f"{table2_name}.{pk2} = s.k{i}" for i, pk2 in enumerate(pk_columns2))
+
+    return f"""
+    UPDATE {table2_name}
+    SET {set_clause_str}
+    FROM (
+        SELECT {key_list}, {value_list}
+        FROM {table1_name}
+        WHERE {table1_name}.ROWID IN (SELECT MIN({table1_name}.ROWID) FROM {table1_name} {where} GROUP BY {group_by})
+    ) AS s
+    WHERE {join_condition_str}
+    """
+
 
-        # Compose WHERE EXISTS to update only rows having matching row(s) in table1 with condition1
-        join_conditions_for_exists = []
+def _correlated_update_sql(table1_name, table2_name, field_mapping, condition1, pk_columns1, pk_columns2):
+    # Compose SET clause with correlated subqueries for each mapped field
+    set_clauses = []
+    for t1_field, t2_field in field_mapping.items():
+        # Build the correlated subquery using composite keys
+        # WHERE clause to match all composite key parts between table1 and table2
+        join_conditions = []
         for pk1, pk2 in zip(pk_columns1, pk_columns2):
-            join_conditions_for_exists.append(f"{table1_name}.{pk1} = {table2_name}.{pk2}")
-        join_condition_exists_str = " AND ".join(join_conditions_for_exists)
+            join_conditions.append(f"{table1_name}.{pk1} = {table2_name}.{pk2}")
+        join_condition_str = " AND ".join(join_conditions)
+
+        # Add optional condition1 from table1
         if condition1:
-            exists_condition = f"EXISTS (SELECT 1 FROM {table1_name} WHERE {join_condition_exists_str} AND ({condition1}))"
+            full_condition = f"{join_condition_str} AND ({condition1})"
         else:
-            exists_condition = f"EXISTS (SELECT 1 FROM {table1_name} WHERE {join_condition_exists_str})"
+            full_condition = join_condition_str
 
-        sql = f"""
-        UPDATE {table2_name}
-        SET {set_clause_str}
-        WHERE {exists_condition}
-        """
+        set_clause = (
+            f"{t2_field} = (SELECT {t1_field} FROM {table1_name} WHERE {full_condition} LIMIT 1)"
+        )
+        set_clauses.append(set_clause)
 
-        print(sql)  # For debugging
+    set_clause_str = ", ".join(set_clauses)
 
-        with connections["default"].cursor() as cursor:
-            cursor.execute(sql)
-            connections["default"].commit()
-            print(f"Successfully updated {cursor.rowcount} rows in {table2_name}.")
+    # Compose WHERE EXISTS to update only rows having matching row(s) in table1 with condition1
+    join_conditions_for_exists = []
+    for pk1, pk2 in zip(pk_columns1, pk_columns2):
+        join_conditions_for_exists.append(f"{table1_name}.{pk1} = {table2_name}.{pk2}")
+    join_condition_exists_str = " AND ".join(join_conditions_for_exists)
+    if condition1:
+        exists_condition = f"EXISTS (SELECT 1 FROM {table1_name} WHERE {join_condition_exists_str} AND ({condition1}))"
+    else:
+        exists_condition = f"EXISTS (SELECT 1 FROM {table1_name} WHERE {join_condition_exists_str})"
 
-    except Exception as e:
-        connections["default"].rollback()
-        print(f"Error updating related data: {e}")
+    return f"""
+    UPDATE {table2_name}
+    SET {set_clause_str}
+    WHERE {exists_condition}
+    """
 
 
 
@@ -3273,9 +2927,92 @@ def update_related_data_with_mapping_and_composite_pks(table1_name, table2_name,
 #         print(f"Error updating related data: {e}")
 
 
-def remove_duplicate_rows_group_by_all(table_name):
+def _sqlite_value(value):
+    # SQLite compares 1 and 1.0 (and 0 and -0.0) as equal but keeps '1' and 1 apart
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _row_hash(*values):
+    # 128-bit digest of one row; repr keeps NULL, '' and 1 / '1' apart like GROUP BY does
+    return hashlib.blake2b(repr(tuple(_sqlite_value(v) for v in values)).encode(), digest_size=16).digest()
+
+
+def _row_hash_sql(columns, width=100):
+    # SQLite functions take at most 127 arguments: hash wide rows in slices, then hash the slices
+    parts = [f"dm_row_hash({', '.join(columns[i:i + width])})" for i in range(0, len(columns), width)]
+    return parts[0] if len(parts) == 1 else f"dm_row_hash({', '.join(parts)})"
+
+
+# Leading columns indexed to probe the rows older than since_rowid for an equal row
+DEDUP_PROBE_COLUMNS = 4
+
+
+def _dedup_on_hash(cursor, table_name, columns, since_rowid):
+    # Only the rows after since_rowid are hashed; older rows are probed through an index
+    # on the leading columns, compared with IS like GROUP BY does
+    quoted_columns = [f'"{c}"' for c in columns]
+    connections["default"].connection.create_function("dm_row_hash", -1, _row_hash, deterministic=True)
+    cursor.execute("DROP TABLE IF EXISTS temp.dedup_hashes")
+    cursor.execute("CREATE TEMP TABLE dedup_hashes (rid INTEGER PRIMARY KEY, h BLOB)")
+    cursor.execute(f"INSERT INTO temp.dedup_hashes SELECT ROWID, {_row_hash_sql(quoted_columns)} "
+                   f"FROM {table_name} WHERE ROWID > %s", [since_rowid])
+    cursor.execute("CREATE INDEX temp.dedup_hashes_h ON dedup_hashes (h, rid)")
+    older_duplicate = ""
+    if since_rowid:
+        create_index(cursor, table_name, columns[:DEDUP_PROBE_COLUMNS])
+        same_row = " AND ".join(f"o.{c} IS {table_name}.{c}" for c in quoted_columns)
+        older_duplicate = (f"OR (ROWID > %s AND EXISTS (SELECT 1 FROM {table_name} o "
+                           f"WHERE {same_row} AND o.ROWID <= %s))")
+    cursor.execute(f"""
+        DELETE FROM {table_name}
+        WHERE ROWID IN (
+            SELECT d.rid FROM temp.dedup_hashes d
+            WHERE EXISTS (SELECT 1 FROM temp.dedup_hashes n WHERE n.h = d.h AND n.rid < d.rid)
+        )
+        {older_duplicate}
+    """, [since_rowid, since_rowid] if since_rowid else [])
+    rows_deleted = cursor.rowcount
+    cursor.execute("DROP TABLE temp.dedup_hashes")
+    return rows_deleted
+
+
+def _dedup_on_keys(cursor, table_name, key_fields, since_rowid):
+    create_index(cursor, table_name, key_fields)
+    same_key = " AND ".join(f'o."{k}" IS {table_name}."{k}"' for k in key_fields)
+    cursor.execute(f"""
+        DELETE FROM {table_name}
+        WHERE ROWID > %s
+        AND EXISTS (SELECT 1 FROM {table_name} o WHERE {same_key} AND o.ROWID < {table_name}.ROWID)
+    """, [since_rowid])
+    return cursor.rowcount
+
+
+def table_rowid_marks(tables):
+    """{table: highest ROWID}, taken before a load to scope remove_duplicate_rows_group_by_all to the new rows."""
+    marks = {}
+    with connections["default"].cursor() as cursor:
+        for table in tables:
+            cursor.execute(f"SELECT COALESCE(MAX(ROWID), 0) FROM {table}")
+            marks[table] = cursor.fetchone()[0]
+    return marks
+
+
+def remove_duplicate_rows_group_by_all(table_name, dual_write=False, key_fields=None, since_rowid=None, mode=None):
+    """
+    Delete duplicate rows, keeping the first (lowest ROWID) of every group.
+
+    mode 'group_by' (DEDUP_MODE default): GROUP BY over every column.
+    mode 'hash': rows are grouped on a hash of all columns, kept in an indexed
+    temp table, instead of sorting the table on every column.
+    mode 'keys' (default when key_fields is given): rows with the same key fields
+    are duplicates, probed through the key index.
+    since_rowid ({table: ROWID} from table_rowid_marks, or one ROWID) restricts the
+    deletion to rows added after it; they are still compared with the whole table.
+    """
     try:
-        with connections["default"].cursor() as cursor:
+        with transaction.atomic(using="default"), connections["default"].cursor() as cursor:
             # 1. Get all column names
             cursor.execute(f"PRAGMA table_info({table_name})") #sqlite command
             columns = [row[1] for row in cursor.fetchall()] #get the column names
@@ -3284,52 +3021,67 @@ def remove_duplicate_rows_group_by_all(table_name):
                 print(f"Table '{table_name}' not found or has no columns.")
                 return
 
-            # 2. Construct the SQL query
-            columns_str = ", ".join(columns)
-            query = f"""
-                DELETE FROM {table_name}
-                WHERE ROWID NOT IN (
-                    SELECT MIN(ROWID)
-                    FROM {table_name}
-                    GROUP BY {columns_str}
-                );
-            """
-
-            # 3. Execute the query
-            cursor.execute(query)
-            rows_deleted = cursor.rowcount
-            connections["default"].commit()
-            print(f"Removed {rows_deleted} duplicate rows from '{table_name}'.")
+            if mode is None:
+                mode = 'keys' if key_fields else getattr(settings, 'DEDUP_MODE', 'group_by')
+            quoted_columns = [f'"{c}"' for c in columns]
+
+            # 2. Deduplicate the table (and its _src copy, which has the same columns)
+            for target in write_tables(table_name, dual_write):
+                since = since_rowid.get(target, 0) if isinstance(since_rowid, dict) else (since_rowid or 0)
+                if mode == 'keys':
+                    rows_deleted = _dedup_on_keys(cursor, target, key_fields, since)
+                elif mode == 'hash':
+                    rows_deleted = _dedup_on_hash(cursor, target, columns, since)
+                else:
+                    cursor.execute(f"""
+                        DELETE FROM {target}
+                        WHERE ROWID > %s AND ROWID NOT IN (
+                            SELECT MIN(ROWID)
+                            FROM {target}
+                            GROUP BY {", ".join(quoted_columns)}
+                        );
+                    """, [since])
+                    rows_deleted = cursor.rowcount
+                print(f"Removed {rows_deleted} duplicate rows from '{target}' ({mode}).")
+                if rows_deleted:
+                    invalidate_column_stats(target)
 
     except Exception as e:
-        connections["default"].rollback()
         print(f"Error removing duplicates: {e}")
 
 
 
-def copy_data_between_tables_with_field_mapping(table1_name, table2_name, field_mapping):
+def copy_data_between_tables_with_field_mapping(table1_name, table2_name, field_mapping, dual_write=False):
     try:
-        with connections["default"].cursor() as cursor:
+        with transaction.atomic(using="default"), connections["default"].cursor() as cursor:
             # 1. Construct the INSERT and SELECT queries dynamically
             select_clause = ", ".join(field_mapping.keys())  # Select from table1
             insert_columns = ", ".join(field_mapping.values())  # Insert into table2
 
             insert_sql = f"INSERT INTO {table2_name} ({insert_columns}) SELECT {select_clause} FROM {table1_name}"
 
+            cursor.execute(f"SELECT COALESCE(MAX(ROWID), 0) FROM {table2_name}")
+            last_rowid = cursor.fetchone()[0]
+
             # 2. Execute the query
             cursor.execute(insert_sql)
 
             rows_copied = cursor.rowcount
-            connections["default"].commit()
             print(f"Successfully copied {rows_copied} rows from {table1_name} to {table2_name}")
 
+            # 3. Mirror the rows just added into the _src copy instead of re-reading table1
+            for mirror in write_tables(table2_name, dual_write)[1:]:
+                cursor.execute(f"INSERT INTO {mirror} ({insert_columns}) "
+                               f"SELECT {insert_columns} FROM {table2_name} WHERE ROWID > %s", [last_rowid])
+                print(f"Successfully copied {cursor.rowcount} rows from {table2_name} to {mirror}")
+
     except Exception as e:
-        connections["default"].rollback()
         print(f"Error copying data: {e}")
 
 
 
-def create_and_insert_data(table_name, data):
+def create_and_insert_data(table_name, data, typed=False):
+    # typed: infer INTEGER/REAL/DATE columns from a sample of the rows instead of all TEXT
     if not data:
         print("No data provided. Table creation and insertion skipped.")
         return
@@ -3340,22 +3092,22 @@ def create_and_insert_data(table_name, data):
             drop_table_dynamically(table_name=table_name)
             create_table_sql = f"CREATE TABLE IF NOT EXISTS {table_name} ("
 
+            column_types = {}
+            if typed:
+                sample = [list(row.values()) for row in data[:getattr(settings, 'TYPE_INFERENCE_SAMPLE_SIZE', 1000)]]
+                column_types = infer_column_types(list(first_row), sample)
             columns = []
             for key, value in first_row.items():  # Iterate through the first row only
                 column_name = key
-                column_type = "TEXT"  # Default type (you can refine this based on value types)
+                column_type = column_types.get(key, "TEXT")
                 columns.append(f'"{column_name}" {column_type}')
 
             create_table_sql += ", ".join(columns) + ")"
             cursor.execute(create_table_sql)
 
 
-            # 2. Insert Data (Same as before)
-            insert_sql = f"INSERT INTO {table_name} (" + ", ".join(f'"{key}"' for key in first_row) + ") VALUES (" + ", ".join(["%s"] * len(first_row)) + ")"
-
-            for row in data:
-                values = list(row.values())
-                cursor.execute(insert_sql, values)
+            # 2. Insert Data
+            insert_rows(cursor, table_name, list(first_row), (list(row.values()) for row in data))
 
             connections["default"].commit()
             print(f"Table '{table_name}' created and data inserted successfully.")
@@ -3366,441 +3118,77 @@ def create_and_insert_data(table_name, data):
 
 
 
-def func(table_name):
-  table_name = table_name.upper()
-  class RFC_ERROR_INFO(Structure):
-      _fields_ = [("code", c_long),
-                  ("group", c_long),
-                  ("key", c_wchar * 128),
-                  ("message", c_wchar * 512),
-                  ("abapMsgClass", c_wchar * 21),
-                  ("abapMsgType", c_wchar * 2),
-                  ("abapMsgNumber", c_wchar * 4),
-                  ("abapMsgV1", c_wchar * 51),
-                  ("abapMsgV2", c_wchar * 51),
-                  ("abapMsgV3", c_wchar * 51),
-                  ("abapMsgV4", c_wchar * 51)]
-
-  class RFC_CONNECTION_PARAMETER(Structure):
-      _fields_ = [("name", c_wchar_p),
-                  ("value", c_wchar_p)]
-
-
-  #-Constants-------------------------------------------------------------
-
-  #-RFC_RC - RFC return codes---------------------------------------------
-  RFC_OK = 0
-  RFC_COMMUNICATION_FAILURE = 1
-  RFC_LOGON_FAILURE = 2
-  RFC_ABAP_RUNTIME_FAILURE = 3
-  RFC_ABAP_MESSAGE = 4
-  RFC_ABAP_EXCEPTION = 5
-  RFC_CLOSED = 6
-  RFC_CANCELED = 7
-  RFC_TIMEOUT = 8
-  RFC_MEMORY_INSUFFICIENT = 9
-  RFC_VERSION_MISMATCH = 10
-  RFC_INVALID_PROTOCOL = 11
-  RFC_SERIALIZATION_FAILURE = 12
-  RFC_INVALID_HANDLE = 13
-  RFC_RETRY = 14
-  RFC_EXTERNAL_FAILURE = 15
-  RFC_EXECUTED = 16
-  RFC_NOT_FOUND = 17
-  RFC_NOT_SUPPORTED = 18
-  RFC_ILLEGAL_STATE = 19
-  RFC_INVALID_PARAMETER = 20
-  RFC_CODEPAGE_CONVERSION_FAILURE = 21
-  RFC_CONVERSION_FAILURE = 22
-  RFC_BUFFER_TOO_SMALL = 23
-  RFC_TABLE_MOVE_BOF = 24
-  RFC_TABLE_MOVE_EOF = 25
-  RFC_START_SAPGUI_FAILURE = 26
-  RFC_ABAP_CLASS_EXCEPTION = 27
-  RFC_UNKNOWN_ERROR = 28
-  RFC_AUTHORIZATION_FAILURE = 29
-
-  #-RFCTYPE - RFC data types----------------------------------------------
-  RFCTYPE_CHAR = 0
-  RFCTYPE_DATE = 1
-  RFCTYPE_BCD = 2
-  RFCTYPE_TIME = 3
-  RFCTYPE_BYTE = 4
-  RFCTYPE_TABLE = 5
-  RFCTYPE_NUM = 6
-  RFCTYPE_FLOAT = 7
-  RFCTYPE_INT = 8
-  RFCTYPE_INT2 = 9
-  RFCTYPE_INT1 = 10
-  RFCTYPE_NULL = 14
-  RFCTYPE_ABAPOBJECT = 16
-  RFCTYPE_STRUCTURE = 17
-  RFCTYPE_DECF16 = 23
-  RFCTYPE_DECF34 = 24
-  RFCTYPE_XMLDATA = 28
-  RFCTYPE_STRING = 29
-  RFCTYPE_XSTRING = 30
-  RFCTYPE_BOX = 31
-  RFCTYPE_GENERIC_BOX = 32
-
-  #-RFC_UNIT_STATE - Processing status of a background unit---------------
-  RFC_UNIT_NOT_FOUND = 0 
-  RFC_UNIT_IN_PROCESS = 1 
-  RFC_UNIT_COMMITTED = 2 
-  RFC_UNIT_ROLLED_BACK = 3 
-  RFC_UNIT_CONFIRMED = 4 
-
-  #-RFC_CALL_TYPE - Type of an incoming function call---------------------
-  RFC_SYNCHRONOUS = 0 
-  RFC_TRANSACTIONAL = 1 
-  RFC_QUEUED = 2 
-  RFC_BACKGROUND_UNIT = 3 
-
-  #-RFC_DIRECTION - Direction of a function module parameter--------------
-  RFC_IMPORT = 1 
-  RFC_EXPORT = 2 
-  RFC_CHANGING = RFC_IMPORT + RFC_EXPORT 
-  RFC_TABLES = 4 + RFC_CHANGING 
-
-  #-RFC_CLASS_ATTRIBUTE_TYPE - Type of an ABAP object attribute-----------
-  RFC_CLASS_ATTRIBUTE_INSTANCE = 0 
-  RFC_CLASS_ATTRIBUTE_CLASS = 1 
-  RFC_CLASS_ATTRIBUTE_CONSTANT = 2 
-
-  #-RFC_METADATA_OBJ_TYPE - Ingroup repository----------------------------
-  RFC_METADATA_FUNCTION = 0 
-  RFC_METADATA_TYPE = 1 
-  RFC_METADATA_CLASS = 2 
-
-
-  #-Variables-------------------------------------------------------------
-  ErrInf = RFC_ERROR_INFO; RfcErrInf = ErrInf()
-  ConnParams = RFC_CONNECTION_PARAMETER * 5; RfcConnParams = ConnParams()
-  SConParams = RFC_CONNECTION_PARAMETER * 3; RfcSConParams = SConParams()
-
-
-  #-Library---------------------------------------------------------------
-  # if str(platform.architecture()[0]) == "32bit":
-  #   os.environ['PATH'] += ";C:\\SAPRFCSDK\\32bit"
-  #   SAPNWRFC = "C:\\SAPRFCSDK\\32bit\\sapnwrfc.dll"
-  # elif str(platform.architecture()[0]) == "64bit":
-  #   os.environ['PATH'] += ";C:\\SAPRFCSDK\\64bit"
-  #   SAPNWRFC = "C:\\SAPRFCSDK\\64bit\\sapnwrfc.dll"
-
-  SAPNWRFC = "sapnwrfc.dll"
-  SAP = windll.LoadLibrary(SAPNWRFC)
-
-  #-Prototypes------------------------------------------------------------
-  SAP.RfcAppendNewRow.argtypes = [c_void_p, POINTER(ErrInf)]
-  SAP.RfcAppendNewRow.restype = c_void_p
-
-  SAP.RfcCreateTable.argtypes = [c_void_p, POINTER(ErrInf)]
-  SAP.RfcCreateTable.restype = c_void_p
-
-  SAP.RfcCloseConnection.argtypes = [c_void_p, POINTER(ErrInf)]
-  SAP.RfcCloseConnection.restype = c_ulong
-
-  SAP.RfcCreateFunction.argtypes = [c_void_p, POINTER(ErrInf)]
-  SAP.RfcCreateFunction.restype = c_void_p
-
-  SAP.RfcCreateFunctionDesc.argtypes = [c_wchar_p, POINTER(ErrInf)]
-  SAP.RfcCreateFunctionDesc.restype = c_void_p
-
-  SAP.RfcDestroyFunction.argtypes = [c_void_p, POINTER(ErrInf)]
-  SAP.RfcDestroyFunction.restype = c_ulong
-
-  SAP.RfcDestroyFunctionDesc.argtypes = [c_void_p, POINTER(ErrInf)]
-  SAP.RfcDestroyFunctionDesc.restype = c_ulong
-
-  SAP.RfcGetChars.argtypes = [c_void_p, c_wchar_p, c_void_p, c_ulong, \
-    POINTER(ErrInf)]
-  SAP.RfcGetChars.restype = c_ulong
-
-  SAP.RfcGetCurrentRow.argtypes = [c_void_p, POINTER(ErrInf)]
-  SAP.RfcGetCurrentRow.restype = c_void_p
-
-  SAP.RfcGetFunctionDesc.argtypes = [c_void_p, c_wchar_p, POINTER(ErrInf)]
-  SAP.RfcGetFunctionDesc.restype = c_void_p
-
-  SAP.RfcGetRowCount.argtypes = [c_void_p, POINTER(c_ulong), \
-    POINTER(ErrInf)]
-  SAP.RfcGetRowCount.restype = c_ulong
-
-  SAP.RfcGetStructure.argtypes = [c_void_p, c_wchar_p, \
-    POINTER(c_void_p), POINTER(ErrInf)]
-  SAP.RfcGetStructure.restype = c_ulong
-
-  SAP.RfcGetTable.argtypes = [c_void_p, c_wchar_p, POINTER(c_void_p), \
-    POINTER(ErrInf)]
-  SAP.RfcGetTable.restype = c_ulong
-
-  SAP.RfcGetVersion.argtypes = [POINTER(c_ulong), POINTER(c_ulong), \
-    POINTER(c_ulong)]
-  SAP.RfcGetVersion.restype = c_wchar_p
-
-  SAP.RfcInstallServerFunction.argtypes = [c_wchar_p, c_void_p, \
-    c_void_p, POINTER(ErrInf)]
-  SAP.RfcInstallServerFunction.restype = c_ulong
-
-  SAP.RfcInvoke.argtypes = [c_void_p, c_void_p, POINTER(ErrInf)]
-  SAP.RfcInvoke.restype = c_ulong
-
-  SAP.RfcListenAndDispatch.argtypes = [c_void_p, c_ulong, POINTER(ErrInf)]
-  SAP.RfcListenAndDispatch.restype = c_ulong
-
-  SAP.RfcMoveToFirstRow.argtypes = [c_void_p, POINTER(ErrInf)]
-  SAP.RfcMoveToFirstRow.restype = c_ulong
-
-  SAP.RfcMoveToNextRow.argtypes = [c_void_p, POINTER(ErrInf)]
-  SAP.RfcMoveToNextRow.restype = c_ulong
-
-  SAP.RfcOpenConnection.argtypes = [POINTER(ConnParams), c_ulong, \
-    POINTER(ErrInf)]
-  SAP.RfcOpenConnection.restype = c_void_p
-
-  SAP.RfcPing.argtypes = [c_void_p, POINTER(ErrInf)]
-  SAP.RfcPing.restype = c_ulong
+def sap_connection(connection_id=None):
+    return Connection.objects.get(connection_id=connection_id) if connection_id is not None else None
 
-  SAP.RfcRegisterServer.argtypes = [POINTER(SConParams), c_ulong, \
-    POINTER(ErrInf)]
-  SAP.RfcRegisterServer.restype = c_void_p
 
-  SAP.RfcSetChars.argtypes = [c_void_p, c_wchar_p, c_wchar_p, c_ulong, \
-    POINTER(ErrInf)]
-  SAP.RfcSetChars.restype = c_ulong
-  def join_json_objects_multiple_keys(obj1, obj2, primary_keys):
-      result = []
+def sap_pool(connection_id=None):
+    """RFC pool for a saved SAP connection, or the default logon when none is given."""
+    if connection_id is not None:
+        return get_connection_pool(sap_connection(connection_id))
+    return get_default_rfc_pool()
 
-      # Create a dictionary to efficiently look up items in obj2 by combined primary keys
-      obj2_lookup = {}
-      for item2 in obj2:
-          key = tuple(item2[key] for key in primary_keys)  # Create a tuple key
-          obj2_lookup[key] = item2
 
-      for item1 in obj1:
-          key = tuple(item1[key] for key in primary_keys)
-          item2 = obj2_lookup.get(key)  # Efficient lookup
+def extract_sap_table(table_name, connection_id=None, parallel=None):
+    """Page a SAP table straight into the default SQLite database instead of building it in memory."""
+    return extract_table_to_sqlite(sap_pool(connection_id), table_name, parallel=parallel,
+                                   connection=sap_connection(connection_id))
 
-          if item2:
-              merged_object = {**item1, **item2}
-              result.append(merged_object)
-          else:
-              result.append(item1)  # Keep item1 if no match
-              print(f"No match found for {key}")
 
-      return result
+def refresh_sap_table(table_name, connection_id=None, delta_field=None, parallel=None):
+    """Delta refresh of the local copy of a SAP table, see refresh_table_delta."""
+    return refresh_table_delta(sap_pool(connection_id), table_name, connection=sap_connection(connection_id),
+                               delta_field=delta_field, parallel=parallel)
 
 
-  #-Main------------------------------------------------------------------
-
-  RfcConnParams[0].name = "ASHOST"; RfcConnParams[0].value = "34.194.191.113"
-  RfcConnParams[1].name = "SYSNR" ; RfcConnParams[1].value = "01"
-  RfcConnParams[2].name = "CLIENT"; RfcConnParams[2].value = "100"
-  RfcConnParams[3].name = "USER"  ; RfcConnParams[3].value = "GAJANANDAM"
-  RfcConnParams[4].name = "PASSWD"; RfcConnParams[4].value = "SunR!se@6789"
-
-  TableName = table_name
-  keyFields = []
-  cnt = 0
-
-  hRFC = SAP.RfcOpenConnection(RfcConnParams, 5, RfcErrInf)
-  if hRFC != None:
-
-    charBuffer = create_unicode_buffer(1048576 + 1)
-
-    hFuncDesc = SAP.RfcGetFunctionDesc(hRFC, "CACS_GET_TABLE_FIELD450", RfcErrInf)
-    if hFuncDesc != 0:
-      hFunc = SAP.RfcCreateFunction(hFuncDesc, RfcErrInf)
-      if hFunc != 0:
-
-        rc = SAP.RfcSetChars(hFunc, "I_TABNAME", TableName, \
-          len(TableName), RfcErrInf)
-        print(SAP.RfcInvoke(hRFC, hFunc, RfcErrInf) == RFC_OK)
-        if SAP.RfcInvoke(hRFC, hFunc, RfcErrInf) == RFC_OK:
-
-          hTable = c_void_p(0)
-          if SAP.RfcGetTable(hFunc, "T_KEYFIELD", hTable, RfcErrInf) == RFC_OK:
-            RowCount = c_ulong(0)
-            rc = SAP.RfcGetRowCount(hTable, RowCount, RfcErrInf)
-            print(RowCount, 1)
-            rc = SAP.RfcMoveToFirstRow(hTable, RfcErrInf)
-            for i in range(0, RowCount.value):
-              hRow = SAP.RfcGetCurrentRow(hTable, RfcErrInf)
-              rc = SAP.RfcGetChars(hRow, "FIELDNAME", charBuffer, 512, RfcErrInf)
-              # print(str(charBuffer.value), end="    ")
-              fieldName = str(charBuffer.value)
-              # rc = SAP.RfcGetChars(hRow, "LENGTH", charBuffer, 512, RfcErrInf)
-              # val = int(charBuffer.value)
-              # if (sum + val < 512):
-              #   sum += val
-              #   l1.append(fieldName.strip())
-              #   # print(sum)
-              # else:
-              keyFields.append(fieldName.strip())
-                # l1 = [fieldName.strip()]
-                # sum = val
-              if i < RowCount.value:
-                rc = SAP.RfcMoveToNextRow(hTable, RfcErrInf)
-
-        rc = SAP.RfcDestroyFunction(hFunc, RfcErrInf)
-
-    # rc = SAP.RfcCloseConnection(hRFC, RfcErrInf)
-
-    print(*keyFields)
-
-    keyFieldsCnt = len(keyFields)
-    print(keyFieldsCnt)
-  else:
-    print(RfcErrInf.key)
-    print(RfcErrInf.message)
-
-
-  ind, keyDict = 0, {}
-
-  # hRFC = SAP.RfcOpenConnection(RfcConnParams, 5, RfcErrInf)
-  if hRFC != None:
-
-    charBuffer = create_unicode_buffer(1048576 + 1)
-
-    hFuncDesc = SAP.RfcGetFunctionDesc(hRFC, "Z450RFC_READ_TABLE", RfcErrInf)
-    if hFuncDesc != 0:
-      hFunc = SAP.RfcCreateFunction(hFuncDesc, RfcErrInf)
-      if hFunc != 0:
-
-        rc = SAP.RfcSetChars(hFunc, "QUERY_TABLE", TableName, \
-          len(TableName), RfcErrInf)
-        rc = SAP.RfcSetChars(hFunc, "DELIMITER", "~", 1, RfcErrInf)
-        if SAP.RfcInvoke(hRFC, hFunc, RfcErrInf) == RFC_OK:
-
-          hTable = c_void_p(0)
-          if SAP.RfcGetTable(hFunc, "FIELDS", hTable, RfcErrInf) == RFC_OK:
-            
-            
-            sum, l, l1 = 0, [], keyFields.copy()
-            keyFieldsLen = 0
-            RowCount = c_ulong(0)
-            rc = SAP.RfcGetRowCount(hTable, RowCount, RfcErrInf)
-            print(RowCount)
-            rc = SAP.RfcMoveToFirstRow(hTable, RfcErrInf)
-            for i in range(0, RowCount.value):
-              hRow = SAP.RfcGetCurrentRow(hTable, RfcErrInf)
-              rc = SAP.RfcGetChars(hRow, "FIELDNAME", charBuffer, 512, RfcErrInf)
-              # print(str(charBuffer.value), end="    ")
-              fieldName = str(charBuffer.value)
-              rc = SAP.RfcGetChars(hRow, "LENGTH", charBuffer, 512, RfcErrInf)
-              val = int(charBuffer.value)
-              cnt += 1
-              # print(fieldName.strip(), cnt)
-              if (i < keyFieldsCnt):
-                print(i)
-                i += 1
-                keyFieldsLen += val
-              else:
-                if (sum + val + keyFieldsLen < 400):
-                  sum += val
-                  l1.append(fieldName.strip())
-                  # print(sum)
-                else:
-                  l.append(l1)
-                  l1 = keyFields.copy()
-                  l1.append(fieldName.strip())
-                  # print(sum + keyFieldsLen)
-                  sum = val
-                  
-              if i < RowCount.value:
-                rc = SAP.RfcMoveToNextRow(hTable, RfcErrInf)
-            l.append(l1)
-        rc = SAP.RfcDestroyFunction(hFunc, RfcErrInf)
-
-    # rc = SAP.RfcCloseConnection(hRFC, RfcErrInf)
-
-    # print(l)
-  else:
-    print(RfcErrInf.key)
-    print(RfcErrInf.message)
-
-  # for i in l:
-  #   print(i[:2])
-
-  length = 0
-  for ii in l:
-    for jj in ii:
-      if (jj == 'MANDT' or jj == 'MATNR'): continue
-      length += 1
-  print(length)
-
-  jsonTemp = jsonPrimary = []
-  for splittedFields in l:
-    # hRFC = SAP.RfcOpenConnection(RfcConnParams, 5, RfcErrInf)
-    if hRFC != None:
-
-      charBuffer = create_unicode_buffer(1048576 + 1)
-
-      hFuncDesc = SAP.RfcGetFunctionDesc(hRFC, "Z450RFC_READ_TAB_DATA", RfcErrInf)
-      if hFuncDesc != 0:
-        hFunc = SAP.RfcCreateFunction(hFuncDesc, RfcErrInf)
-        if hFunc != 0:
-
-          rc = SAP.RfcSetChars(hFunc, "QUERY_TABLE", TableName, \
-            len(TableName), RfcErrInf)
-          rc = SAP.RfcSetChars(hFunc, "DELIMITER", "~", 1, RfcErrInf)
-
-          #MATNR,MTART,ATTYP,SATNR,MATKL,MBRSH,MEINS,SPART,BISMT,DATAB,LIQDT,NORMT,GROES,LABOR,BRGEW,NTGEW,GEWEI,LAENG,BREIT,HOEHE,MEABM,VOLUM,VOLEH,KZKFG,IPRKZ,RAUBE,TEMPB,BEHVO,STOFF,ETIAR,ETIFO,WESCH,XGCHP,MHDHB,MHDRZ,SLED_BBD
-
-          field = ','.join(splittedFields)
-          # print(field)
-          rc = SAP.RfcSetChars(hFunc, "FIELDNAME", field, len(field), RfcErrInf)
-
-          # print(SAP.RfcInvoke(hRFC, hFunc, RfcErrInf) == RFC_OK)
-          if SAP.RfcInvoke(hRFC, hFunc, RfcErrInf) == RFC_OK:
-
-            hTable = c_void_p(0)
-            if SAP.RfcGetTable(hFunc, "DATA", hTable, RfcErrInf) == RFC_OK:
-
-              RowCount = c_ulong(0)
-              rc = SAP.RfcGetRowCount(hTable, RowCount, RfcErrInf)
-              rc = SAP.RfcMoveToFirstRow(hTable, RfcErrInf)
-              for i in range(0, RowCount.value):
-                hRow = SAP.RfcGetCurrentRow(hTable, RfcErrInf)
-                rc = SAP.RfcGetChars(hRow, "WA", charBuffer, 1024, RfcErrInf)
-                data_row=charBuffer.value
-                # data_dict = {field: value for field, value in zip(splittedFields, data_row)}
-                # print(data_dict)
-
-                data_row = charBuffer.value.split("~")
-  
-                                  # Create dictionary using only requested fields
-                              # data_dict = {field: value for field, value in zip(field, data_row)}
-                              # # print(charBuffer.value)
-                              # res.append(data_dict)
-                fields = field.split(",")
-                data_dict = {f: v.strip() for f, v in zip(fields, data_row)}
-                jsonTemp.append(data_dict)
-
-                if i < RowCount.value:
-                  rc = SAP.RfcMoveToNextRow(hTable, RfcErrInf)
-
-          rc = SAP.RfcDestroyFunction(hFunc, RfcErrInf)
-      # print(jsonTemp)
-      if (jsonPrimary == []): 
-        jsonPrimary = jsonTemp
-      else:
-        jsonPrimary = join_json_objects_multiple_keys(jsonPrimary, jsonTemp, keyFields)
-      jsonTemp = []
-      # rc = SAP.RfcCloseConnection(hRFC, RfcErrInf)
-
-    else:
-      print(RfcErrInf.key)
-      print(RfcErrInf.message)
+@api_view(['POST'])
+def SAPDeltaRefresh(request, tab):
+    try:
+        rows = refresh_sap_table(tab, connection_id=request.data.get('connection_id'),
+                                 delta_field=request.data.get('delta_field'))
+        return Response({"table": tab.upper(), "rows": rows}, status=status.HTTP_200_OK)
+    except ValueError as e:
+        return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        print(f"Error in delta refresh of {tab}: {e}")
+        return Response(str(e), status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-  del SAP
+@api_view(['GET', 'DELETE'])
+def SAPTableMetadata(request, tab, connection_id):
+    """
+    GET returns the cached key fields and field catalog of a table, reading them
+    from SAP first when they are missing or expired (?refresh=1 forces a re-read).
+    DELETE invalidates the cached entry.
+    """
+    try:
+        conn = sap_connection(connection_id)
+        if request.method == 'DELETE':
+            invalidate_table_metadata(conn, tab)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        refresh = request.GET.get('refresh') in ('1', 'true', 'True')
+        keyFields, catalog, chunks = get_table_layout(get_connection_pool(conn), tab, connection=conn,
+                                                      refresh=refresh)
+        metadata = SapTableMetadata.objects.get(connection_id=conn, table_name=tab.upper())
+        data = SapTableMetadataSerializer(metadata).data
+        data['chunks'] = len(chunks)
+        return Response(data, status=status.HTTP_200_OK)
+    except Connection.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND, data="Connection Not Found")
+    except Exception as e:
+        print(f"Error in table metadata of {tab}: {e}")
+        return Response(str(e), status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-  # for d in jsonPrimary:
-  #   for j in d:
-  #     d[j] = d[j].strip()
 
-  return jsonPrimary
+def with_cached_metadata(rows, connection_id):
+    """Add key fields and field count from the metadata cache to serialized table rows, without calling SAP."""
+    cached = cached_table_metadata(connection_id, [row['table'] for row in rows])
+    for row in rows:
+        metadata = cached.get(row['table'])
+        row['key_fields'] = metadata.key_fields if metadata else None
+        row['field_count'] = len(metadata.field_catalog) if metadata else None
+    return rows
 
 
 def table_exists(table_name):
@@ -3834,17 +3222,53 @@ def CreateChat(request):
     return Response("fail")
 
 
-def update_column_with_constant(table_name, column_name, constant_value):
+def update_column_with_constant(table_name, column_name, constant_value, dual_write=False):
+    update_columns_with_constants(table_name, {column_name: constant_value}, dual_write=dual_write)
+
+
+def update_columns_with_constants(table_name, values, dual_write=False):
+    # values: {column: constant}, all assigned in one UPDATE pass
     try:
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             # Use parameterized query to prevent SQL injection
-            cursor.execute(f"UPDATE {table_name} SET {column_name} = %s", [constant_value])
-            print(f"Successfully updated {cursor.rowcount} rows in {table_name}.{column_name}")
+            set_clause = ", ".join(f"{column_name} = %s" for column_name in values)
+            for target in write_tables(table_name, dual_write):
+                cursor.execute(f"UPDATE {target} SET {set_clause}", list(values.values()))
+                print(f"Successfully updated {cursor.rowcount} rows in {target} ({', '.join(values)})")
+                invalidate_column_stats(target, values)
  
     except Exception as e:
         print(f"Error updating column: {e}")
 
 
+def apply_lookup_table(table_name, target_fields, reverse=False):
+    """
+    Translate target_fields of table_name through LookUp_table in one UPDATE
+    pass: From_Val -> To_Val, or To_Val -> From_Val with reverse. Values
+    without a lookup entry for their field are left unchanged.
+    """
+    match_col, value_col = ("To_Val", "From_Val") if reverse else ("From_Val", "To_Val")
+    target_fields = list(dict.fromkeys(target_fields))
+    try:
+        ensure_index("LookUp_table", ["Field_Name", match_col])
+        assignments, conditions, set_params, where_params = [], [], [], []
+        for field in target_fields:
+            match = f"FROM LookUp_table l WHERE l.Field_Name = %s AND l.{match_col} = {table_name}.{field}"
+            assignments.append(f"{field} = CASE WHEN EXISTS (SELECT 1 {match}) "
+                               f"THEN (SELECT l.{value_col} {match} LIMIT 1) ELSE {field} END")
+            set_params += [field, field]
+            conditions.append(f"EXISTS (SELECT 1 {match})")
+            where_params.append(field)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"UPDATE {table_name} SET {', '.join(assignments)} WHERE {' OR '.join(conditions)}",
+                           set_params + where_params)
+            print(f"Lookup {'reverse ' if reverse else ''}applied to {cursor.rowcount} rows in {table_name} ({', '.join(target_fields)})")
+            invalidate_column_stats(table_name, target_fields)
+    except Exception as e:
+        print(f"Error applying lookup: {e}")
+
+
+
 @api_view(['GET'])
 def applyOneToOne(request,pid,oid,sid):
     try:
@@ -3869,16 +3293,16 @@ def applyOneToOne(request,pid,oid,sid):
                 if(rule.source_table!="" and rule.source_field_name!="" and isMandt != "False"):    
                     print(rule.source_table,rule.source_field_name,target_table_name,rule.target_sap_field)
                     if(not(table_exists(rule.source_table.upper()))):
-                        jsonPrimary=func(rule.source_table.upper())      
-                        create_and_insert_data(rule.source_table.upper(),jsonPrimary)
+                        extract_sap_table(rule.source_table.upper())
                     # print("came2")
                     src_table=rule.source_table.upper()
                     tar_table=target_table_name
                     field_mapping[rule.source_field_name] = rule.target_sap_field
             # print(src_table,tar_table,field_mapping)
             if(src_table!="" and tar_table!=""):
+                marks = table_rowid_marks([tar_table])
                 copy_data_between_tables_with_field_mapping(src_table,tar_table,field_mapping)
-                remove_duplicate_rows_group_by_all(tar_table)
+                remove_duplicate_rows_group_by_all(tar_table, since_rowid=marks)
            
  
         field_mapping={}  
@@ -3909,9 +3333,7 @@ def applyOneToOne(request,pid,oid,sid):
             isMandt=curr_field.isKey
             if(rule.source_table!="" and rule.source_field_name!="" and isMandt == "False"):
                 if(not(table_exists(target_table_name.upper()))):
-                    jsonPrimary=func(rule.source_table)  
-                    print(jsonPrimary[0])
-                    create_and_insert_data(rule.source_table.upper(),jsonPrimary)
+                    extract_sap_table(rule.source_table.upper())
                 print(rule.source_table,rule.source_field_name,rule.target_sap_table,rule.target_sap_field)
                 
                 print("tablename",segmentForTable.table_name)
@@ -4194,452 +3616,20 @@ def reUploadSuccessFactors(request,oid):
 
 
 
-def join_json_objects_multiple_keys(obj1, obj2, primary_keys):
-    result = []
- 
-    # Create a dictionary to efficiently look up items in obj2 by combined primary keys
-    obj2_lookup = {}
-    for item2 in obj2:
-        key = tuple(item2[key] for key in primary_keys)  # Create a tuple key
-        obj2_lookup[key] = item2
- 
-    for item1 in obj1:
-        key = tuple(item1[key] for key in primary_keys)
-        item2 = obj2_lookup.get(key)  # Efficient lookup
- 
-        if item2:
-            merged_object = {**item1, **item2}
-            result.append(merged_object)
-        else:
-            result.append(item1)  # Keep item1 if no match
-            print(f"No match found for {key}")
- 
-    return result
-
-
 @api_view(['GET'])
 def getSapTableData(request):
-    #-Begin-----------------------------------------------------------------
- 
-#-Packages--------------------------------------------------------------
- 
- 
-    #-Constants-------------------------------------------------------------
- 
-    #-RFC_RC - RFC return codes---------------------------------------------
-    class RFC_ERROR_INFO(Structure):
-        _fields_ = [("code", c_long),
-                    ("group", c_long),
-                    ("key", c_wchar * 128),
-                    ("message", c_wchar * 512),
-                    ("abapMsgClass", c_wchar * 21),
-                    ("abapMsgType", c_wchar * 2),
-                    ("abapMsgNumber", c_wchar * 4),
-                    ("abapMsgV1", c_wchar * 51),
-                    ("abapMsgV2", c_wchar * 51),
-                    ("abapMsgV3", c_wchar * 51),
-                    ("abapMsgV4", c_wchar * 51)]
-    class RFC_CONNECTION_PARAMETER(Structure):
-        _fields_ = [("name", c_wchar_p),
-                    ("value", c_wchar_p)]
-    RFC_OK = 0
-    RFC_COMMUNICATION_FAILURE = 1
-    RFC_LOGON_FAILURE = 2
-    RFC_ABAP_RUNTIME_FAILURE = 3
-    RFC_ABAP_MESSAGE = 4
-    RFC_ABAP_EXCEPTION = 5
-    RFC_CLOSED = 6
-    RFC_CANCELED = 7
-    RFC_TIMEOUT = 8
-    RFC_MEMORY_INSUFFICIENT = 9
-    RFC_VERSION_MISMATCH = 10
-    RFC_INVALID_PROTOCOL = 11
-    RFC_SERIALIZATION_FAILURE = 12
-    RFC_INVALID_HANDLE = 13
-    RFC_RETRY = 14
-    RFC_EXTERNAL_FAILURE = 15
-    RFC_EXECUTED = 16
-    RFC_NOT_FOUND = 17
-    RFC_NOT_SUPPORTED = 18
-    RFC_ILLEGAL_STATE = 19
-    RFC_INVALID_PARAMETER = 20
-    RFC_CODEPAGE_CONVERSION_FAILURE = 21
-    RFC_CONVERSION_FAILURE = 22
-    RFC_BUFFER_TOO_SMALL = 23
-    RFC_TABLE_MOVE_BOF = 24
-    RFC_TABLE_MOVE_EOF = 25
-    RFC_START_SAPGUI_FAILURE = 26
-    RFC_ABAP_CLASS_EXCEPTION = 27
-    RFC_UNKNOWN_ERROR = 28
-    RFC_AUTHORIZATION_FAILURE = 29
- 
-    #-RFCTYPE - RFC data types----------------------------------------------
-    RFCTYPE_CHAR = 0
-    RFCTYPE_DATE = 1
-    RFCTYPE_BCD = 2
-    RFCTYPE_TIME = 3
-    RFCTYPE_BYTE = 4
-    RFCTYPE_TABLE = 5
-    RFCTYPE_NUM = 6
-    RFCTYPE_FLOAT = 7
-    RFCTYPE_INT = 8
-    RFCTYPE_INT2 = 9
-    RFCTYPE_INT1 = 10
-    RFCTYPE_NULL = 14
-    RFCTYPE_ABAPOBJECT = 16
-    RFCTYPE_STRUCTURE = 17
-    RFCTYPE_DECF16 = 23
-    RFCTYPE_DECF34 = 24
-    RFCTYPE_XMLDATA = 28
-    RFCTYPE_STRING = 29
-    RFCTYPE_XSTRING = 30
-    RFCTYPE_BOX = 31
-    RFCTYPE_GENERIC_BOX = 32
- 
-    #-RFC_UNIT_STATE - Processing status of a background unit---------------
-    RFC_UNIT_NOT_FOUND = 0
-    RFC_UNIT_IN_PROCESS = 1
-    RFC_UNIT_COMMITTED = 2
-    RFC_UNIT_ROLLED_BACK = 3
-    RFC_UNIT_CONFIRMED = 4
- 
-    #-RFC_CALL_TYPE - Type of an incoming function call---------------------
-    RFC_SYNCHRONOUS = 0
-    RFC_TRANSACTIONAL = 1
-    RFC_QUEUED = 2
-    RFC_BACKGROUND_UNIT = 3
- 
-    #-RFC_DIRECTION - Direction of a function module parameter--------------
-    RFC_IMPORT = 1
-    RFC_EXPORT = 2
-    RFC_CHANGING = RFC_IMPORT + RFC_EXPORT
-    RFC_TABLES = 4 + RFC_CHANGING
- 
-    #-RFC_CLASS_ATTRIBUTE_TYPE - Type of an ABAP object attribute-----------
-    RFC_CLASS_ATTRIBUTE_INSTANCE = 0
-    RFC_CLASS_ATTRIBUTE_CLASS = 1
-    RFC_CLASS_ATTRIBUTE_CONSTANT = 2
- 
-    #-RFC_METADATA_OBJ_TYPE - Ingroup repository----------------------------
-    RFC_METADATA_FUNCTION = 0
-    RFC_METADATA_TYPE = 1
-    RFC_METADATA_CLASS = 2
- 
- 
-    #-Variables-------------------------------------------------------------
-    ErrInf = RFC_ERROR_INFO; RfcErrInf = ErrInf()
-    ConnParams = RFC_CONNECTION_PARAMETER * 5; RfcConnParams = ConnParams()
-    SConParams = RFC_CONNECTION_PARAMETER * 3; RfcSConParams = SConParams()
- 
- 
-    #-Library---------------------------------------------------------------
-    # if str(platform.architecture()[0]) == "32bit":
-    #   os.environ['PATH'] += ";C:\\SAPRFCSDK\\32bit"
-    #   SAPNWRFC = "C:\\SAPRFCSDK\\32bit\\sapnwrfc.dll"
-    # elif str(platform.architecture()[0]) == "64bit":
-    #   os.environ['PATH'] += ";C:\\SAPRFCSDK\\64bit"
-    #   SAPNWRFC = "C:\\SAPRFCSDK\\64bit\\sapnwrfc.dll"
- 
-    SAPNWRFC = "sapnwrfc.dll"
-    SAP = windll.LoadLibrary(SAPNWRFC)
- 
-    #-Prototypes------------------------------------------------------------
-    SAP.RfcAppendNewRow.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcAppendNewRow.restype = c_void_p
- 
-    SAP.RfcCreateTable.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcCreateTable.restype = c_void_p
- 
-    SAP.RfcCloseConnection.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcCloseConnection.restype = c_ulong
- 
-    SAP.RfcCreateFunction.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcCreateFunction.restype = c_void_p
- 
-    SAP.RfcCreateFunctionDesc.argtypes = [c_wchar_p, POINTER(ErrInf)]
-    SAP.RfcCreateFunctionDesc.restype = c_void_p
- 
-    SAP.RfcDestroyFunction.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcDestroyFunction.restype = c_ulong
- 
-    SAP.RfcDestroyFunctionDesc.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcDestroyFunctionDesc.restype = c_ulong
- 
-    SAP.RfcGetChars.argtypes = [c_void_p, c_wchar_p, c_void_p, c_ulong, \
-    POINTER(ErrInf)]
-    SAP.RfcGetChars.restype = c_ulong
- 
-    SAP.RfcGetCurrentRow.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcGetCurrentRow.restype = c_void_p
- 
-    SAP.RfcGetFunctionDesc.argtypes = [c_void_p, c_wchar_p, POINTER(ErrInf)]
-    SAP.RfcGetFunctionDesc.restype = c_void_p
- 
-    SAP.RfcGetRowCount.argtypes = [c_void_p, POINTER(c_ulong), \
-    POINTER(ErrInf)]
-    SAP.RfcGetRowCount.restype = c_ulong
- 
-    SAP.RfcGetStructure.argtypes = [c_void_p, c_wchar_p, \
-    POINTER(c_void_p), POINTER(ErrInf)]
-    SAP.RfcGetStructure.restype = c_ulong
- 
-    SAP.RfcGetTable.argtypes = [c_void_p, c_wchar_p, POINTER(c_void_p), \
-    POINTER(ErrInf)]
-    SAP.RfcGetTable.restype = c_ulong
- 
-    SAP.RfcGetVersion.argtypes = [POINTER(c_ulong), POINTER(c_ulong), \
-    POINTER(c_ulong)]
-    SAP.RfcGetVersion.restype = c_wchar_p
- 
-    SAP.RfcInstallServerFunction.argtypes = [c_wchar_p, c_void_p, \
-    c_void_p, POINTER(ErrInf)]
-    SAP.RfcInstallServerFunction.restype = c_ulong
- 
-    SAP.RfcInvoke.argtypes = [c_void_p, c_void_p, POINTER(ErrInf)]
-    SAP.RfcInvoke.restype = c_ulong
- 
-    SAP.RfcListenAndDispatch.argtypes = [c_void_p, c_ulong, POINTER(ErrInf)]
-    SAP.RfcListenAndDispatch.restype = c_ulong
- 
-    SAP.RfcMoveToFirstRow.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcMoveToFirstRow.restype = c_ulong
- 
-    SAP.RfcMoveToNextRow.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcMoveToNextRow.restype = c_ulong
- 
-    SAP.RfcOpenConnection.argtypes = [POINTER(ConnParams), c_ulong, \
-    POINTER(ErrInf)]
-    SAP.RfcOpenConnection.restype = c_void_p
- 
-    SAP.RfcPing.argtypes = [c_void_p, POINTER(ErrInf)]
-    SAP.RfcPing.restype = c_ulong
- 
-    SAP.RfcRegisterServer.argtypes = [POINTER(SConParams), c_ulong, \
-    POINTER(ErrInf)]
-    SAP.RfcRegisterServer.restype = c_void_p
- 
-    SAP.RfcSetChars.argtypes = [c_void_p, c_wchar_p, c_wchar_p, c_ulong, \
-    POINTER(ErrInf)]
-    SAP.RfcSetChars.restype = c_ulong
-   
- 
-    #-Main------------------------------------------------------------------
- 
-    RfcConnParams[0].name = "ASHOST"; RfcConnParams[0].value = "34.194.191.113"
-    RfcConnParams[1].name = "SYSNR" ; RfcConnParams[1].value = "01"
-    RfcConnParams[2].name = "CLIENT"; RfcConnParams[2].value = "100"
-    RfcConnParams[3].name = "USER"  ; RfcConnParams[3].value = "GAJANANDAM"
-    RfcConnParams[4].name = "PASSWD"; RfcConnParams[4].value = "SunR!se@6789"
- 
     TableName = "ADR6"
-    keyFields = []
-    cnt = 0
-    l=[]
-    hRFC = SAP.RfcOpenConnection(RfcConnParams, 5, RfcErrInf)
-    if hRFC != None:
- 
-      charBuffer = create_unicode_buffer(1048576 + 1)
- 
-      hFuncDesc = SAP.RfcGetFunctionDesc(hRFC, "CACS_GET_TABLE_FIELD450", RfcErrInf)
-      if hFuncDesc != 0:
-        hFunc = SAP.RfcCreateFunction(hFuncDesc, RfcErrInf)
-        if hFunc != 0:
- 
-          rc = SAP.RfcSetChars(hFunc, "I_TABNAME", TableName, \
-            len(TableName), RfcErrInf)
-          print(SAP.RfcInvoke(hRFC, hFunc, RfcErrInf) == RFC_OK)
-          if SAP.RfcInvoke(hRFC, hFunc, RfcErrInf) == RFC_OK:
- 
-            hTable = c_void_p(0)
-            if SAP.RfcGetTable(hFunc, "T_KEYFIELD", hTable, RfcErrInf) == RFC_OK:
-              RowCount = c_ulong(0)
-              rc = SAP.RfcGetRowCount(hTable, RowCount, RfcErrInf)
-              print(RowCount, 1)
-              rc = SAP.RfcMoveToFirstRow(hTable, RfcErrInf)
-              for i in range(0, RowCount.value):
-                hRow = SAP.RfcGetCurrentRow(hTable, RfcErrInf)
-                rc = SAP.RfcGetChars(hRow, "FIELDNAME", charBuffer, 512, RfcErrInf)
-                # print(str(charBuffer.value), end="    ")
-                fieldName = str(charBuffer.value)
-                # rc = SAP.RfcGetChars(hRow, "LENGTH", charBuffer, 512, RfcErrInf)
-                # val = int(charBuffer.value)
-                # if (sum + val < 512):
-                #   sum += val
-                #   l1.append(fieldName.strip())
-                #   # print(sum)
-                # else:
-                keyFields.append(fieldName.strip())
-                  # l1 = [fieldName.strip()]
-                  # sum = val
-                if i < RowCount.value:
-                  rc = SAP.RfcMoveToNextRow(hTable, RfcErrInf)
- 
-          rc = SAP.RfcDestroyFunction(hFunc, RfcErrInf)
- 
-      # rc = SAP.RfcCloseConnection(hRFC, RfcErrInf)
- 
-      print(*keyFields)
-      keyFieldsCnt = len(keyFields)
-      print(keyFieldsCnt)
-    else:
-      print(RfcErrInf.key)
-      print(RfcErrInf.message)
- 
- 
-    ind, keyDict = 0, {}
- 
-    # hRFC = SAP.RfcOpenConnection(RfcConnParams, 5, RfcErrInf)
-    if hRFC != None:
- 
-      charBuffer = create_unicode_buffer(1048576 + 1)
- 
-      hFuncDesc = SAP.RfcGetFunctionDesc(hRFC, "Z450RFC_READ_TABLE", RfcErrInf)
-      if hFuncDesc != 0:
-        hFunc = SAP.RfcCreateFunction(hFuncDesc, RfcErrInf)
-        if hFunc != 0:
- 
-          rc = SAP.RfcSetChars(hFunc, "QUERY_TABLE", TableName, \
-            len(TableName), RfcErrInf)
-          rc = SAP.RfcSetChars(hFunc, "DELIMITER", "~", 1, RfcErrInf)
-          if SAP.RfcInvoke(hRFC, hFunc, RfcErrInf) == RFC_OK:
- 
-            hTable = c_void_p(0)
-            if SAP.RfcGetTable(hFunc, "FIELDS", hTable, RfcErrInf) == RFC_OK:
-             
-             
-              sum, l, l1 = 0, [], keyFields.copy()
-              keyFieldsLen = 0
-              RowCount = c_ulong(0)
-              rc = SAP.RfcGetRowCount(hTable, RowCount, RfcErrInf)
-              print(RowCount)
-              rc = SAP.RfcMoveToFirstRow(hTable, RfcErrInf)
-              for i in range(0, RowCount.value):
-                hRow = SAP.RfcGetCurrentRow(hTable, RfcErrInf)
-                rc = SAP.RfcGetChars(hRow, "FIELDNAME", charBuffer, 512, RfcErrInf)
-                # print(str(charBuffer.value), end="    ")
-                fieldName = str(charBuffer.value)
-                rc = SAP.RfcGetChars(hRow, "LENGTH", charBuffer, 512, RfcErrInf)
-                val = int(charBuffer.value)
-                cnt += 1
-                # print(fieldName.strip(), cnt)
-                if (i < keyFieldsCnt):
-                  print(i)
-                  i += 1
-                  keyFieldsLen += val
-                else:
-                  if (sum + val + keyFieldsLen < 400):
-                    sum += val
-                    l1.append(fieldName.strip())
-                    # print(sum)
-                  else:
-                    l.append(l1)
-                    l1 = keyFields.copy()
-                    l1.append(fieldName.strip())
-                    # print(sum + keyFieldsLen)
-                    sum = val
-                   
-                if i < RowCount.value:
-                  rc = SAP.RfcMoveToNextRow(hTable, RfcErrInf)
-              l.append(l1)
-          rc = SAP.RfcDestroyFunction(hFunc, RfcErrInf)
- 
-      # rc = SAP.RfcCloseConnection(hRFC, RfcErrInf)
- 
-      # print(l)
-    else:
-      print(RfcErrInf.key)
-      print(RfcErrInf.message)
- 
-    # for i in l:
-    #   print(i[:2])
- 
-    length = 0
-    for ii in l:
-      for jj in ii:
-        if (jj == 'USERNAME'):
-            length += 1
-    print(l)
-    print("Total Number of  : ",length)
- 
-    jsonTemp =[]
-    jsonPrimary = []
-    for splittedFields in l:
-      # hRFC = SAP.RfcOpenConnection(RfcConnParams, 5, RfcErrInf)
-      if hRFC != None:
- 
-        charBuffer = create_unicode_buffer(1048576 + 1)
- 
-        hFuncDesc = SAP.RfcGetFunctionDesc(hRFC, "Z450RFC_READ_TAB_DATA", RfcErrInf)
-        if hFuncDesc != 0:
-          hFunc = SAP.RfcCreateFunction(hFuncDesc, RfcErrInf)
-          if hFunc != 0:
- 
-            rc = SAP.RfcSetChars(hFunc, "QUERY_TABLE", TableName, \
-              len(TableName), RfcErrInf)
-            rc = SAP.RfcSetChars(hFunc, "DELIMITER", "~", 1, RfcErrInf)
- 
-            #MATNR,MTART,ATTYP,SATNR,MATKL,MBRSH,MEINS,SPART,BISMT,DATAB,LIQDT,NORMT,GROES,LABOR,BRGEW,NTGEW,GEWEI,LAENG,BREIT,HOEHE,MEABM,VOLUM,VOLEH,KZKFG,IPRKZ,RAUBE,TEMPB,BEHVO,STOFF,ETIAR,ETIFO,WESCH,XGCHP,MHDHB,MHDRZ,SLED_BBD
- 
-            field = ','.join(splittedFields)
-            # print(field)
-            rc = SAP.RfcSetChars(hFunc, "FIELDNAME", field, len(field), RfcErrInf)
- 
-            # print(SAP.RfcInvoke(hRFC, hFunc, RfcErrInf) == RFC_OK)
-            if SAP.RfcInvoke(hRFC, hFunc, RfcErrInf) == RFC_OK:
- 
-              hTable = c_void_p(0)
-              if SAP.RfcGetTable(hFunc, "DATA", hTable, RfcErrInf) == RFC_OK:
- 
-                RowCount = c_ulong(0)
-                rc = SAP.RfcGetRowCount(hTable, RowCount, RfcErrInf)
-                rc = SAP.RfcMoveToFirstRow(hTable, RfcErrInf)
-                for i in range(0, RowCount.value):
-                  hRow = SAP.RfcGetCurrentRow(hTable, RfcErrInf)
-                  rc = SAP.RfcGetChars(hRow, "WA", charBuffer, 1024, RfcErrInf)
-                  data_row=charBuffer.value
-                  # data_dict = {field: value for field, value in zip(splittedFields, data_row)}
-                  # print(data_dict)
- 
-                  data_row = charBuffer.value.split("~")
-                #   print(data_row)
-   
-                                    # Create dictionary using only requested fields
-                                # data_dict = {field: value for field, value in zip(field, data_row)}
-                                # # print(charBuffer.value)
-                                # res.append(data_dict)
-                  fields = field.split(",")
-                  data_dict = {f: v.strip() for f, v in zip(fields, data_row)}
-                  jsonTemp.append(data_dict)
-                #   print(jsonTemp)
-                #   print("Hiieloooooooooooooooooooooooooooooooooooooo")
- 
-                  if i < RowCount.value:
-                    rc = SAP.RfcMoveToNextRow(hTable, RfcErrInf)
- 
-            rc = SAP.RfcDestroyFunction(hFunc, RfcErrInf)
-        print(len(jsonPrimary))
-        if (len(jsonPrimary) == 0):
-        #   print("HEYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYY")
-          jsonPrimary = jsonTemp
-        else:
-        #   print(jsonPrimary)
-        #   print("YASHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHH")
-          jsonPrimary = join_json_objects_multiple_keys(jsonPrimary, jsonTemp, keyFields)
-        jsonTemp = []
-        # rc = SAP.RfcCloseConnection(hRFC, RfcErrInf)
-   
- 
-      else:
-        print(RfcErrInf.key)
-        print(RfcErrInf.message)
- 
- 
- 
+    # ?parallel=N overrides SAP_RFC_CHUNK_PARALLELISM for this request
+    parallel = request.GET.get('parallel')
+    pool = get_default_rfc_pool()
+    jsonPrimary = read_sap_table(pool, TableName, parallel=int(parallel) if parallel else None,
+                                 layout=get_table_layout(pool, TableName))
+
     df = pd.DataFrame(jsonPrimary)
     # print(df)
     new_column_list = df.columns.tolist()
     # print(column_list)
- 
+
     # Create a new list to store the modified column names
     column_list = []
     for cl in new_column_list:
@@ -4647,11 +3637,11 @@ def getSapTableData(request):
             column_list.append("PRIMARY1")
         else:
             column_list.append(cl)
- 
+
     df.columns = column_list
     columns = []
     col =[]
- 
+
     for cl in column_list:
         col.append(cl)
         col.append("TEXT")
@@ -4661,18 +3651,6 @@ def getSapTableData(request):
     insert_data_from_dataframe(df,TableName)
     # print("Final JSON : ",jsonPrimary)
     return Response(jsonPrimary)
- 
- 
-    del SAP
- 
-    # for d in jsonPrimary:
-    #   for j in d:
-    #     d[j] = d[j].strip()
- 
-    # print(jsonPrimary[-1])
- 
-
-
 # def getTableAndRuleData(request,pid,oid,sid):
 
 #     connections = fields.objects.filter(project_id=pid,obj_id=oid,segement_id=sid)
@@ -4688,13 +3666,17 @@ matplotlib.use('SVG')
 
 from io import BytesIO
  
+def top_value_counts(stats, column):
+    # value_counts() of a column, served from its TableColumnStats top values
+    return pd.Series(dict(stats[column].top_values), dtype='int64')
+
+
 class GetPlot(APIView):
     proj, obj, seg, table_name = "", "", "", ""
     tempGraph = []
    
-    def plot(self, l, d):
+    def plot(self, l, missing_values):
         plt.figure(figsize=(12, 8))
-        missing_values = d.isnull().sum()
         # print("dont know: \n", missing_values.sum())
         if (not missing_values.sum()):
             return 'No Nulls'
@@ -4744,14 +3726,10 @@ class GetPlot(APIView):
                 mandFields.append(i['target_sap_field'])
  
         try:
-            with connections["default"].cursor() as cursor:
-                mandt = ', '.join(mandFields)
-                # print("hii")
-                # print(mandt)
-                data = cursor.execute(f"SELECT {mandt} FROM {self.table_name}")
-                data = data.fetchall()
-                data = pd.DataFrame(data, columns=mandFields)
-                return self.plot(mandDic, data)
+            # NULL counts per mandatory field from the column statistics catalog
+            stats = column_stats_by_name(self.table_name)
+            missing = pd.Series({f: stats[f].null_count for f in mandFields}, dtype='int64')
+            return self.plot(mandDic, missing)
            
         except Exception as e:
             print(f"{e}")
@@ -4766,9 +3744,9 @@ class GetPlot(APIView):
         plt.close()  # close the plot to free memory
         return buf.getvalue().decode('latin1')  # encode for
    
-    def groupPlots(self, name, desc, d):
-        if (len(d[name].value_counts()) > 0):
-            top_creators = d[name].value_counts().head(10)
+    def groupPlots(self, name, desc, value_counts):
+        if (len(value_counts) > 0):
+            top_creators = value_counts.head(10)
     
             # colors = plt.cm.viridis(np.linspace(0, 1, len(top_creators)))
             colors = plt.cm.get_cmap('Paired', len(top_creators))
@@ -4807,16 +3785,10 @@ class GetPlot(APIView):
  
         #mandFields -> columnNames, mandDic -> dictonary for description
         try:
-            with connections["default"].cursor() as cursor:
-                mandt = ', '.join(mandFields)
-                # print("hii")
-                data = cursor.execute(f"SELECT {mandt} FROM {self.table_name}")
-                data = data.fetchall()
-                data = pd.DataFrame(data, columns=mandFields)
-                # print("Hi hello" ,data)
-                for i in mandDic:
-                    self.groupPlots(i, mandDic[i], data)
-                return {'profMand': self.tempGraph}
+            stats = column_stats_by_name(self.table_name)
+            for i in mandDic:
+                self.groupPlots(i, mandDic[i], top_value_counts(stats, i))
+            return {'profMand': self.tempGraph}
        
         except Exception as e:
             print(f"{e}")
@@ -4838,14 +3810,10 @@ class GetPlot(APIView):
             for j in i:
                 lookFields.append(j)
         try:
-            with connections["default"].cursor() as cursor:
-                mandLook = ', '.join(lookFields)
-                data = cursor.execute(f"SELECT {mandLook} FROM {self.table_name}")
-                data = data.fetchall()
-                data = pd.DataFrame(data, columns=lookFields)
-                for i in lookUpDic:
-                    for j in i:
-                        self.groupPlots(j, i[j], data)    
+            stats = column_stats_by_name(self.table_name)
+            for i in lookUpDic:
+                for j in i:
+                    self.groupPlots(j, i[j], top_value_counts(stats, j))
             return {'profLook': self.tempGraph}
  
         except Exception as e:
@@ -4878,13 +3846,7 @@ class GetExactGraph(APIView):
                     desc =  i['text_description']
         # print(table_name, fname)
         try:
-            with connections["default"].cursor() as cursor:
-                # print("hii")
-                data = cursor.execute(f"SELECT {fname} FROM {table_name}")
-                data = data.fetchall()
-                data = pd.DataFrame(data, columns=[fname])
- 
-            top_creators = data[fname].value_counts().head(20)
+            top_creators = top_value_counts(column_stats_by_name(table_name), fname).head(20)
             plt.figure(figsize=(12, 6))
             colors = plt.cm.get_cmap('Paired', len(top_creators))
  
@@ -5416,8 +4378,7 @@ def create_Validation_Table(request):
                     
             create_new_table_with_existing_columns(table_name,new_table_name,validation_fields)
 
-            validation_table_data = get_complete_table_data(new_table_name)
-            return Response(status=status.HTTP_200_OK,data=validation_table_data)
+            return complete_table_response(request, new_table_name)
         else:
             print("No segment exists")
             return Response(status=status.HTTP_404_NOT_FOUND)
@@ -5824,6 +4785,7 @@ def excel_data_to_sqllite(request):
     cursor = connection.cursor()
     # Drop table if it exists
     cursor.execute(f"DROP TABLE IF EXISTS {table_name};")    
+    invalidate_column_stats(table_name)
     create_table(table_name , column)    
     print(df1.head())
     insert_data_from_dataframe(df1,table_name)
@@ -5887,6 +4849,23 @@ def get_table_data(table_name):
         return table_data
 
 
+def table_data_chunks(table_name):
+    # get_table_data as streamed JSON chunks ("data" is always present, possibly empty)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT * FROM "{table_name}" LIMIT 0')
+        columns = [col[0] for col in cursor.description]
+    return json_document_chunks({'columns': columns}, 'data', iter_table_rows(table_name, skip_empty=True))
+
+
+def project_data_chunks(all_data, table_names):
+    # The project download document, with every segment table streamed after the metadata
+    yield json.dumps(all_data)[:-1]
+    for table_name in table_names:
+        yield f", {json.dumps(table_name)}: "
+        yield from table_data_chunks(table_name)
+    yield "}"
+
+
 import json
 from django.http import HttpResponse, HttpResponseNotFound
 from django.core import serializers
@@ -5915,6 +4894,11 @@ def download_project_data(request, project_id):
  
     Segments = segments.objects.filter(project_id=project_id)
     all_data['Segments'] = json.loads(serializers.serialize('json', Segments))
+
+    if stream_format(request):
+        table_names = [segment.table_name for segment in Segments if table_exists(segment.table_name)]
+        return streaming_response(project_data_chunks(all_data, table_names),
+                                  filename=f"project_{project_id}_data.json")
  
     for segment in Segments:
         table_name = segment.table_name  # Assuming your Segment model has a field named 'table_name'
@@ -6295,6 +5279,7 @@ def set_preload_status_fail_if_null(table_name, columns_to_check):
             with connection.cursor() as cursor:  # Assuming 'connection' is a valid database connection object
                 cursor.execute(sql)
                 connection.commit() # Added commit to save
+            invalidate_column_stats(table_name, ['Preload_status', 'Mandatory_ErrorField'])
         except Exception as e:
             print(f"Error updating table: {e}")
             # Consider re-raising the exception or logging it.  A bare except is bad practice.
@@ -6345,8 +5330,7 @@ def validate_mandatory_fields(request):
                 else:
                     return Response(status=status.HTTP_404_NOT_FOUND,data = "Validation Table not found")
 
-                table_data = get_complete_table_data(validation_table_name)
-                return Response(status=status.HTTP_200_OK,data=table_data)
+                return complete_table_response(request, validation_table_name)
             else:
                 return Response(status=status.HTTP_404_NOT_FOUND,data="No Mandatory Fields Found")
         else:
@@ -6750,13 +5734,9 @@ def get_numberOfLookupValidationFailed_Count1(table_name):
 def get_complete_table_data(table_name):
 
     try:
-        with connection.cursor() as cursor:
-            print(table_name)
-            cursor.execute(f'SELECT * FROM "{table_name}"')
-            columns = [col[0] for col in cursor.description]
-            rows = cursor.fetchall()
-            # Use list comprehension for cleaner code
-            return [dict(zip(columns, row)) for row in rows]
+        print(table_name)
+        # Fetched in batches; complete_table_response streams them instead
+        return list(iter_table_rows(table_name))
 
     except Exception as e:
         error_msg = {"error": f"An error occurred in returnung table data: {str(e)}"}
@@ -6764,6 +5744,14 @@ def get_complete_table_data(table_name):
         raise Exception(f"Error while Fetching Table Data: {str(e)}")
 
 
+def complete_table_response(request, table_name):
+    # get_complete_table_data as a Response, or streamed when the client asked for it
+    fmt = stream_format(request)
+    if fmt:
+        return stream_table_response(table_name, fmt)
+    return Response(status=status.HTTP_200_OK, data=get_complete_table_data(table_name))
+
+
 @api_view(['GET'])
 def get_report_table(request,segment_id,table_type):
 
@@ -6782,7 +5770,7 @@ def get_report_table(request,segment_id,table_type):
             else:
                 return Response(status=status.HTTP_400_BAD_REQUEST,data = "Invalid Request")
             if check_table_existance(table_name):
-                return Response(status=status.HTTP_200_OK,data = get_complete_table_data(table_name))
+                return complete_table_response(request, table_name)
             else:
                 return Response(status=status.HTTP_404_NOT_FOUND,data = "Table not found")
 
@@ -6819,12 +5807,13 @@ def commit():
 
 import pandas as pd
 
-def dynamic_side_by_side_select(table_a, table_b, join_columns):
+def dynamic_side_by_side_select(table_a, table_b, join_columns, columns=None):
+    # columns: only these columns of table_a (all by default)
     import sqlite3
     cur = connection.cursor()
     cur.execute(f"PRAGMA table_info({table_a})")
     columns_info = cur.fetchall()
-    columns = [col[1] for col in columns_info]
+    columns = [col[1] for col in columns_info if columns is None or col[1] in columns]
 
     select_list = []
     col_names = []
@@ -6836,6 +5825,7 @@ def dynamic_side_by_side_select(table_a, table_b, join_columns):
     select_clause = ", ".join(select_list)
 
     join_conditions = " AND ".join([f"src.{col} = trans.{col}" for col in join_columns])
+    ensure_index(table_b, join_columns)
 
     query = f"""
     SELECT {select_clause}
@@ -6863,7 +5853,10 @@ def get_preLoad_table(request, pid, oid, sid):
         isKey=True
     ).values_list('fields', flat=True)
     fields_list = list(fields_list)
-    df, columns = dynamic_side_by_side_select(target_table_name + '_src', target_table_name, fields_list)
+    # Columns blank in both tables are dropped below anyway; leave them out of the join
+    shown = set(non_empty_columns(target_table_name + '_src')) | set(non_empty_columns(target_table_name))
+    df, columns = dynamic_side_by_side_select(target_table_name + '_src', target_table_name, fields_list,
+                                              columns=shown or None)
     json_columns = []
     # Clean DataFrame
     df = df.replace(r'^\s*$', np.nan, regex=True)